@@ -2,6 +2,9 @@ import pandas as pd
 import os
 import re
 
+from 连接工厂 import connect
+from 数据目录清单 import list_range_databases
+
 # ====== 这里自定义路径和字段名 ======
 base_path = r'D:\火车采集器V10.28\Data'    # 基础文件夹路径，可改为绝对路径
 csv_name = 'Content.csv'     # 文件名
@@ -59,20 +62,10 @@ def convert_db_to_csv():
     
     print(f"搜索范围：文件夹 {start_folder} 到 {end_folder}")
     
-    # 递归搜索所有SpiderResult.db3文件
-    for root, dirs, files in os.walk(base_path):
-        if 'SpiderResult.db3' in files:
-            # 检查当前文件夹名是否为数字且在指定范围内
-            current_folder = os.path.basename(root)
-            try:
-                folder_num = int(current_folder)
-                if start_folder <= folder_num <= end_folder:
-                    db_path = os.path.join(root, 'SpiderResult.db3')
-                    db_files.append(db_path)
-                    print(f"找到符合条件的文件夹：{current_folder}")
-            except ValueError:
-                # 如果文件夹名不是数字，跳过
-                continue
+    # 通过数据目录清单查找范围内的SpiderResult.db3文件
+    for folder_num, db_path in list_range_databases(base_path, start_folder, end_folder):
+        db_files.append(db_path)
+        print(f"找到符合条件的文件夹：{folder_num}")
     
     if not db_files:
         print(f"错误：在 {base_path} 及其子文件夹中未找到SpiderResult.db3文件")
@@ -87,8 +80,7 @@ def convert_db_to_csv():
         print(f"处理第 {i}/{len(db_files)} 个数据库文件：{db_path}")
         
         try:
-            import sqlite3
-            conn = sqlite3.connect(db_path)
+            conn = connect(db_path, "read-only")
             
             # 只处理Content表
             table_name = 'Content'
@@ -345,17 +337,11 @@ def main():
     end_folder = 491
     csv_files = []
     
-    for root, dirs, files in os.walk(base_path):
-        if 'Content.csv' in files:
-            current_folder = os.path.basename(root)
-            try:
-                folder_num = int(current_folder)
-                if start_folder <= folder_num <= end_folder:
-                    csv_path = os.path.join(root, 'Content.csv')
-                    csv_files.append(csv_path)
-                    print(f"找到CSV文件：{csv_path}")
-            except ValueError:
-                continue
+    for folder_num, db_path in list_range_databases(base_path, start_folder, end_folder):
+        csv_path = os.path.join(os.path.dirname(db_path), 'Content.csv')
+        if os.path.exists(csv_path):
+            csv_files.append(csv_path)
+            print(f"找到CSV文件：{csv_path}")
     
     if not csv_files:
         print("错误：在指定范围内未找到Content.csv文件")
@@ -1,38 +1,182 @@
+import hashlib
+import json
 import os
-from bs4 import BeautifulSoup
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html.parser import HTMLParser
 
-# 设置 HTML 文件所在目录
-# 获取所有 html 文件
-input_folder = 'D:\project\municipal\分类html\men'
-output_folder = 'D:\project\municipal\产品链接\men'
-
-# 确保输出目录存在
-os.makedirs(output_folder, exist_ok=True)
+from 链接规范化 import canonicalize_url, rules_signature
 
+# 设置 HTML 文件所在目录
 # 获取所有 html 文件
-html_files = [f for f in os.listdir(input_folder) if f.lower().endswith('.html')]
+input_folder = r'D:\project\municipal\分类html\men'
+output_folder = r'D:\project\municipal\产品链接\men'
 
 # 设置前缀
 base_url = 'https://www.fredericks.com'
 
-# 遍历处理每个文件
-for filename in html_files:
-    input_path = os.path.join(input_folder, filename)
-    
-    # 读取 HTML 内容
-    with open(input_path, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f.read(), 'html.parser')
-        links = [a['href'] for a in soup.find_all('a', href=True)]
-        unique_links = sorted(set(base_url + link for link in links))
+# 并行进程数（None = CPU 核数）
+max_workers = None
+
+# 记录已处理文件的大小、修改时间和哈希，未变化的文件下次跳过
+cache_file = os.path.join(output_folder, '.html_links_cache.json')
+
+
+class LinkExtractor(HTMLParser):
+    """流式解析 HTML，只收集 <a href> 的值（不建整棵文档树）"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
 
-    # 输出文件名：保留原文件名但修改扩展名为 .txt
-    base_name = os.path.splitext(filename)[0]
-    output_filename = f"{base_name}.txt"
-    output_path = os.path.join(output_folder, output_filename)
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            # 与 BeautifulSoup 一致：没有值的 href 记为空串，重复的 href 取最后一个
+            hrefs = [value or '' for name, value in attrs if name == 'href']
+            if hrefs:
+                self.links.append(hrefs[-1])
+
+    handle_startendtag = handle_starttag
+
+
+def extract_links(html: str) -> list:
+    parser = LinkExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.links
+
+
+def extract_links_bs4(html: str) -> list:
+    """原来的 BeautifulSoup 写法，只用于基准测试对比"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return [a['href'] for a in soup.find_all('a', href=True)]
+
+
+def process_file(input_path: str, output_path: str, prefix: str) -> int:
+    """提取一个 HTML 文件的链接写入 txt，返回链接数（在子进程中运行）"""
+    with open(input_path, 'r', encoding='utf-8') as f:
+        links = extract_links(f.read())
+    # 相对链接按 base_url 解析，去掉锚点和跟踪参数；javascript:、mailto: 等非网页链接丢弃
+    canonical = (canonicalize_url(link, prefix) for link in links)
+    unique_links = sorted(set(url for url in canonical if url.startswith(('http://', 'https://'))))
 
-    # 写入链接
     with open(output_path, 'w', encoding='utf-8') as f:
         for link in unique_links:
             f.write(link + '\n')
+    return len(unique_links)
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_cache() -> dict:
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # 前缀或链接规范化规则变了，所有输出都要重新生成
+    if cache.get('base_url') != base_url or cache.get('rules') != rules_signature():
+        return {}
+    return cache.get('files', {})
+
+
+def save_cache(files: dict) -> None:
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump({'base_url': base_url, 'rules': rules_signature(), 'files': files}, f, ensure_ascii=False)
+
+
+def main():
+    # 确保输出目录存在
+    os.makedirs(output_folder, exist_ok=True)
+
+    # 获取所有 html 文件
+    html_files = [f for f in os.listdir(input_folder) if f.lower().endswith('.html')]
+    cache = load_cache()
+
+    # 找出需要处理的文件：大小或修改时间变了、且内容哈希也变了的文件
+    todo = {}
+    skipped = 0
+    for filename in html_files:
+        input_path = os.path.join(input_folder, filename)
+        # 输出文件名：保留原文件名但修改扩展名为 .txt
+        output_path = os.path.join(output_folder, os.path.splitext(filename)[0] + '.txt')
+        stat = os.stat(input_path)
+        entry = cache.get(filename)
+        if entry and os.path.exists(output_path):
+            if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                skipped += 1
+                continue
+            sha1 = file_sha1(input_path)
+            if sha1 == entry['sha1']:
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                skipped += 1
+                continue
+        todo[filename] = (input_path, output_path, stat)
+
+    print(f'共 {len(html_files)} 个 HTML 文件，未变化跳过 {skipped} 个，待处理 {len(todo)} 个')
+
+    # 多进程并行处理
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(process_file, input_path, output_path, base_url): filename
+                   for filename, (input_path, output_path, _) in todo.items()}
+        for future in as_completed(futures):
+            filename = futures[future]
+            input_path, output_path, stat = todo[filename]
+            try:
+                count = future.result()
+            except Exception as e:
+                print(f'❌ 处理失败：{filename}：{e}')
+                cache.pop(filename, None)
+                continue
+            cache[filename] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': file_sha1(input_path)}
+            print(f'✅ 处理完成：{filename} → {os.path.basename(output_path)}（{count} 个链接）')
+
+    # 删除已不存在的文件的记录
+    save_cache({name: info for name, info in cache.items() if name in html_files})
+
+
+def run_benchmark():
+    """在 input_folder 上对比 BeautifulSoup 与流式解析的速度，并校验链接完全一致"""
+    html_files = [os.path.join(input_folder, f) for f in os.listdir(input_folder) if f.lower().endswith('.html')]
+    contents = []
+    for path in html_files:
+        with open(path, 'r', encoding='utf-8') as f:
+            contents.append(f.read())
+    total_mb = sum(len(c.encode('utf-8')) for c in contents) / 1024 / 1024
+    print(f'基准: {len(contents)} 个文件，{total_mb:.1f} MB')
+
+    start = time.perf_counter()
+    fast = [extract_links(c) for c in contents]
+    fast_elapsed = time.perf_counter() - start
+    print(f'流式解析（单进程）: {fast_elapsed:.2f} 秒')
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(extract_links, contents, chunksize=8))
+    print(f'流式解析（多进程）: {time.perf_counter() - start:.2f} 秒')
+
+    try:
+        start = time.perf_counter()
+        slow = [extract_links_bs4(c) for c in contents]
+        slow_elapsed = time.perf_counter() - start
+    except ImportError:
+        print('未安装 bs4，跳过 BeautifulSoup 对比')
+        return
+    print(f'BeautifulSoup（单进程）: {slow_elapsed:.2f} 秒，流式解析快 {slow_elapsed / fast_elapsed:.1f} 倍')
+    mismatches = sum(1 for a, b in zip(fast, slow) if set(a) != set(b))
+    print('✅ 链接与 BeautifulSoup 结果一致' if mismatches == 0 else f'❌ {mismatches} 个文件链接不一致')
+
 
-    print(f'✅ 处理完成：{filename} → {output_filename}')
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        run_benchmark()
+    else:
+        main()
@@ -1,7 +1,12 @@
 import os
 import shutil
 import sqlite3
-from typing import Tuple
+import stat
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Tuple
+
+from 空间回收 import compact_database
 
 # =============== 固定配置（按需修改）================
 DB_PATH: str = r"D:\火车采集器V10.28\Configuration\config.db3"
@@ -12,6 +17,12 @@ BACKUP_BEFORE_DELETE: bool = False  # 删除前备份数据库
 BACKUP_PATH: str = DB_PATH + ".bak"
 # 关联清理（建议开启）：删除前先清理引用 JobId 的相关表
 CLEAN_RELATED: bool = True
+# 同时删除 Data 目录下对应的 <JobId> 文件夹（含 SpiderResult.db3 及其 backup 快照）；也可运行时加 --purge
+PURGE_DATA_FOLDERS: bool = False
+DATA_DIR: str = r"D:\火车采集器V10.28\Data"
+PURGE_WORKERS: int = 8             # 并行删除文件夹的线程数
+# 删除后整理数据库文件（VACUUM INTO 临时文件后替换），采集器正在使用 config.db3 时会自动放弃
+COMPACT_AFTER_DELETE: bool = False
 # ====================================================
 
 
@@ -39,12 +50,62 @@ def count_rows(conn: sqlite3.Connection, sql: str, params: Tuple) -> int:
 
 
 def delete_range(conn: sqlite3.Connection, table: str, where: str, params: Tuple) -> int:
+    """删除记录（不提交，由调用方统一提交）"""
     cur = conn.cursor()
     cur.execute(f"DELETE FROM {table} WHERE {where}", params)
-    conn.commit()
     return cur.rowcount if cur.rowcount is not None else 0
 
 
+def find_data_folders(data_dir: str, start_id: int, end_id: int) -> List[Tuple[int, str, int]]:
+    """范围内存在的 Data/<JobId> 文件夹，返回 [(JobId, 路径, 占用字节数)]"""
+    folders = []
+    if not os.path.isdir(data_dir):
+        return folders
+    for job_id in range(start_id, end_id + 1):
+        path = os.path.join(data_dir, str(job_id))
+        if os.path.isdir(path):
+            folders.append((job_id, path, folder_size(path)))
+    return folders
+
+
+def folder_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove_readonly(func, path, _exc):
+    # Windows 下只读文件无法直接删除，去掉只读属性后重试
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+# Python 3.12 起 onerror 已弃用，改用 onexc（回调收到异常对象而不是 exc_info）
+_RMTREE_ERROR_HANDLER = {"onexc" if sys.version_info >= (3, 12) else "onerror": _remove_readonly}
+
+
+def purge_data_folders(folders: List[Tuple[int, str, int]], max_workers: int = PURGE_WORKERS) -> Tuple[int, List[Tuple[int, str]]]:
+    """并行删除文件夹，返回 (释放的字节数, [(失败的 JobId, 原因)])"""
+    freed, failed = 0, []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(shutil.rmtree, path, **_RMTREE_ERROR_HANDLER): (job_id, size)
+                   for job_id, path, size in folders}
+        for future in as_completed(futures):
+            job_id, size = futures[future]
+            try:
+                future.result()
+                freed += size
+            except OSError as e:
+                # 采集器正在使用该任务的数据库时会删除失败
+                failed.append((job_id, str(e)))
+    return freed, failed
+
+
 def main():
     start_id, end_id = validate_range(START_JOB_ID, END_JOB_ID)
 
@@ -64,8 +125,17 @@ def main():
     print(f"JobDatabase    待删: {to_delete_jobdb}")
     print(f"JobWebPost     待删: {to_delete_jobweb}")
 
+    purge = PURGE_DATA_FOLDERS or "--purge" in sys.argv[1:]
+    folders = find_data_folders(DATA_DIR, start_id, end_id) if purge else []
+    if purge:
+        folder_bytes = sum(size for _, _, size in folders)
+        print(f"Data 文件夹    待删: {len(folders)}（{folder_bytes / 1024 / 1024:.1f} MB）")
+
     if DRY_RUN:
+        for job_id, path, size in folders:
+            print(f"  [DRY-RUN] {path}  {size / 1024 / 1024:.2f} MB")
         print("DRY-RUN 预览结束：未执行删除")
+        conn.close()
         return
 
     ensure_backup(DB_PATH, BACKUP_PATH)
@@ -84,12 +154,24 @@ def main():
     print(f"已删除 Job: {d_job}")
     total_deleted += d_job
 
-    # 可选：VACUUM 回收空间（不必须）
-    # conn.execute("VACUUM")
-    # print("已执行 VACUUM")
-
+    conn.commit()
+    conn.close()
     print(f"完成。总删除记录数（含关联表）: {total_deleted}")
 
+    if folders:
+        freed, failed = purge_data_folders(folders)
+        for job_id, reason in failed:
+            print(f"❌ Data/{job_id} 删除失败: {reason}")
+        print(f"已删除 Data 文件夹: {len(folders) - len(failed)} 个，释放 {freed / 1024 / 1024:.1f} MB")
+
+    # 可选：回收删除后留下的空闲页
+    if COMPACT_AFTER_DELETE:
+        result = compact_database(DB_PATH, min_ratio=0.0, min_free_bytes=0, drop_backups=False)
+        if result["status"] == "compacted":
+            print(f"已整理数据库，回收 {(result['before'] - result['after']) / 1024:.1f} KB")
+        elif result["error"]:
+            print(f"整理数据库{'失败' if result['status'] == 'failed' else '跳过'}: {result['error']}")
+
 
 if __name__ == "__main__":
     main()
@@ -3,6 +3,11 @@ import sqlite3
 import xml.etree.ElementTree as ET
 from typing import List, Optional, Tuple
 import re
+from functools import partial
+
+from 任务库 import fetch_jobs_in_range, write_jobs
+from 任务模板 import JobXmlTemplate
+from 分类键 import CategoryFileIndex
 
 # ================ 固定配置（按需修改）================
 DB_PATH: str = r"D:\火车采集器V10.28\Configuration\config.db3"
@@ -13,6 +18,8 @@ LINKS_DIR: str = r"D:\project\adameve\链接"  # 目录内放置txt（当 START_
 USE_FILE_PREFIX: bool = True      # 是否在路径前加 #FILE#（当 START_ADDRESS_USE_CATEGORY=False 时生效）
 START_ADDRESS_USE_CATEGORY: bool = False  # True: <StartAddress> 使用分类名；False: 使用 txt 绝对路径
 DRY_RUN: bool = False              # 预览/不落库
+USE_XML_TEMPLATE: bool = True      # True: 同一模板的任务只完整解析一次XML，其余按插槽渲染
+BULK_MODE: bool = True             # True: 一次读取范围内任务，全部在一个事务中写回；False: 逐个查询、逐个提交
 # ====================================================
 
 
@@ -47,46 +54,19 @@ def list_txt_files(dir_path: str) -> List[str]:
     return files
 
 
-def _cat_to_filename_base(cat: str) -> str:
-    """将分类名转换为期望的文件名（不含扩展名）的基名。
-    规则：将 '|||' 替换为 '___'。
-    """
-    return cat.replace('|||', '___')
-
-
 def _build_category_to_txt_map(categories: List[str], dir_path: str) -> dict:
     """将分类名与同名（或按规则转换后的同名）的 txt 文件一一匹配。
     匹配优先级：
       1) 文件名(不含扩展名) == 分类名
-      2) 文件名(不含扩展名) == 将分类名中的 '|||' 替换为 '___'
-    均为区分大小写的精确匹配。
+      2) 文件名(不含扩展名) == 标准文件名（'|||' 替换为 '_'，非法字符替换为 '-'）
+      3) 归一化后相同（忽略大小写，'_' 与 '___' 视为相同）
     """
-    if not os.path.isdir(dir_path):
-        raise NotADirectoryError(f"目录不存在: {dir_path}")
-
-    # 以文件名为键，值为绝对路径
-    file_name_to_path = {}
-    for name in os.listdir(dir_path):
-        if not name.lower().endswith('.txt'):
-            continue
-        base = os.path.splitext(name)[0]
-        file_name_to_path[base] = os.path.abspath(os.path.join(dir_path, name))
-
-    mapping = {}
-    missing = []
-    for cat in categories:
-        transformed = _cat_to_filename_base(cat)
-        if cat in file_name_to_path:
-            mapping[cat] = file_name_to_path[cat]
-        elif transformed in file_name_to_path:
-            mapping[cat] = file_name_to_path[transformed]
-        else:
-            missing.append((cat, transformed))
+    mapping, missing = CategoryFileIndex.for_directory(dir_path).match(categories)
 
     if missing:
-        hint = "\n".join([f" ___分类: {m[0]}  期望文件名: {m[1]}.txt" for m in missing])
+        hint = "\n".join([f" 分类: {m[0]}  期望文件名: {m[1]}.txt" for m in missing])
         raise ValueError(
-            "以下分类未找到匹配的 txt 文件（需与分类同名或将 '|||' 替换为 '___'）：\n" + hint
+            "以下分类未找到匹配的 txt 文件（需与分类同名或将 '|||' 替换为 '_'）：\n" + hint
         )
 
     return mapping
@@ -150,6 +130,16 @@ def main():
     conn.row_factory = sqlite3.Row
 
     processed = 0
+    pending_updates = []
+    pending_info = {}
+    jobs = fetch_jobs_in_range(conn, START_JOB_ID, END_JOB_ID) if BULK_MODE else None
+    full_render = partial(
+        update_xml_fields,
+        use_file_prefix=USE_FILE_PREFIX,
+        use_category_for_start=START_ADDRESS_USE_CATEGORY,
+    )
+    xml_template = JobXmlTemplate(full_render, manual_string=False)
+    render_xml = xml_template.render if USE_XML_TEMPLATE else full_render
     for index, job_id in enumerate(range(START_JOB_ID, END_JOB_ID + 1)):
         category = categories[index]
         if START_ADDRESS_USE_CATEGORY:
@@ -159,19 +149,13 @@ def main():
             txt_abs = category_to_txt[category]
             start_addr_display = (("#FILE#" if USE_FILE_PREFIX else '') + txt_abs)
 
-        row = fetch_job_by_id(conn, job_id)
+        row = jobs.get(job_id) if BULK_MODE else fetch_job_by_id(conn, job_id)
         if row is None:
             print(f"警告：JobId={job_id} 不存在，跳过")
             continue
 
         try:
-            new_xml = update_xml_fields(
-                row['XmlData'] or "<root></root>",
-                category,
-                txt_abs,
-                use_file_prefix=USE_FILE_PREFIX,
-                use_category_for_start=START_ADDRESS_USE_CATEGORY,
-            )
+            new_xml = render_xml(row['XmlData'] or "<root></root>", category, txt_abs)
         except Exception as e:
             print(f"JobId={job_id} 更新XML失败：{e}")
             continue
@@ -183,10 +167,27 @@ def main():
             processed += 1
             continue
 
+        if BULK_MODE:
+            pending_updates.append((job_id, category, new_xml))
+            pending_info[job_id] = (category, start_addr_display)
+            continue
+
         update_job_record(conn, job_id, category, new_xml)
         processed += 1
         print(f"已更新 JobId={job_id}，JobName='{category}'，StartAddress= {start_addr_display}")
 
+    if pending_updates:
+        done, failed = write_jobs(conn, pending_updates)
+        for job_id in done:
+            category, start_addr_display = pending_info[job_id]
+            print(f"已更新 JobId={job_id}，JobName='{category}'，StartAddress= {start_addr_display}")
+        for job_id, reason in failed:
+            print(f"JobId={job_id} 写入失败：{reason}，已单独回滚")
+        processed += len(done)
+    conn.close()
+
+    if USE_XML_TEMPLATE:
+        print(f"XML模板: {xml_template.stats()}")
     print(f"\n完成：共处理 {processed} 条（目标 {job_count} 条）")
 
 
@@ -1,6 +1,9 @@
 import os 
-import sqlite3 
-import shutil 
+
+from 数据库备份 import backup_database
+from 撤销日志 import new_run_id, record_before_images, start_run
+from 数据目录清单 import list_range_databases
+from 连接工厂 import connect
  
 # 设置总目录路径 
 base_dir = r"D:\火车采集器V10.28\Data"  # <<< 替换为你的路径 
@@ -8,58 +11,47 @@ base_dir = r"D:\火车采集器V10.28\Data"  # <<< 替换为你的路径
 # 设置文件夹数字范围（含） 
 start_num = 1711
 end_num = 1892
+
+# 本次运行编号：删除的行记入撤销日志，可用 python 撤销日志.py --rollback <编号> 恢复
+run_id = new_run_id("去重")
+print(f"撤销日志运行编号：{run_id}")
  
 # 遍历文件夹 
-for folder_name in os.listdir(base_dir): 
-    if folder_name.isdigit(): 
-        folder_num = int(folder_name) 
-        if start_num <= folder_num <= end_num: 
-            folder_path = os.path.join(base_dir, folder_name) 
-            db_path = os.path.join(folder_path, "SpiderResult.db3") 
- 
-            if os.path.isfile(db_path): 
-                print(f"\n📂 正在处理：{folder_name}/SpiderResult.db3") 
-                backup_path = os.path.join(folder_path, "SpiderResult_backup.db3") 
- 
-                # 备份数据库文件 
-                if not os.path.exists(backup_path): 
-                    shutil.copyfile(db_path, backup_path) 
-                    print("✅ 已备份为 SpiderResult_backup.db3") 
-                else: 
-                    print("⚠️ 备份已存在，跳过备份") 
- 
-                try: 
-                    conn = sqlite3.connect(db_path) 
-                    cursor = conn.cursor() 
- 
-                    # 备份 Content 表 
-                    cursor.execute("DROP TABLE IF EXISTS Content_backup") 
-                    cursor.execute("CREATE TABLE Content_backup AS SELECT * FROM Content") 
-                    print("✅ 已创建 Content_backup 表") 
- 
-                    # 删除重复 SKU，仅保留 ID 最小的那条 
-                    cursor.execute(""" 
-                        DELETE FROM Content 
-                        WHERE ID NOT IN ( 
-                            SELECT MIN(ID) 
-                            FROM Content 
-                            GROUP BY SKU 
-                        ) 
-                    """) 
-                    dup_deleted = cursor.rowcount  # 统计删除的行数
-                    print(f"✅ 去重完成，删除 {dup_deleted} 条重复数据") 
- 
-                    # 删除 图片 字段为空或 NULL 的行 
-                    cursor.execute(""" 
-                        DELETE FROM Content 
-                        WHERE 图片 IS NULL OR TRIM(图片) = '' 
-                    """) 
-                    img_deleted = cursor.rowcount  # 统计删除的行数
-                    print(f"✅ 已删除 {img_deleted} 条图片为空的数据") 
- 
-                    conn.commit() 
-                    conn.close() 
-                except Exception as e: 
-                    print(f"❌ 处理失败：{e}") 
-            else: 
-                print(f"❌ 未找到文件：{db_path}") 
+for folder_num, db_path in list_range_databases(base_dir, start_num, end_num):
+    print(f"\n📂 正在处理：{folder_num}/SpiderResult.db3") 
+
+    # 备份数据库文件（压缩快照，内容未变时跳过）
+    result = backup_database(db_path)
+    if result["status"] == "created":
+        print(f"✅ 已备份为 {os.path.basename(result['path'])}")
+    elif result["status"] == "unchanged":
+        print("⚠️ 数据库内容未变化，沿用已有备份")
+    else:
+        print(f"❌ 备份失败，跳过：{result['error']}")
+        continue
+
+    try: 
+        conn = connect(db_path, "bulk-write") 
+        cursor = conn.cursor() 
+
+        # 只把将要删除的行记入撤销日志（代替整表复制的 Content_backup）
+        start_run(conn, run_id, "去重")
+        dup_where = "ID NOT IN (SELECT MIN(ID) FROM Content GROUP BY SKU)"
+        record_before_images(conn, run_id, "delete", dup_where)
+
+        # 删除重复 SKU，仅保留 ID 最小的那条 
+        cursor.execute(f"DELETE FROM Content WHERE {dup_where}")
+        dup_deleted = cursor.rowcount  # 统计删除的行数
+        print(f"✅ 去重完成，删除 {dup_deleted} 条重复数据") 
+
+        # 删除 图片 字段为空或 NULL 的行 
+        empty_img_where = "图片 IS NULL OR TRIM(图片) = ''"
+        record_before_images(conn, run_id, "delete", empty_img_where)
+        cursor.execute(f"DELETE FROM Content WHERE {empty_img_where}")
+        img_deleted = cursor.rowcount  # 统计删除的行数
+        print(f"✅ 已删除 {img_deleted} 条图片为空的数据") 
+
+        conn.commit() 
+        conn.close() 
+    except Exception as e: 
+        print(f"❌ 处理失败：{e}") 
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 任务库 import clone_jobs
+
+
+def make_config(job_database_sql: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(f"""
+        CREATE TABLE Job (JobId INTEGER PRIMARY KEY, JobName TEXT, XmlData TEXT, Other TEXT);
+        {job_database_sql};
+        CREATE TABLE JobWebPost (Id INTEGER PRIMARY KEY AUTOINCREMENT, JobId INTEGER, Url TEXT);
+        INSERT INTO Job VALUES (1, '模板', '<Job/>', 'x');
+        INSERT INTO JobWebPost (JobId, Url) VALUES (1, 'http://post');
+    """)
+    conn.commit()
+    return conn
+
+
+class CloneJobsTest(unittest.TestCase):
+    def test_related_table_with_autoincrement_key(self):
+        conn = make_config("CREATE TABLE JobDatabase (Id INTEGER PRIMARY KEY AUTOINCREMENT, JobId INTEGER, Conn TEXT)")
+        conn.execute("INSERT INTO JobDatabase (JobId, Conn) VALUES (1, 'db')")
+        conn.commit()
+        self.assertEqual(clone_jobs(conn, 1, [("新任务", "<Job/>")]), [2])
+        self.assertEqual(conn.execute("SELECT Conn FROM JobDatabase WHERE JobId = 2").fetchall(), [("db",)])
+        self.assertEqual(conn.execute("SELECT Url FROM JobWebPost WHERE JobId = 2").fetchall(), [("http://post",)])
+
+    def test_related_table_keyed_by_job_id(self):
+        conn = make_config("CREATE TABLE JobDatabase (JobId INTEGER PRIMARY KEY, Conn TEXT)")
+        conn.execute("INSERT INTO JobDatabase VALUES (1, 'db')")
+        conn.commit()
+        self.assertEqual(clone_jobs(conn, 1, [("a", "<Job/>"), ("b", "<Job/>")]), [2, 3])
+        self.assertEqual(conn.execute("SELECT JobId, Conn FROM JobDatabase ORDER BY JobId").fetchall(),
+                         [(1, "db"), (2, "db"), (3, "db")])
+
+    def test_related_table_without_job_id_is_an_error(self):
+        conn = make_config("CREATE TABLE JobDatabase (Id INTEGER PRIMARY KEY, Conn TEXT)")
+        with self.assertRaises(ValueError):
+            clone_jobs(conn, 1, [("新任务", "<Job/>")])
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM Job").fetchone()[0], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 价格引擎 import PricingEngine
+from 变更跟踪 import install_tracking, mark_done, pending_where
+from 撤销日志 import new_run_id, record_before_images, rollback_run, start_run
+
+
+class ConvertOnceTest(unittest.TestCase):
+    """换算销售价的步骤在增量模式下只处理新采集的行"""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE Content (ID INTEGER PRIMARY KEY, 销售价 TEXT, 折扣价 TEXT, 颜色 TEXT)")
+        install_tracking(self.conn)
+        self.conn.executemany("INSERT INTO Content (销售价) VALUES (?)", [("1000",), ("1000",)])
+        self.conn.commit()
+        self.engine = PricingEngine(rate=0.5, default_discount=0.3, tiers=[], charm_ending=None,
+                                    convert_sale_price=True)
+
+    def run_step(self):
+        self.engine.apply(self.conn, row_filter=pending_where(self.conn, "折扣价", ops=("insert",)))
+        mark_done(self.conn, "折扣价")
+        self.conn.commit()
+
+    def prices(self):
+        return [float(p) for (p,) in self.conn.execute("SELECT 销售价 FROM Content ORDER BY ID")]
+
+    def test_other_updates_are_not_converted_again(self):
+        self.run_step()
+        self.conn.execute("UPDATE Content SET 颜色 = 'Red' WHERE ID = 1")
+        self.conn.commit()
+        self.run_step()
+        self.assertEqual(self.prices(), [500.0, 500.0])
+
+    def test_new_rows_are_converted(self):
+        self.run_step()
+        self.conn.execute("INSERT INTO Content (销售价) VALUES ('1000')")
+        self.conn.commit()
+        self.run_step()
+        self.assertEqual(self.prices(), [500.0, 500.0, 500.0])
+
+    def test_rows_restored_by_rollback_are_not_converted_again(self):
+        self.run_step()
+        run_id = new_run_id("删除")
+        start_run(self.conn, run_id, "删除")
+        record_before_images(self.conn, run_id, "delete", "ID = 2")
+        self.conn.execute("DELETE FROM Content WHERE ID = 2")
+        self.conn.commit()
+        rollback_run(self.conn, run_id)
+        self.conn.commit()
+        self.run_step()
+        self.assertEqual(self.prices(), [500.0, 500.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 商品链接索引 import CATEGORY_MAP_NAME, build_index, load_category_names, lookup, write_crawl_files
+
+
+class CategoryNameTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.links_dir = os.path.join(self.tmp.name, "链接")
+        self.output_dir = os.path.join(self.tmp.name, "输出")
+        self.index_path = os.path.join(self.tmp.name, "链接索引.db3")
+        os.makedirs(self.links_dir)
+        for name, links in (("Women_Tops.txt", ["https://a.com/p/1", "https://a.com/p/2"]),
+                            ("Sale.txt", ["https://a.com/p/1"]),
+                            ("Other.txt", ["https://a.com/p/1"])):
+            with open(os.path.join(self.links_dir, name), "w", encoding="utf-8") as f:
+                f.write("\n".join(links) + "\n")
+        self.category_file = os.path.join(self.tmp.name, "分类.txt")
+        with open(self.category_file, "w", encoding="utf-8") as f:
+            f.write("Women|||Tops\nSale\n")
+
+    def test_index_stores_category_names(self):
+        names = load_category_names(self.category_file, self.links_dir)
+        self.assertEqual(names, {"Women_Tops.txt": "Women|||Tops", "Sale.txt": "Sale"})
+        build_index(self.links_dir, self.index_path, category_names=names)
+        # 不在分类列表中的文件按文件名记录
+        self.assertEqual(lookup(self.index_path, "https://a.com/p/1"), ["Other", "Sale", "Women|||Tops"])
+
+        write_crawl_files(self.index_path, self.links_dir, self.output_dir)
+        with open(os.path.join(self.output_dir, CATEGORY_MAP_NAME), encoding="utf-8") as f:
+            fields = f.read().rstrip("\n").split("\t")
+        self.assertEqual(fields[0], "https://a.com/p/1")
+        self.assertEqual(sorted(fields[1:]), ["Other", "Sale", "Women|||Tops"])
+
+    def test_missing_category_file_falls_back_to_file_names(self):
+        self.assertEqual(load_category_names(os.path.join(self.tmp.name, "无.txt"), self.links_dir), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import 图片查重
+from 图片仓库 import ImageStore
+from 图片查重 import group_images, similar_representative, update_hashes
+
+GRAY = (128 << 16) | (128 << 8) | 128
+
+
+class StarGroupingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ImageStore(self.tmp.name)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(self.store.close)
+        # 建表；仓库是空的，不需要 Pillow
+        update_hashes(self.store)
+
+    def add(self, name: str, dhash: int, size: int, color: int = GRAY) -> None:
+        self.store.conn.execute("INSERT INTO blobs (sha256, path, bytes) VALUES (?, ?, ?)", (name, name, size))
+        self.store.conn.execute("INSERT INTO image_hash (sha256, dhash, color) VALUES (?, ?, ?)", (name, dhash, color))
+
+    def test_chain_does_not_join_distant_images(self):
+        # A 与 B 相差 4 位，B 与 C 相差 4 位，A 与 C 相差 8 位（超过 MAX_DISTANCE=6）
+        self.add("A", 0, 3000)
+        self.add("B", 0b1111, 2000)
+        self.add("C", 0b11111111, 1000)
+        self.assertEqual(图片查重.MAX_DISTANCE, 6)
+        groups = group_images(self.store)
+        self.assertEqual(groups["B"], "A")
+        self.assertNotEqual(groups.get("C"), "A")
+        self.assertIsNone(similar_representative(self.store, "C"))
+        self.assertEqual(similar_representative(self.store, "B"), "A")
+
+    def test_colour_variant_is_not_grouped(self):
+        self.add("red", 0, 2000, 200 << 16)
+        self.add("blue", 0, 1000, 200)
+        self.assertEqual(group_images(self.store), {})
+
+    def test_stale_group_is_verified(self):
+        # image_group 中的旧分组与哈希不符时不复用
+        self.add("A", 0, 3000)
+        self.add("C", 0b11111111, 1000)
+        self.store.conn.execute("INSERT INTO image_group (sha256, group_sha256) VALUES ('C', 'A')")
+        self.assertIsNone(similar_representative(self.store, "C"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 字段规则 import apply_to_database, compile_rules
+
+
+def chain(n):
+    """a → b → c 反复复制，中间把 a 转成大写"""
+    rules = []
+    for _ in range(n):
+        rules.append({"op": "copy", "from": "a", "to": "b", "skip_empty": True})
+        rules.append({"op": "transform", "name": "upper", "column": "a"})
+        rules.append({"op": "copy", "from": "b", "to": "c", "skip_empty": True})
+    return rules
+
+
+class FieldRulesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = os.path.join(self.tmp.name, "SpiderResult.db3")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE Content (a TEXT, b TEXT, c TEXT)")
+        conn.executemany("INSERT INTO Content VALUES (?, ?, ?)", [("x", "", ""), ("", "old", "keep")])
+        conn.commit()
+        conn.close()
+
+    def apply(self, rules, dry_run=False):
+        stages, referenced = compile_rules(rules)
+        return apply_to_database(self.db_path, stages, referenced, "test-run", dry_run)
+
+    def rows(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT a, b, c FROM Content ORDER BY rowid").fetchall()
+        finally:
+            conn.close()
+
+    def test_skip_empty_keeps_target(self):
+        counts = self.apply([{"op": "copy", "from": "a", "to": "b", "skip_empty": True}])
+        self.assertEqual(counts, {"b": 1})
+        self.assertEqual(self.rows(), [("x", "x", ""), ("", "old", "keep")])
+
+    def test_later_rules_read_earlier_results(self):
+        counts = self.apply(chain(2))
+        self.assertEqual(counts, {"b": 1, "a": 1, "c": 2})
+        self.assertEqual(self.rows(), [("X", "X", "X"), ("", "old", "old")])
+
+    def test_dry_run_counts_without_writing(self):
+        self.assertEqual(self.apply(chain(2), dry_run=True), {"b": 1, "a": 1, "c": 2})
+        self.assertEqual(self.rows(), [("x", "", ""), ("", "old", "keep")])
+
+    def test_chained_rules_do_not_nest_expressions(self):
+        stages, _ = compile_rules(chain(20))
+        longest = max(len(expr) for stage in stages for expr in stage.values())
+        self.assertLess(longest, 100)
+        self.apply(chain(20))
+        self.assertEqual(self.rows(), [("X", "X", "X"), ("", "old", "old")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 数据库备份 import backup_database, restore_snapshot
+
+
+def names(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [name for (name,) in conn.execute("SELECT name FROM Content ORDER BY name")]
+    finally:
+        conn.close()
+
+
+class BackupTest(unittest.TestCase):
+    def test_commits_still_in_wal_are_backed_up(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "SpiderResult.db3")
+            conn = sqlite3.connect(db_path)
+            self.addCleanup(conn.close)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA wal_autocheckpoint=0")
+            conn.execute("CREATE TABLE Content (name TEXT)")
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.assertEqual(backup_database(db_path, compression="none")["status"], "created")
+            # 提交只写入 -wal，主文件大小和修改时间都不变
+            conn.execute("INSERT INTO Content VALUES ('new')")
+            conn.commit()
+            result = backup_database(db_path, compression="none")
+            self.assertEqual(result["status"], "created")
+            self.assertEqual(names(result["path"]), ["new"])
+            conn.close()
+
+
+class RestoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        source = os.path.join(self.tmp.name, "source.db3")
+        conn = sqlite3.connect(source)
+        conn.execute("CREATE TABLE Content (name TEXT)")
+        conn.execute("INSERT INTO Content VALUES ('snapshot')")
+        conn.commit()
+        conn.close()
+        self.snapshot = backup_database(source, compression="none")["path"]
+        self.db_path = os.path.join(self.tmp.name, "SpiderResult.db3")
+
+    def make_crashed_wal_db(self):
+        """模拟 bulk-write 运行中途崩溃：数据库旁留下含已提交帧的 -wal"""
+        live = os.path.join(self.tmp.name, "live.db3")
+        conn = sqlite3.connect(live)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA wal_autocheckpoint=0")
+        conn.execute("CREATE TABLE Content (name TEXT)")
+        conn.executemany("INSERT INTO Content VALUES (?)", [(f"stale{i}",) for i in range(200)])
+        conn.commit()
+        for suffix in ("", "-wal", "-shm"):
+            shutil.copyfile(live + suffix, self.db_path + suffix)
+        conn.close()
+
+    def test_restore_over_leftover_wal(self):
+        self.make_crashed_wal_db()
+        restore_snapshot(self.snapshot, self.db_path)
+        self.assertFalse(os.path.exists(self.db_path + "-wal"))
+        self.assertEqual(names(self.db_path), ["snapshot"])
+
+    def test_refuse_restore_while_database_is_open(self):
+        self.make_crashed_wal_db()
+        conn = sqlite3.connect(self.db_path)
+        self.addCleanup(conn.close)
+        conn.execute("SELECT COUNT(*) FROM Content").fetchone()
+        with self.assertRaises(RuntimeError):
+            restore_snapshot(self.snapshot, self.db_path)
+        self.assertFalse(os.path.exists(self.db_path + ".restore.tmp"))
+        self.assertEqual(len(names(self.db_path)), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import 空间回收
+from 空间回收 import compact_database
+
+
+class VacuumIntoTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(setattr, 空间回收, "LOCK_TIMEOUT", 空间回收.LOCK_TIMEOUT)
+        空间回收.LOCK_TIMEOUT = 0.1
+        self.db_path = os.path.join(self.tmp.name, "config.db3")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE Job (JobId INTEGER PRIMARY KEY, XmlData TEXT)")
+        conn.executemany("INSERT INTO Job (XmlData) VALUES (?)", [("x" * 500,) for _ in range(4000)])
+        conn.commit()
+        conn.execute("DELETE FROM Job WHERE JobId % 2 = 0")
+        conn.commit()
+        conn.close()
+
+    def compact(self, **kwargs):
+        return compact_database(self.db_path, min_ratio=0.0, min_free_bytes=0, drop_backups=False, **kwargs)
+
+    def test_idle_connection_sees_compacted_file(self):
+        idle = sqlite3.connect(self.db_path)
+        self.addCleanup(idle.close)
+        idle.execute("SELECT COUNT(*) FROM Job").fetchone()
+        result = self.compact(mode="incremental")
+        self.assertEqual(result["status"], "compacted")
+        self.assertLess(result["after"], result["before"])
+        # 已打开的连接继续写入的是整理后的文件
+        idle.execute("INSERT INTO Job (XmlData) VALUES ('new')")
+        idle.commit()
+        idle.close()
+        conn = sqlite3.connect(self.db_path)
+        self.addCleanup(conn.close)
+        self.assertEqual(conn.execute("PRAGMA integrity_check").fetchone(), ("ok",))
+        self.assertEqual(conn.execute("PRAGMA auto_vacuum").fetchone(), (2,))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM Job").fetchone(), (2001,))
+
+    def test_skip_while_another_connection_is_reading(self):
+        reader = sqlite3.connect(self.db_path)
+        self.addCleanup(reader.close)
+        cursor = reader.execute("SELECT * FROM Job")
+        cursor.fetchone()
+        size = os.path.getsize(self.db_path)
+        result = self.compact()
+        self.assertEqual(result["status"], "skipped")
+        self.assertIsNotNone(result["error"])
+        self.assertEqual(os.path.getsize(self.db_path), size)
+        cursor.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 联合查询 import federated_query
+
+
+class FederatedQueryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.databases = []
+        for folder in (1, 2, 3):
+            path = os.path.join(self.tmp.name, f"{folder}.db3")
+            conn = sqlite3.connect(path)
+            conn.execute("CREATE TABLE Content (分类 TEXT)")
+            conn.executemany("INSERT INTO Content VALUES (?)", [(f"c{folder}-{i}",) for i in range(100)])
+            conn.commit()
+            conn.close()
+            self.databases.append((folder, path))
+
+    def test_all_rows_are_returned(self):
+        rows = list(federated_query(self.databases, "SELECT 分类 FROM {db}.Content", group_size=2))
+        self.assertEqual(len(rows), 300)
+        self.assertEqual(rows[0], (1, "c1-0"))
+
+    def test_unreadable_databases_are_skipped(self):
+        corrupt = os.path.join(self.tmp.name, "corrupt.db3")
+        with open(corrupt, "wb") as f:
+            f.write(b"not a database" * 512)
+        missing_table = os.path.join(self.tmp.name, "empty.db3")
+        sqlite3.connect(missing_table).close()
+        databases = [self.databases[0], (8, corrupt), (9, missing_table), self.databases[1]]
+        rows = list(federated_query(databases, "SELECT 分类 FROM {db}.Content", group_size=4))
+        self.assertEqual(sorted({row[0] for row in rows}), [1, 2])
+        self.assertEqual(len(rows), 200)
+
+    def test_consumer_can_stop_early(self):
+        rows = federated_query(self.databases, "SELECT 分类 FROM {db}.Content", group_size=2)
+        self.assertEqual(next(rows), (1, "c1-0"))
+        rows.close()
+
+    def test_interrupt_while_rows_are_pending(self):
+        # 中断时游标仍打开，DETACH 不能报 database is locked 掩盖原来的异常
+        rows = federated_query(self.databases, "SELECT 分类 FROM {db}.Content", group_size=2)
+        next(rows)
+        with self.assertRaises(KeyboardInterrupt):
+            rows.throw(KeyboardInterrupt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import 跨文件夹去重
+from 撤销日志 import rollback_run
+from 跨文件夹去重 import apply_category_merges, apply_copies, sweep
+
+
+class CrossFolderDedupTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name, value in (("MERGE_CATEGORIES", True), ("ACTION", "mark"), ("DRY_RUN", False)):
+            self.addCleanup(setattr, 跨文件夹去重, name, getattr(跨文件夹去重, name))
+            setattr(跨文件夹去重, name, value)
+        # 保留行所在的库没有 分类 列
+        self.databases = [
+            (1, self.make_db(1, "ID INTEGER PRIMARY KEY, PageUrl TEXT", [(1, "https://a.com/p")])),
+            (2, self.make_db(2, "ID INTEGER PRIMARY KEY, PageUrl TEXT, 分类 TEXT",
+                             [(1, "https://a.com/p/", "Women|||Tops"), (2, "https://a.com/q", "Sale")])),
+        ]
+
+    def make_db(self, folder, columns, rows):
+        path = os.path.join(self.tmp.name, f"{folder}.db3")
+        conn = sqlite3.connect(path)
+        conn.execute(f"CREATE TABLE Content ({columns})")
+        conn.executemany(f"INSERT INTO Content VALUES ({', '.join('?' * len(rows[0]))})", rows)
+        conn.commit()
+        conn.close()
+        return path
+
+    def query(self, folder, sql):
+        conn = sqlite3.connect(dict(self.databases)[folder])
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_merge_into_database_without_category_column(self):
+        _, pending_merge = sweep(self.databases)
+        self.assertEqual(pending_merge, {(1, 1): ["Women|||Tops"]})
+        self.assertEqual(apply_category_merges(self.databases, pending_merge), 1)
+        self.assertEqual(self.query(1, "SELECT 附加分类 FROM Content"), [("Women|||Tops",)])
+
+    def run_delete(self):
+        跨文件夹去重.ACTION = "delete"
+        copies_per_folder, pending_merge = sweep(self.databases)
+        failed = set()
+        apply_category_merges(self.databases, pending_merge, "run1", failed)
+        apply_copies(self.databases, copies_per_folder, "run1", failed)
+
+    def test_delete_is_recorded_in_undo_journal(self):
+        self.run_delete()
+        self.assertEqual(self.query(2, "SELECT ID FROM Content"), [(2,)])
+        for folder, db_path in self.databases:
+            conn = sqlite3.connect(db_path)
+            rollback_run(conn, "run1")
+            conn.commit()
+            conn.close()
+        self.assertEqual(self.query(2, "SELECT ID, 分类 FROM Content ORDER BY ID"),
+                         [(1, "Women|||Tops"), (2, "Sale")])
+        self.assertEqual(self.query(1, "SELECT 附加分类 FROM Content"), [("",)])
+
+    def test_copies_are_kept_when_category_merge_fails(self):
+        def fail(*args):
+            raise ValueError("merge failed")
+
+        self.addCleanup(setattr, 跨文件夹去重, "merge_category_lines", 跨文件夹去重.merge_category_lines)
+        跨文件夹去重.merge_category_lines = fail
+        self.run_delete()
+        self.assertEqual(self.query(2, "SELECT ID FROM Content ORDER BY ID"), [(1,), (2,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 链接规范化 import canonicalize_url
+
+
+class CanonicalizeQueryTest(unittest.TestCase):
+    def test_value_less_parameter_is_kept_as_is(self):
+        self.assertEqual(canonicalize_url("https://a.com/p?12345"), "https://a.com/p?12345")
+        self.assertEqual(canonicalize_url("https://a.com/p?b=1&flag"), "https://a.com/p?b=1&flag")
+
+    def test_percent_encoded_values_are_not_reencoded(self):
+        self.assertEqual(canonicalize_url("https://a.com/s?q=red%20shirt&size=S,M"),
+                         "https://a.com/s?q=red%20shirt&size=S,M")
+        self.assertEqual(canonicalize_url("https://a.com/s?q=a+b"), "https://a.com/s?q=a+b")
+
+    def test_tracking_parameters_are_dropped_and_rest_sorted(self):
+        self.assertEqual(canonicalize_url("HTTPS://A.com:443/p?utm_source=x&b=2&a=%2C&v=3#top"),
+                         "https://a.com/p?a=%2C&b=2")
+
+    def test_encoded_tracking_name_is_recognised(self):
+        self.assertEqual(canonicalize_url("https://a.com/p?utm%5Fsource=x&id=1"), "https://a.com/p?id=1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,12 +6,21 @@
 支持字段开关、图片本地上传或远程 URL、分类层级创建、发布后回写已发 和 PageUrl
 """
 
+import mimetypes
 import os
 import sqlite3
 import requests
 from requests.auth import HTTPBasicAuth
 import time
 from multiprocessing import Pool
+from urllib.parse import unquote, urlparse
+
+from 图片仓库 import ImageStore, file_sha256
+from 图片压缩 import CompressionCache
+from 图片查重 import similar_representative
+
+# 较旧的 Python/Windows 注册表里可能没有 webp，压缩后的文件按它确定文件名和 MIME 类型
+mimetypes.add_type("image/webp", ".webp")
 
 # ========== 配置区（请根据实际修改） ==========
 ROOT_DIR = r"D:\火车采集器V10.28\Data"  # 顶层文件夹，里面包含 0001/ 0002/ ...
@@ -36,6 +45,17 @@ SECRET = "cs_67adb16ea2138e00bf0f173bb189ba0a1cb33477"
 # 是否把本地图片上传到 WP 媒体库（True：上传；False：直接把本地路径当成 URL，通常会失败）
 UPLOAD_LOCAL_IMAGES = True
 
+# 本地图片仓库（图片仓库.py）目录：图片链接在仓库里有文件时直接上传本地文件，不再让 WooCommerce 远程抓取，
+# 并且同一张图片在本站只上传一次（之后按媒体 ID 引用）。None = 不使用
+IMAGE_STORE_DIR = r"D:\火车采集器V10.28\图片仓库"
+
+# 相似图片（图片查重.py 分组，如同一张图的不同尺寸、压缩质量）只上传组内最清晰的一张，其余复用。需要 IMAGE_STORE_DIR
+# 默认关闭：相似判断有误差，开启前先检查 图片重复组.csv
+REUSE_SIMILAR_IMAGES = False
+
+# 图片压缩.py 的缓存目录：图片已压缩过时上传压缩版本（先运行 python 图片压缩.py）。None = 上传原图
+COMPRESSED_DIR = r"D:\火车采集器V10.28\图片压缩"
+
 # SQLite 表信息
 DB_FILENAME = "SpiderResult.db3"
 TABLE_NAME = "Content"
@@ -44,6 +64,10 @@ TABLE_NAME = "Content"
 IMG_SEPARATOR = "|||"
 CAT_SEPARATOR = "|||"
 
+# 跨文件夹去重（跨文件夹去重.py）使用的列：标记为副本的记录跳过上传，附加分类一并绑定
+DUPLICATE_MARK_COLUMN = "重复来源"
+EXTRA_CATEGORY_COLUMN = "附加分类"
+
 # WooCommerce API endpoints
 API_PRODUCTS = f"{DOMAIN}/wp-json/wc/v3/products"
 API_CATEGORIES = f"{DOMAIN}/wp-json/wc/v3/products/categories"
@@ -187,17 +211,53 @@ def create_category_hierarchy(cat_string):
 
 
 # ---------- 图片上传相关 ----------
+_image_store = None
+_compression_cache = None
+
+
+def get_image_store():
+    """每个进程打开一次图片仓库；未配置或目录不存在时返回 None"""
+    global _image_store
+    if _image_store is None and IMAGE_STORE_DIR and os.path.isdir(IMAGE_STORE_DIR):
+        _image_store = ImageStore(IMAGE_STORE_DIR)
+    return _image_store
+
+
+def get_compression_cache():
+    """每个进程打开一次压缩缓存；未配置或目录不存在时返回 None"""
+    global _compression_cache
+    if _compression_cache is None and COMPRESSED_DIR and os.path.isdir(COMPRESSED_DIR):
+        _compression_cache = CompressionCache(COMPRESSED_DIR)
+    return _compression_cache
+
+
 def upload_local_image_get_url(image_path):
     """把本地图片上传到 WP 媒体库，返回上传后的 URL（permalink 或 source_url）"""
+    return upload_local_image(image_path)[1]
+
+
+def media_filename(original_name, image_path):
+    """上传到媒体库时使用的文件名：沿用原来的文件名（决定媒体标题和别名），
+    扩展名以实际上传的文件为准（无法识别时沿用原扩展名）"""
+    stem, ext = os.path.splitext(os.path.basename(original_name or ""))
+    path_stem, path_ext = os.path.splitext(os.path.basename(image_path))
+    if path_ext and mimetypes.guess_type("x" + path_ext)[0]:
+        ext = path_ext
+    return (stem or path_stem) + (ext or path_ext)
+
+
+def upload_local_image(image_path, filename=None):
+    """把本地图片上传到 WP 媒体库，返回 (媒体 ID, URL)，失败返回 (None, None)。
+    filename 为媒体库中的文件名，默认取本地文件名"""
     if not os.path.exists(image_path):
         print(f"图片不存在：{image_path}")
-        return None
+        return None, None
 
-    filename = os.path.basename(image_path)
+    filename = filename or os.path.basename(image_path)
     for attempt in range(1, MAX_RETRIES + 1):
         try:
             with open(image_path, "rb") as f:
-                files = {'file': (filename, f, 'image/jpeg')}
+                files = {'file': (filename, f, mimetypes.guess_type(filename)[0] or 'image/jpeg')}
                 headers = {
                     # WordPress 要求 Content-Disposition (requests 会自动处理 multipart)
                 }
@@ -206,13 +266,46 @@ def upload_local_image_get_url(image_path):
                 data = res.json()
                 # WordPress v2 media 返回 source_url 字段
                 url = data.get("source_url") or data.get("guid", {}).get("rendered")
-                return url
+                return data.get("id"), url
             else:
                 print(f"上传媒体失败（{attempt}）：{res.status_code} {res.text}")
         except Exception as e:
             print("上传媒体异常：", e)
         time.sleep(0.8 * attempt)
-    return None
+    return None, None
+
+
+def upload_image_once(image_path, sha256=None, original_name=None):
+    """上传本地图片，返回 images 条目（不含 position），失败返回 None。
+    使用图片仓库时，同一张图片（内容相同，或开启 REUSE_SIMILAR_IMAGES 时看起来相同）已上传过就直接引用媒体库里的那张。
+    original_name 为图片原来的文件名（仓库中的文件按哈希命名），媒体库里沿用它；默认取 image_path 的文件名"""
+    original_name = original_name or os.path.basename(image_path)
+    store = get_image_store()
+    compression = get_compression_cache()
+    if store is not None or compression is not None:
+        sha256 = sha256 or file_sha256(image_path)
+    if store is not None:
+        if REUSE_SIMILAR_IMAGES:
+            # 只有代表图片本身与这张图相似时才复用
+            representative = similar_representative(store, sha256)
+            representative_path = store.path_for(representative) if representative else None
+            if representative_path:
+                sha256, image_path = representative, representative_path
+        media = store.uploaded_media(sha256, DOMAIN)
+        if media:
+            media_id, url = media
+            return {"id": media_id} if media_id else {"src": url}
+
+    # 有压缩版本时上传压缩版本：文件名沿用原图的主名，扩展名和 MIME 类型换成压缩后的格式
+    compressed = compression.lookup(sha256) if compression is not None else None
+    upload_path = compressed or image_path
+    media_id, url = upload_local_image(upload_path, media_filename(original_name, upload_path))
+    if not url:
+        return None
+    if store is not None:
+        store.remember_upload(sha256, DOMAIN, media_id, url)
+    # 按媒体 ID 引用，WooCommerce 不会再把图片下载一遍生成新的媒体
+    return {"id": media_id} if media_id else {"src": url}
 
 
 def prepare_images_list(image_field_value, folder_base):
@@ -231,12 +324,21 @@ def prepare_images_list(image_field_value, folder_base):
     if not parts:
         return None
 
+    store = get_image_store() if UPLOAD_LOCAL_IMAGES else None
     images = []
     for idx, p in enumerate(parts):
         # 判断是 URL 还是本地相对路径
         if p.lower().startswith("http://") or p.lower().startswith("https://"):
-            # 远程图片 URL，直接交给 WooCommerce
-            images.append({"src": p, "position": idx})
+            # 图片仓库里已有这张图时上传本地文件，不用 WooCommerce 再去远程抓取
+            local_path = store.resolve(p) if store is not None else None
+            # 媒体库里沿用链接中的文件名（与 WooCommerce 远程抓取时一致），而不是仓库里的哈希文件名
+            original_name = unquote(os.path.basename(urlparse(p).path))
+            image = upload_image_once(local_path, store.sha256_for(p), original_name) if local_path else None
+            if image:
+                images.append({**image, "position": idx})
+            else:
+                # 远程图片 URL，直接交给 WooCommerce
+                images.append({"src": p, "position": idx})
         else:
             # 认为是本地文件名或相对路径
             local_path = os.path.join(folder_base, p)
@@ -247,9 +349,9 @@ def prepare_images_list(image_field_value, folder_base):
                     local_path = alt_path
 
             if os.path.exists(local_path) and UPLOAD_LOCAL_IMAGES:
-                url = upload_local_image_get_url(local_path)
-                if url:
-                    images.append({"src": url, "position": idx})
+                image = upload_image_once(local_path)
+                if image:
+                    images.append({**image, "position": idx})
                 else:
                     print(f"本地图片上传失败，尝试把路径当 URL 使用：{local_path}")
                     images.append({"src": local_path, "position": idx})
@@ -483,6 +585,12 @@ def build_product_payload(row, folder_base):
     # 分类（如果字段开启，会尝试创建/查找并绑定最底层分类）
     if FIELD_CONFIG.get("分类", True) and "分类" in row.keys() and row["分类"]:
         cat_ids = create_category_hierarchy(row["分类"])
+        # 跨文件夹去重合并过来的附加分类（每行一条分类路径）
+        if EXTRA_CATEGORY_COLUMN in row.keys() and row[EXTRA_CATEGORY_COLUMN]:
+            for extra_path in str(row[EXTRA_CATEGORY_COLUMN]).splitlines():
+                for cid in create_category_hierarchy(extra_path.strip()):
+                    if cid not in cat_ids:
+                        cat_ids.append(cid)
         if cat_ids:
             p["categories"] = [{"id": cid} for cid in cat_ids]
 
@@ -565,6 +673,12 @@ def process_folder(folder_path):
                 print(f"[进度] 已处理 {idx}/{total_rows} | 已上传 {uploaded} | 跳过 {skipped} | 失败 {failed} | 剩余 {remaining}")
                 continue
 
+            # 跨文件夹去重标记的副本，不再上传
+            if DUPLICATE_MARK_COLUMN in row.keys() and row[DUPLICATE_MARK_COLUMN]:
+                print(f"记录 {record_id} 是 {row[DUPLICATE_MARK_COLUMN]} 的跨文件夹副本，跳过。")
+                skipped += 1
+                continue
+
             # 若开启 SKU 检查，避免重复上传
             if FIELD_CONFIG.get("SKU", True) and "SKU" in row.keys() and row["SKU"]:
                 existing = product_exists_by_sku(row["SKU"])
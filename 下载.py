@@ -1,27 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商品图片批量下载
+读取文件夹范围内所有数据库 Content 表的 图片 字段（多张以 ||| 分隔），把其中的网络图片下载到本地：
+  - 设置了 IMAGE_STORE_DIR 时下载完成的文件放入图片仓库（图片仓库.py），内容相同的图片只存一份，
+    仓库里已有的链接不再下载
+  - 线程池并发下载，每个线程复用一个带连接池的 Session，按 CHUNK_SIZE 大块写盘
+  - 同一域名同时最多 PER_HOST_LIMIT 个请求，避免被图床限流
+  - 先写 .part 文件，中断后再次运行用 HTTP Range 续传（服务器不支持时整文件重下）
+  - 每个链接的状态记录在 SAVE_DIR 下的下载清单（SQLite），已完成且文件还在的直接跳过
+
+用法：
+  python 下载.py                  下载范围内所有图片
+  python 下载.py --retry-failed   只重试清单中失败的链接
+  python 下载.py --status         查看清单统计
+  python 下载.py <图片链接>        下载单张图片到当前目录
+"""
+
+import hashlib
 import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
 import requests
-from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 
-def download_image(url, save_dir="."):
+from 数据目录清单 import list_range_databases
+from 图片仓库 import ImageStore
+from 连接工厂 import connect
+from 链接规范化 import canonicalize_url
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+START_FOLDER: Optional[int] = 5211
+END_FOLDER: Optional[int] = 5523
+TABLE_NAME: str = "Content"
+IMAGE_COLUMN: str = "图片"
+IMG_SEPARATOR: str = "|||"
+
+SAVE_DIR: str = r"D:\火车采集器V10.28\图片"          # 图片保存目录（按文件夹编号分子目录；使用图片仓库时只放下载清单）
+MANIFEST_PATH: str = os.path.join(SAVE_DIR, "下载清单.db3")
+IMAGE_STORE_DIR: Optional[str] = r"D:\火车采集器V10.28\图片仓库"   # 图片仓库目录，None = 不使用仓库，按 SAVE_DIR 保存
+
+MAX_WORKERS: int = 16            # 下载线程数
+PER_HOST_LIMIT: int = 4          # 同一域名的最大并发请求数
+CHUNK_SIZE: int = 256 * 1024     # 每次读写的块大小（字节）
+TIMEOUT: Tuple[float, float] = (10, 60)   # (连接超时, 读取超时) 秒
+RETRIES: int = 3                 # 单个链接的重试次数（网络错误、5xx、429）
+USER_AGENT: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+# ====================================================
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+_ILLEGAL_NAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+_local = threading.local()
+_host_locks: Dict[str, threading.Semaphore] = {}
+_host_locks_guard = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """每个线程一个 Session，连接按域名复用（keep-alive）"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=PER_HOST_LIMIT, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = USER_AGENT
+        _local.session = session
+    return session
+
+
+def host_slot(url: str) -> threading.Semaphore:
+    host = urlparse(url).hostname or ""
+    with _host_locks_guard:
+        slot = _host_locks.get(host)
+        if slot is None:
+            slot = _host_locks[host] = threading.Semaphore(PER_HOST_LIMIT)
+        return slot
+
+
+def local_filename(url: str) -> str:
+    """由链接得到固定的本地文件名：原文件名 + 链接哈希前 8 位（不同链接同名的图片不会互相覆盖）"""
+    path = unquote(urlparse(url).path)
+    stem, ext = os.path.splitext(os.path.basename(path.rstrip("/")))
+    stem = _ILLEGAL_NAME_RE.sub("-", stem)[:80] or "image"
+    ext = ext.lower() if re.fullmatch(r"\.[a-z0-9]{1,5}", ext.lower()) else ".jpg"
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+    return f"{stem}_{digest}{ext}"
+
+
+# ---------- 下载清单 ----------
+def open_manifest(path: str = MANIFEST_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = connect(path, "bulk-write")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS downloads (
+            url TEXT PRIMARY KEY,
+            fetch_url TEXT NOT NULL,
+            folder INTEGER,
+            path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            bytes INTEGER,
+            http_status INTEGER,
+            etag TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_status ON downloads (status)")
+    conn.commit()
+    return conn
+
+
+def record_result(conn, result: Dict) -> None:
+    conn.execute(
+        "UPDATE downloads SET status = ?, path = COALESCE(?, path), bytes = ?, http_status = ?, "
+        "etag = COALESCE(?, etag), error = ?, attempts = attempts + ?, updated_at = datetime('now', 'localtime') "
+        "WHERE url = ?",
+        (result["status"], result.get("path"), result.get("bytes"), result.get("http_status"), result.get("etag"),
+         result.get("error"), result.get("attempts", 0), result["url"]),
+    )
+
+
+# ---------- 收集链接 ----------
+def iter_image_urls(db_path: str):
+    conn = connect(db_path, "read-only")
     try:
-        # 解析 URL 获取文件名
-        filename = os.path.basename(urlparse(url).path)
-        save_path = os.path.join(save_dir, filename)
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info("{TABLE_NAME}")')}
+        if IMAGE_COLUMN not in columns:
+            return
+        for (value,) in conn.execute(
+                f'SELECT "{IMAGE_COLUMN}" FROM "{TABLE_NAME}" WHERE "{IMAGE_COLUMN}" IS NOT NULL AND "{IMAGE_COLUMN}" != \'\''):
+            for part in str(value).split(IMG_SEPARATOR):
+                part = part.strip()
+                if part.lower().startswith(("http://", "https://")):
+                    yield part
+    finally:
+        conn.close()
+
+
+def collect_urls(conn, store: Optional[ImageStore] = None) -> Tuple[int, int]:
+    """把范围内所有图片链接登记到清单（已登记的不变），返回 (图片链接数, 新登记数)；
+    使用仓库时先下载到仓库的 tmp 目录"""
+    total = added = 0
+    for folder_num, db_path in list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER):
+        save_dir = store.tmp_dir if store else os.path.join(SAVE_DIR, str(folder_num))
+        rows = []
+        for url in iter_image_urls(db_path):
+            key = canonicalize_url(url)
+            rows.append((key, url, folder_num, os.path.join(save_dir, local_filename(key))))
+        total += len(rows)
+        before = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO downloads (url, fetch_url, folder, path) VALUES (?, ?, ?, ?)", rows)
+        added += conn.total_changes - before
+        conn.commit()
+    return total, added
 
-        # 发送 GET 请求
-        response = requests.get(url, stream=True, timeout=10)
-        response.raise_for_status()
 
-        # 保存图片
-        with open(save_path, "wb") as f:
-            for chunk in response.iter_content(1024):
-                f.write(chunk)
+def pending_jobs(conn, retry_failed: bool = False, store: Optional[ImageStore] = None) -> Tuple[List[Tuple], int]:
+    """待下载的链接；已完成且文件大小对得上的、仓库里已有的跳过，返回 (任务列表, 跳过数)"""
+    where = "status = 'failed'" if retry_failed else "1"
+    jobs, skipped = [], 0
+    for url, fetch_url, path, status, size, etag in conn.execute(
+            f"SELECT url, fetch_url, path, status, bytes, etag FROM downloads WHERE {where} ORDER BY folder, rowid").fetchall():
+        stored = store.resolve(url) if store else None
+        if stored:
+            if status != "done" or path != stored:
+                record_result(conn, {"url": url, "status": "done", "path": stored, "bytes": os.path.getsize(stored)})
+            skipped += 1
+            continue
+        if os.path.exists(path):
+            if status != "done":
+                # 文件已在（以前下载过但没有记录），直接记为完成
+                record_result(conn, {"url": url, "status": "done", "bytes": os.path.getsize(path)})
+                skipped += 1
+                continue
+            if os.path.getsize(path) == size:
+                skipped += 1
+                continue
+        jobs.append((url, fetch_url, path, etag))
+    conn.commit()
+    return jobs, skipped
 
+
+# ---------- 下载 ----------
+def fetch(url: str, fetch_url: str, path: str, etag: Optional[str] = None) -> Dict:
+    """下载一个链接到 path（经 .part 续传），返回结果字典，写清单由主线程完成"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    part_path = path + ".part"
+    result = {"url": url, "status": "failed", "attempts": 0}
+    for attempt in range(1, RETRIES + 1):
+        result["attempts"] = attempt
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if etag and not etag.startswith("W/"):
+                # 服务器上的文件变了就返回完整的 200，不会把新旧内容拼在一起
+                headers["If-Range"] = etag
+        try:
+            with host_slot(fetch_url):
+                with get_session().get(fetch_url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                    result["http_status"] = response.status_code
+                    result["etag"] = etag = response.headers.get("ETag") or etag
+                    if response.status_code == 416 and offset:
+                        # .part 已经是完整文件
+                        os.replace(part_path, path)
+                        result.update(status="done", path=path, bytes=offset, error=None)
+                        return result
+                    if response.status_code in RETRY_STATUS:
+                        raise requests.HTTPError(f"HTTP {response.status_code}")
+                    if response.status_code >= 400:
+                        result["error"] = f"HTTP {response.status_code}"
+                        return result
+                    mode = "ab" if response.status_code == 206 and offset else "wb"
+                    with open(part_path, mode, buffering=CHUNK_SIZE) as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+            size = os.path.getsize(part_path)
+            os.replace(part_path, path)
+            result.update(status="done", path=path, bytes=size, error=None)
+            return result
+        except (requests.RequestException, OSError) as e:
+            result["error"] = str(e)[:500]
+            if attempt < RETRIES:
+                # 最后一次失败后不再等待，直接返回结果
+                time.sleep(min(2 ** attempt, 30))
+    return result
+
+
+def download_image(url, save_dir="."):
+    """下载单张图片到 save_dir（文件名取链接中的文件名），返回保存路径，失败返回 None"""
+    filename = os.path.basename(urlparse(url).path) or local_filename(url)
+    save_path = os.path.join(save_dir, filename)
+    result = fetch(url, url, save_path)
+    if result["status"] == "done":
         print(f"✅ 已保存: {save_path}")
-    except Exception as e:
-        print(f"❌ 下载失败: {e}")
+        return save_path
+    print(f"❌ 下载失败: {result.get('error')}")
+    return None
+
+
+def run_downloads(conn, jobs: List[Tuple], store: Optional[ImageStore] = None) -> Tuple[int, int, int]:
+    """并发下载，返回 (成功数, 失败数, 下载字节数)；下载完成的文件由主线程放入仓库"""
+    done = failed = total_bytes = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = [pool.submit(fetch, *job) for job in jobs]
+        for index, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            if result["status"] == "done" and store:
+                try:
+                    _, result["path"] = store.add_file(result["path"], result["url"], move=True)
+                except OSError as e:
+                    result.update(status="failed", error=f"放入图片仓库失败: {e}")
+            record_result(conn, result)
+            if result["status"] == "done":
+                done += 1
+                total_bytes += result.get("bytes") or 0
+            else:
+                failed += 1
+                print(f"❌ {result['url']}：{result.get('error')}")
+            if index % 200 == 0 or index == len(jobs):
+                conn.commit()
+                elapsed = time.perf_counter() - started
+                print(f"[进度] {index}/{len(jobs)} | 成功 {done} | 失败 {failed} | "
+                      f"{total_bytes / 1024 / 1024:.1f} MB，{total_bytes / 1024 / 1024 / max(elapsed, 1e-6):.2f} MB/s")
+    conn.commit()
+    return done, failed, total_bytes
+
+
+def print_status(conn) -> None:
+    for status, count, size in conn.execute(
+            "SELECT status, COUNT(*), COALESCE(SUM(bytes), 0) FROM downloads GROUP BY status ORDER BY status"):
+        print(f"{status}: {count} 个，{size / 1024 / 1024:.1f} MB")
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0].lower().startswith(("http://", "https://")):
+        download_image(args[0], save_dir=".")
+        return
+
+    conn = open_manifest(MANIFEST_PATH)
+    store = ImageStore(IMAGE_STORE_DIR) if IMAGE_STORE_DIR else None
+    try:
+        if "--status" in args:
+            print_status(conn)
+            return
+        retry_failed = "--retry-failed" in args
+        print("=== 商品图片批量下载 ===")
+        print(f"保存目录: {SAVE_DIR}")
+        if store:
+            print(f"图片仓库: {store.store_dir}")
+        print(f"线程数: {MAX_WORKERS}，每域名并发: {PER_HOST_LIMIT}")
+        print("=" * 60)
+        if not retry_failed:
+            total, added = collect_urls(conn, store)
+            print(f"范围 {START_FOLDER}~{END_FOLDER} 共 {total} 个图片链接，新登记 {added} 个")
+        jobs, skipped = pending_jobs(conn, retry_failed, store)
+        print(f"已存在跳过 {skipped} 个，待下载 {len(jobs)} 个")
+        if not jobs:
+            return
+        done, failed, total_bytes = run_downloads(conn, jobs, store)
+        print(f"✅ 完成：成功 {done}，失败 {failed}，共 {total_bytes / 1024 / 1024:.1f} MB")
+        if failed:
+            print("失败的链接可用 python 下载.py --retry-failed 重试")
+    finally:
+        if store:
+            store.close()
+        conn.close()
 
 
 if __name__ == "__main__":
-    url = "https://m.media-amazon.com/images/S/gestalt-seller-images-prod-us-east-1/ATVPDKIKX0DER/A3BI9ERHVFO7XC/c4c528e2b9ea4a40fcd35ed38d751438.png"
-    download_image(url, save_dir=".")
+    main()
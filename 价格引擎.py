@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+价格引擎
+把价格字符串解析注册为 SQLite 函数（支持 "$1,299.00"、"HK$ 1.299,00"、"12.5 - 15" 等格式），
+在一条 UPDATE 中完成汇率换算、按分类分档折扣和尾数定价（.99），每个数据库只执行一次。
+DRY_RUN 时只输出换算前后的价格分布，不修改数据库。
+
+注意：CURRENCY_RATE != 1 且 CONVERT_SALE_PRICE=True 时，销售价会被改写为换算后的价格，
+重复执行会重复换算；误操作可用 python 撤销日志.py --rollback <编号> 恢复。
+"""
+
+import math
+import re
+import sqlite3
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from 撤销日志 import new_run_id, record_before_images, start_run
+from 数据目录清单 import list_range_databases as list_range_entries
+from 连接工厂 import connect
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+START_FOLDER: int = 5211
+END_FOLDER: int = 5523
+
+CURRENCY_RATE: float = 1.0          # 销售价换算汇率（原币 → 目标币），1 表示不换算
+CONVERT_SALE_PRICE: bool = False    # True: 把换算后的价格写回 销售价
+DEFAULT_DISCOUNT: float = 0.3       # 折扣价 = 销售价 × 折扣率（未命中分档时使用）
+
+# 分类分档折扣：(分类前缀, 折扣率)，按前缀最长优先匹配 分类 字段
+DISCOUNT_TIERS: List[Tuple[str, float]] = [
+    # ("Accessories", 0.5),
+    # ("Women|||Dresses", 0.25),
+]
+
+CHARM_ENDING: Optional[float] = 0.99  # 尾数定价：折扣价取不低于原值的 X.99；None 表示只保留两位小数
+CHARM_SALE_PRICE: bool = False        # 销售价是否也做尾数定价
+
+DRY_RUN: bool = True                  # True: 只显示价格分布，不修改数据库
+# ====================================================
+
+# 价格分布的分段边界
+DISTRIBUTION_EDGES = [0, 10, 25, 50, 100, 200, 500, 1000]
+
+_NUMBER_PATTERN = re.compile(r"\d[\d.,\s']*")
+
+
+@lru_cache(maxsize=65536)
+def parse_price(text) -> Optional[float]:
+    """从价格字符串中解析出第一个数值，无法解析返回 None
+
+    千分位与小数点的判断：同时出现 ',' 和 '.' 时以最后出现的为小数点；
+    只有一种分隔符时，若其后恰好 1~2 位数字且只出现一次则视为小数点，否则视为千分位。
+    """
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _NUMBER_PATTERN.search(str(text))
+    if not match:
+        return None
+    token = re.sub(r"[\s']", "", match.group(0)).rstrip(".,")
+
+    if "," in token and "." in token:
+        decimal = "," if token.rfind(",") > token.rfind(".") else "."
+    elif "," in token or "." in token:
+        sep = "," if "," in token else "."
+        tail = token.rsplit(sep, 1)[1]
+        decimal = sep if token.count(sep) == 1 and 1 <= len(tail) <= 2 else None
+    else:
+        decimal = None
+
+    thousands = {",", "."} - {decimal}
+    for sep in thousands:
+        token = token.replace(sep, "")
+    if decimal:
+        token = token.replace(decimal, ".")
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def charm_round(value: Optional[float], ending: Optional[float] = CHARM_ENDING) -> Optional[float]:
+    """尾数定价：取不低于原值的 X.99（ending=0.99）；低于 ending 的价格只保留两位小数"""
+    if value is None:
+        return None
+    value = round(value, 2)
+    if ending is None or value < ending:
+        return value
+    return round(math.ceil(value - ending) + ending, 2)
+
+
+class PricingEngine:
+    """价格规则：汇率 + 分类分档折扣 + 尾数定价，编译为单条 UPDATE"""
+
+    def __init__(self, rate: float = CURRENCY_RATE, default_discount: float = DEFAULT_DISCOUNT,
+                 tiers: Sequence[Tuple[str, float]] = DISCOUNT_TIERS, charm_ending: Optional[float] = CHARM_ENDING,
+                 convert_sale_price: bool = CONVERT_SALE_PRICE, charm_sale_price: bool = CHARM_SALE_PRICE):
+        self.rate = rate
+        self.default_discount = default_discount
+        # 前缀越长越具体，优先匹配
+        self.tiers = sorted(tiers, key=lambda t: len(t[0]), reverse=True)
+        self.charm_ending = charm_ending
+        self.convert_sale_price = convert_sale_price
+        self.charm_sale_price = charm_sale_price
+
+    def register(self, conn: sqlite3.Connection) -> None:
+        """在连接上注册价格解析和尾数定价函数"""
+        conn.create_function("parse_price", 1, parse_price, deterministic=True)
+        conn.create_function("charm_price", 1, lambda v: charm_round(v, self.charm_ending), deterministic=True)
+
+    def discount_expr(self) -> Tuple[str, list]:
+        """分类分档折扣率的 CASE 表达式及其参数"""
+        if not self.tiers:
+            return "?", [self.default_discount]
+        parts, params = [], []
+        for prefix, rate in self.tiers:
+            parts.append('WHEN substr("分类", 1, length(?)) = ? THEN ?')
+            params.extend([prefix, prefix, rate])
+        params.append(self.default_discount)
+        return "(CASE " + " ".join(parts) + " ELSE ? END)", params
+
+    def sale_price_expr(self) -> Tuple[str, list]:
+        """新销售价的表达式及其参数"""
+        base = "(parse_price(\"销售价\") * ?)"
+        return (f"charm_price({base})" if self.charm_sale_price else f"round({base}, 2)"), [self.rate]
+
+    def discount_price_expr(self, has_category: bool) -> Tuple[str, list]:
+        """新折扣价的表达式及其参数：换算后的销售价 × 分档折扣率，再做尾数定价"""
+        if has_category:
+            discount, discount_params = self.discount_expr()
+        else:
+            discount, discount_params = "?", [self.default_discount]
+        return f"charm_price((parse_price(\"销售价\") * ?) * {discount})", [self.rate, *discount_params]
+
+    def apply(self, conn: sqlite3.Connection, run_id: Optional[str] = None, row_filter: str = "1") -> int:
+        """执行定价 UPDATE，返回更新行数；传入 run_id 时先把命中行记入撤销日志
+
+        row_filter 为附加的 WHERE 条件（如变更跟踪给出的待处理行），默认全表
+        """
+        self.register(conn)
+        disc, disc_params = self.discount_price_expr(_has_category(conn))
+        where = f"({row_filter}) AND parse_price(\"销售价\") IS NOT NULL"
+
+        if run_id:
+            start_run(conn, run_id, "折扣价")
+            record_before_images(conn, run_id, "update", where)
+
+        if self.convert_sale_price:
+            sale, sale_params = self.sale_price_expr()
+            sql = f"UPDATE Content SET 销售价 = printf('%.2f', {sale}), 折扣价 = printf('%.2f', {disc}) WHERE {where}"
+            cur = conn.execute(sql, [*sale_params, *disc_params])
+        else:
+            sql = f"UPDATE Content SET 折扣价 = printf('%.2f', {disc}) WHERE {where}"
+            cur = conn.execute(sql, disc_params)
+        return cur.rowcount
+
+    def distribution(self, conn: sqlite3.Connection) -> Dict[str, List[int]]:
+        """统计换算前后的价格分布：{"销售价(前)": [...], "销售价(后)": [...], "折扣价(前)": [...], "折扣价(后)": [...], ...}"""
+        self.register(conn)
+        disc, disc_params = self.discount_price_expr(_has_category(conn))
+        if self.convert_sale_price:
+            new_sale, sale_params = self.sale_price_expr()
+        else:
+            new_sale, sale_params = "parse_price(\"销售价\")", []
+
+        result = {}
+        for label, expr, expr_params in (
+            ("销售价(前)", "parse_price(\"销售价\")", []),
+            ("销售价(后)", new_sale, sale_params),
+            ("折扣价(前)", "parse_price(\"折扣价\")", []),
+            ("折扣价(后)", disc, disc_params),
+        ):
+            counts = [0] * (len(DISTRIBUTION_EDGES) + 1)  # 最后一格为无法解析
+            for bucket, count in conn.execute(
+                f"SELECT {_bucket_expr(expr)}, COUNT(*) FROM Content GROUP BY 1", expr_params * len(DISTRIBUTION_EDGES)
+            ):
+                counts[bucket] += count
+            result[label] = counts
+        result["无法解析"] = [conn.execute("SELECT COUNT(*) FROM Content WHERE parse_price(\"销售价\") IS NULL").fetchone()[0]]
+        return result
+
+
+def _has_category(conn: sqlite3.Connection) -> bool:
+    return "分类" in [col[1] for col in conn.execute("PRAGMA table_info(Content)")]
+
+
+def _bucket_expr(expr: str) -> str:
+    """把数值表达式映射为分段下标；NULL 映射到最后一格"""
+    whens = " ".join(
+        f"WHEN {expr} < {DISTRIBUTION_EDGES[i + 1]} THEN {i}" for i in range(len(DISTRIBUTION_EDGES) - 1)
+    )
+    last = len(DISTRIBUTION_EDGES) - 1
+    return f"(CASE {whens} WHEN {expr} IS NOT NULL THEN {last} ELSE {last + 1} END)"
+
+
+def print_distribution(totals: Dict[str, List[int]]) -> None:
+    labels = [f"{DISTRIBUTION_EDGES[i]}-{DISTRIBUTION_EDGES[i + 1]}" for i in range(len(DISTRIBUTION_EDGES) - 1)]
+    labels += [f"{DISTRIBUTION_EDGES[-1]}+", "空/无法解析"]
+    columns = ["销售价(前)", "销售价(后)", "折扣价(前)", "折扣价(后)"]
+    print(f"{'价格区间':<14}" + "".join(f"{c:>12}" for c in columns))
+    for i, label in enumerate(labels):
+        print(f"{label:<14}" + "".join(f"{totals[c][i]:>12}" for c in columns))
+    print(f"销售价无法解析（不会更新）: {totals['无法解析'][0]} 条")
+
+
+def list_range_databases(base_dir: str, start_num: int, end_num: int) -> List[str]:
+    """返回范围内的数据库路径，按文件夹编号升序（由数据目录清单提供）"""
+    return [path for _, path in list_range_entries(base_dir, start_num, end_num)]
+
+
+def main():
+    engine = PricingEngine(CURRENCY_RATE, DEFAULT_DISCOUNT, DISCOUNT_TIERS, CHARM_ENDING,
+                           CONVERT_SALE_PRICE, CHARM_SALE_PRICE)
+    print("=== 价格引擎 ===" + (" (预览模式)" if DRY_RUN else ""))
+    print(f"处理范围: {START_FOLDER} - {END_FOLDER}")
+    print(f"汇率: {CURRENCY_RATE}，写回销售价: {CONVERT_SALE_PRICE}，默认折扣: {DEFAULT_DISCOUNT}，"
+          f"分档: {len(DISCOUNT_TIERS)} 条，尾数: {CHARM_ENDING}")
+    print("=" * 60)
+
+    run_id = None if DRY_RUN else new_run_id("折扣价")
+    if run_id:
+        print(f"撤销日志运行编号：{run_id}")
+
+    totals: Dict[str, List[int]] = {}
+    updated_total = 0
+    for db_path in list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER):
+        try:
+            conn = connect(db_path, "read-only" if DRY_RUN else "bulk-write")
+            if conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Content'").fetchone() is None:
+                print(f"⚠️ 跳过（无 Content 表）：{db_path}")
+                conn.close()
+                continue
+            if DRY_RUN:
+                for label, counts in engine.distribution(conn).items():
+                    merged = totals.setdefault(label, [0] * len(counts))
+                    for i, c in enumerate(counts):
+                        merged[i] += c
+            else:
+                updated = engine.apply(conn, run_id)
+                conn.commit()
+                updated_total += updated
+                print(f"✅ 已更新 {db_path}，共 {updated} 行记录")
+            conn.close()
+        except Exception as e:
+            print(f"❌ 出错：{db_path}，原因：{e}")
+
+    print("=" * 60)
+    if DRY_RUN:
+        if totals:
+            print_distribution(totals)
+    else:
+        print(f"总共更新: {updated_total} 条记录")
+    info = parse_price.cache_info()
+    if info.hits + info.misses:
+        print(f"价格解析缓存命中率: {info.hits / (info.hits + info.misses):.1%}")
+
+
+if __name__ == "__main__":
+    main()
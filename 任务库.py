@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+config.db3 任务表批量读写
+批量更新.py、sqlID批量添加脚本.py 原来每个 JobId 查询一次、更新后立即提交一次，
+几百个任务就是几百次磁盘同步。这里改为：
+  fetch_jobs_in_range  一条查询读出范围内所有任务
+  write_jobs           所有更新在一个事务中用 executemany 写回；
+                       某个任务写入失败时回退到逐个任务的 SAVEPOINT，只丢弃出错的任务，其余照常提交
+  clone_jobs           以一个任务为模板，分配连续的 JobId 段，在一个事务中插入新的
+                       Job、JobDatabase、JobWebPost 记录
+"""
+
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# (JobId, 新 JobName, 新 XmlData)
+JobUpdate = Tuple[int, str, str]
+
+UPDATE_JOB_SQL = "UPDATE Job SET JobName = ?, XmlData = ? WHERE JobId = ?"
+RELATED_TABLES: Tuple[str, ...] = ("JobDatabase", "JobWebPost")
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def fetch_jobs_in_range(conn: sqlite3.Connection, start_id: int, end_id: int) -> Dict[int, sqlite3.Row]:
+    """一次读取 JobId 在 [start_id, end_id] 内的任务，返回 {JobId: 行}"""
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(
+        "SELECT JobId, JobName, XmlData FROM Job WHERE JobId BETWEEN ? AND ? ORDER BY JobId",
+        (start_id, end_id),
+    )
+    return {row["JobId"]: row for row in rows}
+
+
+def _write_one_by_one(conn: sqlite3.Connection, updates: Sequence[JobUpdate]) -> Tuple[List[int], List[Tuple[int, str]]]:
+    done, failed = [], []
+    for job_id, job_name, xml in updates:
+        conn.execute("SAVEPOINT job")
+        try:
+            cur = conn.execute(UPDATE_JOB_SQL, (job_name, xml, job_id))
+            if cur.rowcount == 0:
+                raise sqlite3.DatabaseError("记录不存在")
+        except sqlite3.DatabaseError as e:
+            conn.execute("ROLLBACK TO job")
+            failed.append((job_id, str(e)))
+        else:
+            done.append(job_id)
+        finally:
+            conn.execute("RELEASE job")
+    return done, failed
+
+
+def write_jobs(conn: sqlite3.Connection, updates: Sequence[JobUpdate]) -> Tuple[List[int], List[Tuple[int, str]]]:
+    """在一个事务中写回所有任务，返回 (成功的 JobId 列表, [(失败的 JobId, 原因)])"""
+    if not updates:
+        return [], []
+
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None  # 手动控制事务
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("SAVEPOINT batch")
+            try:
+                cur = conn.executemany(UPDATE_JOB_SQL, [(name, xml, job_id) for job_id, name, xml in updates])
+                if cur.rowcount != len(updates):
+                    raise sqlite3.DatabaseError("部分记录不存在")
+            except sqlite3.DatabaseError:
+                # 整批回退，逐个任务重试，找出并跳过出错的任务
+                conn.execute("ROLLBACK TO batch")
+                conn.execute("RELEASE batch")
+                done, failed = _write_one_by_one(conn, updates)
+            else:
+                conn.execute("RELEASE batch")
+                done, failed = [job_id for job_id, _, _ in updates], []
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = old_isolation
+    return done, failed
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, bool]]:
+    """返回 [(列名, 是否为自增整数主键)]，表不存在时返回空列表"""
+    info = conn.execute(f"PRAGMA table_info({quote_ident(table)})").fetchall()
+    pk_columns = [col for col in info if col[5] > 0]
+    rowid_pk = pk_columns[0][1] if len(pk_columns) == 1 and pk_columns[0][2].upper() == "INTEGER" else None
+    return [(col[1], col[1] == rowid_pk) for col in info]
+
+
+def allocate_job_ids(conn: sqlite3.Connection, count: int, start_id: Optional[int] = None) -> int:
+    """分配 count 个连续 JobId，返回起始编号；指定 start_id 时检查该段是否空闲"""
+    if start_id is None:
+        start_id = (conn.execute("SELECT MAX(JobId) FROM Job").fetchone()[0] or 0) + 1
+    end_id = start_id + count - 1
+    for table in ("Job",) + RELATED_TABLES:
+        columns = [name for name, _ in _table_columns(conn, table)]
+        if not columns:
+            continue
+        if "JobId" not in columns:
+            raise ValueError(f"{table} 表没有 JobId 列")
+        used = conn.execute(
+            f"SELECT COUNT(*) FROM {quote_ident(table)} WHERE JobId BETWEEN ? AND ?", (start_id, end_id)
+        ).fetchone()[0]
+        if used:
+            raise ValueError(f"JobId {start_id}..{end_id} 在 {table} 中已有 {used} 条记录")
+    return start_id
+
+
+def clone_jobs(conn: sqlite3.Connection, template_job_id: int, jobs: Sequence[Tuple[str, str]],
+               start_id: Optional[int] = None) -> List[int]:
+    """以 template_job_id 为模板克隆任务，jobs 为 [(JobName, XmlData)]，返回新 JobId 列表
+
+    模板任务的其余列原样复制；JobDatabase、JobWebPost 中模板任务的记录也逐条复制并改为新 JobId
+    （这些表自己的自增主键由 SQLite 重新分配）。全部在一个事务中完成，任何一步失败都整体回滚。
+    """
+    if not jobs:
+        return []
+
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None  # 手动控制事务
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM Job WHERE JobId = ?", (template_job_id,)).fetchone() is None:
+                raise ValueError(f"模板任务 JobId={template_job_id} 不存在")
+            first_id = allocate_job_ids(conn, len(jobs), start_id)
+            new_ids = list(range(first_id, first_id + len(jobs)))
+
+            # Job：JobId、JobName、XmlData 用新值，其余列从模板复制
+            columns = [name for name, _ in _table_columns(conn, "Job")]
+            overrides = {"JobId": "?", "JobName": "?", "XmlData": "?"}
+            select_list = ", ".join(overrides.get(c, quote_ident(c)) for c in columns)
+            params = []
+            for job_id, (job_name, xml) in zip(new_ids, jobs):
+                values = {"JobId": job_id, "JobName": job_name, "XmlData": xml}
+                params.append([values[c] for c in columns if c in overrides] + [template_job_id])
+            conn.executemany(
+                f"INSERT INTO Job ({', '.join(quote_ident(c) for c in columns)}) "
+                f"SELECT {select_list} FROM Job WHERE JobId = ?",
+                params,
+            )
+
+            # 关联表：整行复制，JobId 改为新编号，其他自增主键交给 SQLite 分配
+            # （JobId 本身是 INTEGER PRIMARY KEY 时也必须写入新编号，不能当作自增列省略）
+            for table in RELATED_TABLES:
+                all_columns = _table_columns(conn, table)
+                if not all_columns:
+                    continue
+                table_columns = [name for name, is_rowid in all_columns if not is_rowid or name == "JobId"]
+                if "JobId" not in table_columns:
+                    raise ValueError(f"{table} 表没有 JobId 列，无法复制模板任务的记录")
+                select_list = ", ".join("?" if c == "JobId" else quote_ident(c) for c in table_columns)
+                conn.executemany(
+                    f"INSERT INTO {quote_ident(table)} ({', '.join(quote_ident(c) for c in table_columns)}) "
+                    f"SELECT {select_list} FROM {quote_ident(table)} WHERE JobId = ?",
+                    [(job_id, template_job_id) for job_id in new_ids],
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = old_isolation
+    return new_ids
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务 XML 模板引擎
+update_xml_fields 对每个任务都要完整解析 XmlData（ET.fromstring）、修改 JobName、StartAddress、
+分类字段的 ManualString，再完整序列化（ET.tostring）。同一范围内的任务通常来自同一个模板，
+只有这几处取值不同。
+
+本引擎把任务 XML 中这几处取值挖空得到“骨架”，同一骨架只完整解析、序列化一次，
+得到按插槽切开的输出片段；之后骨架相同的任务只需把转义后的新值拼进片段。
+骨架不同（模板被改过）或无法安全挖空时，退回原来的完整解析，结果与 update_xml_fields 逐字节一致。
+
+用法：
+  python 任务模板.py --bench [任务数]   对比完整解析与模板渲染的速度并校验输出一致
+                                      （BENCH_JOB_ID 对应的任务存在时用它的 XmlData，否则用内置样例）
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, Optional, Tuple
+
+# ================ 固定配置（按需修改）================
+DB_PATH: str = r"D:\火车采集器V10.28\Configuration\config.db3"
+BENCH_JOB_ID: int = 5211        # 基准测试取此任务的 XmlData 作为模板
+BENCH_JOB_COUNT: int = 5000     # 基准测试默认任务数
+MAX_TEMPLATES: int = 64         # 最多缓存的骨架数量
+# ====================================================
+
+NAME_SLOT = "@@JOB_NAME_SLOT@@"
+PATH_SLOT = "@@TXT_PATH_SLOT@@"
+_SLOT_RE = re.compile(f"({re.escape(NAME_SLOT)}|{re.escape(PATH_SLOT)})")
+
+_ROOT_TAG_RE = re.compile(r"<(?![?!/])[^>]*>")
+_JOB_NAME_ATTR_RE = re.compile(r"""\sJobName\s*=\s*(["'])(.*?)\1""", re.S)
+_START_ADDRESS_RE = re.compile(r"<StartAddress(?:\s[^>]*)?>([^<]*)</StartAddress>")
+_FIELD_TAG_RE = re.compile(r"<Field\s[^>]*>")
+_CATEGORY_LABEL_RE = re.compile(r"""\sLabelName\s*=\s*(["'])分类\1""")
+_MANUAL_STRING_RE = re.compile(r"""\sManualString\s*=\s*(["'])(.*?)\1""", re.S)
+# 未转义的 & 或 <：原文本身不是合法 XML，交给完整解析处理（报错或按原逻辑兜底）
+_MALFORMED_VALUE_RE = re.compile(r"<|&(?!(?:[A-Za-z]+|#\d+|#x[0-9A-Fa-f]+);)")
+
+# (JobXml, 新 JobName, txt 绝对路径) -> 新 JobXml
+FullRender = Callable[[str, str, str], str]
+
+
+def render_full(template_xml: str, new_job_name: str, txt_abs_path: str, *, use_file_prefix: bool = True,
+                use_category_for_start: bool = False, update_manual_string: bool = True) -> str:
+    """完整解析版本，与 批量更新.py 的 update_xml_fields 相同的修改规则（基准测试使用）"""
+    root = ET.fromstring(template_xml)
+    root.set('JobName', new_job_name)
+    start_node = root.find('StartAddress')
+    if start_node is None:
+        start_node = ET.Element('StartAddress')
+        root.insert(0, start_node)
+    if use_category_for_start:
+        start_node.text = new_job_name
+    else:
+        start_node.text = ("#FILE#" + txt_abs_path) if use_file_prefix else txt_abs_path
+    if update_manual_string:
+        for field in root.findall('.//Field[@LabelName="分类"][@ManualString]'):
+            field.set('ManualString', new_job_name)
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True).decode('utf-8')
+
+
+def split_skeleton(xml: str, manual_string: bool = True) -> Optional[Tuple[str, ...]]:
+    """把任务 XML 中会被改写的取值挖空，返回骨架（取值之间的常量片段）；无法安全挖空时返回 None
+
+    manual_string=False 时分类字段的 ManualString 不算插槽（渲染函数不修改它）。
+    """
+    spans: List[Tuple[int, int]] = []
+
+    root_tag = _ROOT_TAG_RE.search(xml)
+    if root_tag:
+        m = _JOB_NAME_ATTR_RE.search(root_tag.group(0))
+        if m:
+            spans.append((root_tag.start() + m.start(2), root_tag.start() + m.end(2)))
+    for m in _START_ADDRESS_RE.finditer(xml):
+        spans.append(m.span(1))
+    for tag in _FIELD_TAG_RE.finditer(xml) if manual_string else ():
+        text = tag.group(0)
+        if _CATEGORY_LABEL_RE.search(text):
+            m = _MANUAL_STRING_RE.search(text)
+            if m:
+                spans.append((tag.start() + m.start(2), tag.start() + m.end(2)))
+
+    spans.sort()
+    parts, pos = [], 0
+    for start, end in spans:
+        if start < pos or _MALFORMED_VALUE_RE.search(xml, start, end):
+            return None
+        parts.append(xml[pos:start])
+        pos = end
+    parts.append(xml[pos:])
+    return tuple(parts)
+
+
+def _escape(value: str, in_attribute: bool) -> str:
+    # 与 ET.tostring 使用同一套转义，保证输出与完整解析逐字节一致
+    return ET._escape_attrib(value) if in_attribute else ET._escape_cdata(value)
+
+
+class JobXmlTemplate:
+    """按骨架缓存渲染片段的任务 XML 渲染器
+
+    full_render 为原有的完整解析函数（各脚本传入自己的 update_xml_fields），
+    骨架首次出现以及无法使用模板时调用它。full_render 不修改分类字段 ManualString 时
+    传 manual_string=False。
+    """
+
+    def __init__(self, full_render: FullRender, manual_string: bool = True, max_templates: int = MAX_TEMPLATES):
+        self.full_render = full_render
+        self.manual_string = manual_string
+        self.max_templates = max_templates
+        # 骨架 -> [(常量片段, 插槽, 是否在属性中), ...] + 结尾片段；None 表示该骨架只能完整解析
+        self._templates: Dict[Tuple[str, ...], Optional[Tuple[List[Tuple[str, str, bool]], str]]] = {}
+        self.hits = 0
+        self.fallbacks = 0
+
+    def _compile(self, skeleton: Tuple[str, ...]) -> Optional[Tuple[List[Tuple[str, str, bool]], str]]:
+        """用探针值填回挖空处做一次完整渲染；探针不能出现在输出中，否则说明挖空处不全是插槽"""
+        probes = [f"PROBE{i}X7Q" for i in range(len(skeleton) - 1)]
+        probe_xml = "".join(part + probe for part, probe in zip(skeleton, probes)) + skeleton[-1]
+        if NAME_SLOT in probe_xml or PATH_SLOT in probe_xml:
+            return None
+        try:
+            rendered = self.full_render(probe_xml, NAME_SLOT, PATH_SLOT)
+        except Exception:
+            return None
+        if any(probe in rendered for probe in probes):
+            return None
+
+        pieces = _SLOT_RE.split(rendered)
+        slots, prefix = [], ""
+        for i in range(0, len(pieces) - 1, 2):
+            prefix += pieces[i]
+            in_attribute = prefix.rfind("<") > prefix.rfind(">")
+            slots.append((pieces[i], pieces[i + 1], in_attribute))
+            prefix += pieces[i + 1]
+        return slots, pieces[-1]
+
+    def render(self, xml: str, new_job_name: str, txt_abs_path: str) -> str:
+        skeleton = split_skeleton(xml, self.manual_string)
+        if skeleton is None:
+            self.fallbacks += 1
+            return self.full_render(xml, new_job_name, txt_abs_path)
+
+        if skeleton in self._templates:
+            compiled = self._templates[skeleton]
+        else:
+            compiled = self._compile(skeleton)
+            if len(self._templates) >= self.max_templates:
+                self._templates.pop(next(iter(self._templates)))
+            self._templates[skeleton] = compiled
+            # 新骨架本身按完整解析渲染，同时也校验了原 XML 是否合法
+            self.fallbacks += 1
+            return self.full_render(xml, new_job_name, txt_abs_path)
+        if compiled is None:
+            self.fallbacks += 1
+            return self.full_render(xml, new_job_name, txt_abs_path)
+
+        self.hits += 1
+        values = {NAME_SLOT: new_job_name, PATH_SLOT: txt_abs_path}
+        slots, tail = compiled
+        out = []
+        for const, slot, in_attribute in slots:
+            out.append(const)
+            out.append(_escape(values[slot], in_attribute))
+        out.append(tail)
+        return "".join(out)
+
+    def stats(self) -> str:
+        return f"骨架 {len(self._templates)} 种，模板渲染 {self.hits} 次，完整解析 {self.fallbacks} 次"
+
+
+# ------------------------------------------------------------
+# 基准测试
+# ------------------------------------------------------------
+def _sample_template() -> str:
+    fields = "".join(
+        f'<Field LabelName="字段{i}" ManualString="" Rule="(?&lt;v&gt;.*?)" Type="{i % 3}"/>' for i in range(60)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<Job JobName="旧任务" Version="10.28"><StartAddress>#FILE#D:\\旧.txt</StartAddress>'
+        f'<Fields><Field LabelName="分类" ManualString="旧分类"/>{fields}</Fields>'
+        '<Setting Thread="5" Delay="0" Encoding="utf-8"/></Job>'
+    )
+
+
+def _load_bench_template() -> str:
+    if os.path.exists(DB_PATH):
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            row = conn.execute("SELECT XmlData FROM Job WHERE JobId = ?", (BENCH_JOB_ID,)).fetchone()
+        finally:
+            conn.close()
+        if row and row[0]:
+            print(f"模板: {DB_PATH} JobId={BENCH_JOB_ID}")
+            return row[0]
+    print("模板: 内置样例")
+    return _sample_template()
+
+
+def run_benchmark(job_count: int) -> None:
+    template_xml = _load_bench_template()
+    jobs = [
+        (template_xml, f"分类{i}|||子类 & \"{i}\"", f"D:\\链接\\分类{i}_子类.txt") for i in range(job_count)
+    ]
+    print(f"任务数: {job_count}，XML 长度: {len(template_xml)} 字符")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    expected = [render_full(xml, name, path) for xml, name, path in jobs]
+    full_elapsed = time.perf_counter() - start
+
+    engine = JobXmlTemplate(render_full)
+    start = time.perf_counter()
+    actual = [engine.render(xml, name, path) for xml, name, path in jobs]
+    engine_elapsed = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    print(f"完整解析: {full_elapsed * 1000:.1f} ms（{job_count / full_elapsed:.0f} 个/秒）")
+    print(f"模板渲染: {engine_elapsed * 1000:.1f} ms（{job_count / engine_elapsed:.0f} 个/秒）")
+    print(f"加速: {full_elapsed / engine_elapsed:.1f} 倍；{engine.stats()}")
+    print("✅ 输出与完整解析完全一致" if mismatches == 0 else f"❌ {mismatches} 个任务输出不一致")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--bench":
+        run_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else BENCH_JOB_COUNT)
+    else:
+        print(__doc__)
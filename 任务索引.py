@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务设置索引
+把 config.db3 中每个任务 XmlData 里的 JobName、StartAddress、Field 标签和 ManualString
+提取到旁边的索引库（config_index.db3），以后查“哪些任务用了某个链接文件 / 某个分类 / 某条字段规则”
+直接查 SQL，不用逐个解析 XML。按 XmlData 的哈希判断是否变化，只重新解析改过的任务。
+支持 FTS5 时同时建立全文索引。
+
+索引库表结构：
+  job_index  (JobId, JobName, StartAddress, start_file, xml_hash)   start_file 为去掉 #FILE# 的 txt 路径
+  job_fields (JobId, LabelName, ManualString, attrs)                 attrs 为该 Field 全部属性的 JSON
+  job_fts    全文索引（JobName、StartAddress、字段标签、ManualString）
+查询时可用 file_exists(路径) 函数。
+
+用法：
+  python 任务索引.py                 刷新索引
+  python 任务索引.py --missing       列出链接 txt 不存在的任务
+  python 任务索引.py --search 关键词  全文搜索任务设置
+  python 任务索引.py --sql "SQL"      对索引库执行任意查询，例如
+      SELECT JobId, JobName FROM job_fields JOIN job_index USING (JobId) WHERE LabelName='分类' AND ManualString=''
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+from 连接工厂 import connect
+
+# ================ 固定配置（按需修改）================
+DB_PATH: str = r"D:\火车采集器V10.28\Configuration\config.db3"
+INDEX_PATH: str = os.path.join(os.path.dirname(DB_PATH), "config_index.db3")
+# ====================================================
+
+FILE_PREFIX = "#FILE#"
+
+
+def xml_hash(xml: Optional[str]) -> str:
+    return hashlib.sha1((xml or "").encode("utf-8")).hexdigest()
+
+
+def parse_job_xml(xml: Optional[str]) -> Tuple[Optional[str], List[Tuple[str, Optional[str], str]]]:
+    """返回 (StartAddress, [(LabelName, ManualString, 属性JSON)])；XML 无法解析时返回 (None, [])"""
+    if not xml or not xml.strip():
+        return None, []
+    try:
+        root = ET.fromstring(xml)
+    except ET.ParseError:
+        return None, []
+    start_node = root.find("StartAddress")
+    start_address = start_node.text if start_node is not None else None
+    fields = [
+        (field.get("LabelName", ""), field.get("ManualString"), json.dumps(field.attrib, ensure_ascii=False))
+        for field in root.iter("Field")
+    ]
+    return start_address, fields
+
+
+def start_file_of(start_address: Optional[str]) -> Optional[str]:
+    """StartAddress 指向 txt 文件时返回文件路径，否则（分类名、网址）返回 None"""
+    if not start_address:
+        return None
+    value = start_address.strip()
+    if value.startswith(FILE_PREFIX):
+        return value[len(FILE_PREFIX):]
+    if value.lower().endswith(".txt"):
+        return value
+    return None
+
+
+def _file_exists(path: Optional[str]) -> int:
+    return int(bool(path) and os.path.isfile(path))
+
+
+def open_index(index_path: str = INDEX_PATH) -> Tuple[sqlite3.Connection, bool]:
+    """打开（必要时创建）索引库，返回 (连接, 是否支持 FTS5)"""
+    conn = connect(index_path, "bulk-write")
+    conn.create_function("file_exists", 1, _file_exists, deterministic=False)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS job_index (
+            JobId INTEGER PRIMARY KEY,
+            JobName TEXT,
+            StartAddress TEXT,
+            start_file TEXT,
+            xml_hash TEXT
+        );
+        CREATE TABLE IF NOT EXISTS job_fields (
+            JobId INTEGER NOT NULL,
+            LabelName TEXT,
+            ManualString TEXT,
+            attrs TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_fields_job ON job_fields (JobId);
+        CREATE INDEX IF NOT EXISTS idx_job_fields_label ON job_fields (LabelName, ManualString);
+        CREATE INDEX IF NOT EXISTS idx_job_index_file ON job_index (start_file);
+    """)
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS job_fts USING fts5("
+            "JobName, StartAddress, labels, manual_strings, JobId UNINDEXED, tokenize='trigram')"
+        )
+        has_fts = True
+    except sqlite3.OperationalError:
+        # 旧版 SQLite 没有 FTS5 或 trigram 分词器，只用普通索引
+        has_fts = False
+    return conn, has_fts
+
+
+def refresh_index(db_path: str = DB_PATH, index_path: str = INDEX_PATH) -> Dict[str, int]:
+    """刷新索引，返回 {"total", "parsed", "removed"}"""
+    source = connect(db_path, "read-only")
+    index, has_fts = open_index(index_path)
+    try:
+        known = dict(index.execute("SELECT JobId, xml_hash FROM job_index"))
+        parsed = 0
+        seen = set()
+        for job_id, job_name, xml in source.execute("SELECT JobId, JobName, XmlData FROM Job"):
+            seen.add(job_id)
+            digest = xml_hash(xml)
+            if known.get(job_id) == digest:
+                # XML 未变，JobName 可能被单独改过
+                renamed = index.execute("UPDATE job_index SET JobName = ? WHERE JobId = ? AND JobName IS NOT ?",
+                                        (job_name, job_id, job_name)).rowcount
+                if renamed and has_fts:
+                    index.execute("UPDATE job_fts SET JobName = ? WHERE JobId = ?", (job_name, job_id))
+                continue
+            start_address, fields = parse_job_xml(xml)
+            index.execute(
+                "INSERT OR REPLACE INTO job_index (JobId, JobName, StartAddress, start_file, xml_hash) VALUES (?, ?, ?, ?, ?)",
+                (job_id, job_name, start_address, start_file_of(start_address), digest),
+            )
+            index.execute("DELETE FROM job_fields WHERE JobId = ?", (job_id,))
+            index.executemany(
+                "INSERT INTO job_fields (JobId, LabelName, ManualString, attrs) VALUES (?, ?, ?, ?)",
+                [(job_id, label, manual, attrs) for label, manual, attrs in fields],
+            )
+            if has_fts:
+                index.execute("DELETE FROM job_fts WHERE JobId = ?", (job_id,))
+                index.execute(
+                    "INSERT INTO job_fts (JobName, StartAddress, labels, manual_strings, JobId) VALUES (?, ?, ?, ?, ?)",
+                    (job_name, start_address,
+                     " ".join(label for label, _, _ in fields),
+                     " ".join(manual for _, manual, _ in fields if manual),
+                     job_id),
+                )
+            parsed += 1
+
+        removed = [job_id for job_id in known if job_id not in seen]
+        for job_id in removed:
+            index.execute("DELETE FROM job_index WHERE JobId = ?", (job_id,))
+            index.execute("DELETE FROM job_fields WHERE JobId = ?", (job_id,))
+            if has_fts:
+                index.execute("DELETE FROM job_fts WHERE JobId = ?", (job_id,))
+        index.commit()
+        return {"total": len(seen), "parsed": parsed, "removed": len(removed)}
+    finally:
+        index.close()
+        source.close()
+
+
+def query(sql: str, params=(), index_path: str = INDEX_PATH) -> Tuple[List[str], List[tuple]]:
+    """在索引库上执行查询，返回 (列名, 行)"""
+    conn, _ = open_index(index_path)
+    try:
+        cur = conn.execute(sql, params)
+        columns = [d[0] for d in cur.description] if cur.description else []
+        return columns, cur.fetchall()
+    finally:
+        conn.close()
+
+
+MISSING_FILE_SQL = """
+    SELECT JobId, JobName, start_file FROM job_index
+    WHERE start_file IS NOT NULL AND NOT file_exists(start_file)
+    ORDER BY JobId
+"""
+
+SEARCH_SQL = """
+    SELECT JobId, JobName, StartAddress FROM job_fts WHERE job_fts MATCH ? ORDER BY JobId
+"""
+
+SEARCH_FALLBACK_SQL = """
+    SELECT DISTINCT i.JobId, i.JobName, i.StartAddress FROM job_index i LEFT JOIN job_fields f USING (JobId)
+    WHERE i.JobName LIKE :p OR i.StartAddress LIKE :p OR f.LabelName LIKE :p OR f.ManualString LIKE :p
+    ORDER BY i.JobId
+"""
+
+
+def _print_rows(columns: List[str], rows: List[tuple]) -> None:
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if v is None else str(v) for v in row))
+    print(f"-- 共 {len(rows)} 行", file=sys.stderr)
+
+
+def main():
+    args = sys.argv[1:]
+    stats = refresh_index(DB_PATH, INDEX_PATH)
+    print(f"索引: {INDEX_PATH}（任务 {stats['total']} 个，重新解析 {stats['parsed']} 个，移除 {stats['removed']} 个）",
+          file=sys.stderr)
+
+    if not args:
+        return
+    if args[0] == "--missing":
+        _print_rows(*query(MISSING_FILE_SQL, index_path=INDEX_PATH))
+    elif args[0] == "--search" and len(args) == 2:
+        # trigram 分词要求关键词至少 3 个字符，更短时用 LIKE
+        if len(args[1]) >= 3:
+            try:
+                _print_rows(*query(SEARCH_SQL, ('"' + args[1].replace('"', '""') + '"',), INDEX_PATH))
+                return
+            except sqlite3.OperationalError:
+                pass
+        _print_rows(*query(SEARCH_FALLBACK_SQL, {"p": f"%{args[1]}%"}, INDEX_PATH))
+    elif args[0] == "--sql" and len(args) == 2:
+        _print_rows(*query(args[1], index_path=INDEX_PATH))
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分类列更新计划
+批量增加分类.py 和 数据处理整合.py 第4步需要在每个数据库中找出“分类相关列”（列名包含
+category/分类/cat/type/类型/tag/标签），把空值填成该文件夹对应的分类。
+
+同一采集任务生成的数据库表结构完全相同，这里按表结构哈希缓存解析结果：
+相同结构只在第一次遇到时查询 PRAGMA table_info 并匹配列名，之后直接复用。
+每张表的所有匹配列合并成一条 UPDATE（CASE 表达式逐列判断是否为空），只扫描一遍表。
+"""
+
+import sqlite3
+from typing import Dict, List, Sequence, Tuple
+
+from 数据目录清单 import schema_fingerprint
+
+CATEGORY_KEYWORDS: List[str] = ['category', '分类', 'cat', 'type', '类型', 'tag', '标签']
+
+# (表名, 匹配到的列, UPDATE 语句)
+TablePlan = Tuple[str, List[str], str]
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _empty_condition(column: str) -> str:
+    col = quote_ident(column)
+    return f"({col} IS NULL OR {col} = '' OR {col} = 'NULL')"
+
+
+def build_update_sql(table: str, columns: Sequence[str]) -> str:
+    """一条语句更新表中所有分类列：只有为空的列写入 :category，其余列保持原值"""
+    assignments = ", ".join(
+        f"{quote_ident(c)} = CASE WHEN {_empty_condition(c)} THEN :category ELSE {quote_ident(c)} END"
+        for c in columns
+    )
+    where = " OR ".join(_empty_condition(c) for c in columns)
+    return f"UPDATE {quote_ident(table)} SET {assignments} WHERE {where}"
+
+
+class CategoryUpdatePlanner:
+    """按表结构哈希缓存每个数据库的分类列更新计划"""
+
+    def __init__(self, keywords: Sequence[str] = CATEGORY_KEYWORDS):
+        self.keywords = [k.lower() for k in keywords]
+        self._plans: Dict[str, List[TablePlan]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _analyse(self, conn: sqlite3.Connection) -> List[TablePlan]:
+        plans = []
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
+        )]
+        for table in tables:
+            # 跳过 SQLite 内部表和本项目的辅助表（撤销日志、变更跟踪等）
+            if table.startswith(("sqlite_", "_")):
+                continue
+            columns = [
+                col[1] for col in conn.execute(f"PRAGMA table_info({quote_ident(table)})")
+                if any(keyword in col[1].lower() for keyword in self.keywords)
+            ]
+            if columns:
+                plans.append((table, columns, build_update_sql(table, columns)))
+        return plans
+
+    def plan_for(self, conn: sqlite3.Connection) -> List[TablePlan]:
+        fingerprint = schema_fingerprint(conn)
+        plan = self._plans.get(fingerprint)
+        if plan is None:
+            self.misses += 1
+            plan = self._plans[fingerprint] = self._analyse(conn)
+        else:
+            self.hits += 1
+        return plan
+
+    def apply(self, conn: sqlite3.Connection, category: str) -> int:
+        """按计划填充空分类，返回被更新的行数（不提交）"""
+        updated = 0
+        for _, _, sql in self.plan_for(conn):
+            updated += conn.execute(sql, {"category": category}).rowcount
+        return updated
+
+    def describe(self, conn: sqlite3.Connection) -> str:
+        """计划的文字说明，预览模式使用"""
+        plan = self.plan_for(conn)
+        if not plan:
+            return "未找到分类相关列"
+        return "；".join(f"{table}: {', '.join(columns)}" for table, columns, _ in plan)
+
+    def stats(self) -> str:
+        return f"表结构种类 {len(self._plans)}，计划复用 {self.hits} 次，新解析 {self.misses} 次"
@@ -1,5 +1,7 @@
 import os
 
+from 分类键 import filename_base
+
 # 📁 设置包含所有 .txt 文件的目录（源目录）
 txt_folder = r'D:\project\municipal\分类'
 
@@ -23,11 +25,8 @@ for file in os.listdir(txt_folder):
             line = line.strip()
             if not line:
                 continue
-            # 替换非法字符
-            file_name = line.replace('|||', '_') + '.html'
-            file_name = file_name.replace('/', '-').replace('\\', '-').replace(':', '-')
-            file_name = file_name.replace('*', '-').replace('?', '-').replace('"', "'")
-            file_name = file_name.replace('<', '-').replace('>', '-').replace('|', '-')
+            # 替换非法字符（与其他脚本按分类查找文件时使用同一规则）
+            file_name = filename_base(line) + '.html'
 
             html_path = os.path.join(output_dir, file_name)
 
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分类名 ↔ 文件名统一匹配
+以前各脚本把分类名转换成文件名的规则不一致：分类生成html.py 把 '|||' 换成 '_' 并替换
+/\\:*?"<>| 等非法字符，sqlID批量添加脚本.py 期望 '___'，批量更新.py 期望 '_'，
+之后再逐个精确查找，规则对不上的就报“未匹配”。
+
+这里统一为：
+  filename_base(分类)   分类对应的标准文件名（不含扩展名），生成文件时使用
+  category_key(名称)    匹配用的归一化键：标准文件名再做 Unicode 归一化、忽略大小写、连续下划线合并，
+                        分类名和文件名算出的键相同即视为同一分类（'_' 与 '___' 两种旧命名都能匹配）
+  CategoryFileIndex     对一个目录只扫描一次，按 精确文件名 → 标准文件名 → 归一化键 三级查找，
+                        另支持按键前缀查找（文件名被截断的情况）；几千个分类对几千个文件一遍完成
+"""
+
+import bisect
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+CATEGORY_SEPARATOR = "|||"
+_ILLEGAL_CHARS = str.maketrans({
+    "/": "-", "\\": "-", ":": "-", "*": "-", "?": "-", '"': "'", "<": "-", ">": "-", "|": "-",
+})
+_UNDERSCORES_RE = re.compile(r"_+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def filename_base(category: str) -> str:
+    """分类对应的标准文件名（不含扩展名）：'|||' 换成 '_'，Windows 文件名非法字符换成 '-'（双引号换成单引号）"""
+    return category.strip().replace(CATEGORY_SEPARATOR, "_").translate(_ILLEGAL_CHARS)
+
+
+def category_key(name: str) -> str:
+    """匹配用的归一化键，分类名和文件名（不含扩展名）都可以传入"""
+    key = unicodedata.normalize("NFKC", filename_base(name)).casefold()
+    key = _SPACES_RE.sub(" ", key)
+    return _UNDERSCORES_RE.sub("_", key)
+
+
+class CategoryFileIndex:
+    """一个目录内文件的分类匹配索引（构建时只列一次目录）"""
+
+    _cache: Dict[Tuple[str, str], Tuple[int, "CategoryFileIndex"]] = {}
+
+    def __init__(self, dir_path: str, extension: str = ".txt"):
+        if not os.path.isdir(dir_path):
+            raise NotADirectoryError(f"目录不存在: {dir_path}")
+        self.dir_path = dir_path
+        self.extension = extension.lower()
+        self.exact: Dict[str, str] = {}
+        self.by_key: Dict[str, List[str]] = {}
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if not entry.name.lower().endswith(self.extension) or not entry.is_file():
+                    continue
+                base = entry.name[:-len(self.extension)]
+                path = os.path.abspath(entry.path)
+                self.exact[base] = path
+                self.by_key.setdefault(category_key(base), []).append(path)
+        self._sorted_keys = sorted(self.by_key)
+
+    @classmethod
+    def for_directory(cls, dir_path: str, extension: str = ".txt") -> "CategoryFileIndex":
+        """同一目录内容未变（目录修改时间相同）时复用已建好的索引"""
+        cache_key = (os.path.abspath(dir_path), extension.lower())
+        mtime = os.stat(dir_path).st_mtime_ns
+        cached = cls._cache.get(cache_key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        index = cls(dir_path, extension)
+        cls._cache[cache_key] = (mtime, index)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def lookup(self, category: str) -> Optional[str]:
+        """返回分类对应文件的绝对路径；找不到或归一化后对应多个文件时返回 None"""
+        path = self.exact.get(category) or self.exact.get(filename_base(category))
+        if path:
+            return path
+        candidates = self.by_key.get(category_key(category))
+        if candidates and len(candidates) == 1:
+            return candidates[0]
+        return None
+
+    def prefix(self, text: str) -> List[str]:
+        """归一化键以 text 的键开头的所有文件"""
+        key = category_key(text)
+        start = bisect.bisect_left(self._sorted_keys, key)
+        result = []
+        for k in self._sorted_keys[start:]:
+            if not k.startswith(key):
+                break
+            result.extend(self.by_key[k])
+        return result
+
+    def match(self, categories: List[str]) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+        """一遍匹配所有分类，返回 ({分类: 文件路径}, [(未匹配的分类, 期望文件名)])"""
+        mapping, missing = {}, []
+        for category in categories:
+            path = self.lookup(category)
+            if path:
+                mapping[category] = path
+            else:
+                missing.append((category, filename_base(category)))
+        return mapping, missing
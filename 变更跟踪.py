@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+变更跟踪（可选）
+在 Content 表上安装触发器，把新插入和被修改的行号写入 _change_log。
+各维护步骤（图片链接替换、颜色提取、港币打折、规格统一）在 _step_watermark 中记录
+自己上次成功运行时处理到的日志序号，下次只处理此后新增或变化的行。
+未安装触发器的数据库、或某步骤第一次运行时，仍按全表处理。
+
+用法：
+  python 变更跟踪.py --install            为范围内的数据库安装触发器
+  python 变更跟踪.py --uninstall          移除触发器和日志表
+  python 变更跟踪.py --status             查看各步骤待处理的行数
+  python 变更跟踪.py --reset <步骤名>     清除某步骤的进度，下次全表处理
+  python 变更跟踪.py --prune              删除所有步骤都已处理过的日志
+"""
+
+import sqlite3
+import sys
+from typing import Dict, List, Optional, Sequence
+
+from 数据目录清单 import list_range_databases as list_range_entries
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+START_FOLDER: int = 5211
+END_FOLDER: int = 5523
+# ====================================================
+
+CHANGE_LOG_TABLE = "_change_log"
+WATERMARK_TABLE = "_step_watermark"
+TRIGGER_PREFIX = "_track_"
+
+
+def install_tracking(conn: sqlite3.Connection, table: str = "Content") -> None:
+    """创建日志表、进度表和触发器（重复调用无副作用）"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            step TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            updated_at TEXT,
+            PRIMARY KEY (step, table_name)
+        )
+    """)
+    for op, event in (("insert", "INSERT"), ("update", "UPDATE")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS "{TRIGGER_PREFIX}{table}_{op}" AFTER {event} ON "{table}"
+            BEGIN
+                INSERT INTO {CHANGE_LOG_TABLE} (table_name, row_id, op) VALUES ('{table}', NEW.rowid, '{op}');
+            END
+        """)
+    conn.commit()
+
+
+def uninstall_tracking(conn: sqlite3.Connection, table: str = "Content") -> None:
+    for op in ("insert", "update"):
+        conn.execute(f'DROP TRIGGER IF EXISTS "{TRIGGER_PREFIX}{table}_{op}"')
+    conn.execute(f"DROP TABLE IF EXISTS {CHANGE_LOG_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {WATERMARK_TABLE}")
+    conn.commit()
+
+
+def is_tracking(conn: sqlite3.Connection, table: str = "Content") -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?", (f"{TRIGGER_PREFIX}{table}_update",)
+    ).fetchone()
+    return row is not None
+
+
+def get_watermark(conn: sqlite3.Connection, step: str, table: str = "Content") -> Optional[int]:
+    row = conn.execute(
+        f"SELECT seq FROM {WATERMARK_TABLE} WHERE step = ? AND table_name = ?", (step, table)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def begin_step(conn: sqlite3.Connection) -> None:
+    """以 BEGIN IMMEDIATE 开启写事务：读取待处理行到写入进度之间，其他程序无法插入新行，
+    避免采集器同时写入的行被误记为“已处理”"""
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def pending_where(conn: sqlite3.Connection, step: str, table: str = "Content",
+                  ops: Optional[Sequence[str]] = None) -> str:
+    """返回本步骤待处理行的 WHERE 条件
+
+    未安装跟踪或该步骤从未成功运行时返回 "1"（全表）。
+    ops 限定日志类型：不能对同一行重复执行的步骤（如把销售价换算成美元）传 ("insert",)，
+    只处理新采集的行；其他步骤修改过的行不会被再处理一遍。
+    """
+    if not is_tracking(conn, table):
+        return "1"
+    watermark = get_watermark(conn, step, table)
+    if watermark is None:
+        return "1"
+    op_filter = ""
+    if ops:
+        op_filter = " AND op IN (" + ", ".join("'" + op.replace("'", "''") + "'" for op in ops) + ")"
+    return (f"rowid IN (SELECT row_id FROM {CHANGE_LOG_TABLE} "
+            f"WHERE table_name = '{table}' AND seq > {int(watermark)}{op_filter})")
+
+
+def log_position(conn: sqlite3.Connection) -> Optional[int]:
+    """当前最大日志序号；未安装跟踪时返回 None"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (CHANGE_LOG_TABLE,)).fetchone():
+        return None
+    return conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {CHANGE_LOG_TABLE}").fetchone()[0]
+
+
+def relabel_inserts(conn: sqlite3.Connection, after_seq: int, op: str = "restore") -> None:
+    """把 after_seq 之后的 insert 日志改记为 op（撤销回滚重新插入的是旧行，不是新采集的行）"""
+    conn.execute(f"UPDATE {CHANGE_LOG_TABLE} SET op = ? WHERE seq > ? AND op = 'insert'", (op, after_seq))
+
+
+def mark_done(conn: sqlite3.Connection, step: str, table: str = "Content") -> None:
+    """在步骤写入完成后、提交前调用：进度推进到当前最大序号（包括本步骤自己产生的修改）"""
+    if not is_tracking(conn, table):
+        return
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO {WATERMARK_TABLE} (step, table_name, seq, updated_at)
+        SELECT ?, ?, COALESCE(MAX(seq), 0), datetime('now', 'localtime') FROM {CHANGE_LOG_TABLE}
+        """,
+        (step, table),
+    )
+
+
+def reset_step(conn: sqlite3.Connection, step: str) -> None:
+    conn.execute(f"DELETE FROM {WATERMARK_TABLE} WHERE step = ?", (step,))
+    conn.commit()
+
+
+def prune_log(conn: sqlite3.Connection) -> int:
+    """删除所有已登记步骤都处理过的日志，返回删除行数
+
+    尚未登记进度的步骤第一次运行时本就按全表处理，不需要保留日志。
+    """
+    cur = conn.execute(
+        f"DELETE FROM {CHANGE_LOG_TABLE} WHERE seq <= "
+        f"(SELECT COALESCE(MIN(seq), (SELECT MAX(seq) FROM {CHANGE_LOG_TABLE})) FROM {WATERMARK_TABLE})"
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def pending_counts(conn: sqlite3.Connection, table: str = "Content") -> Dict[str, int]:
+    """返回 {步骤名: 待处理的不同行数}"""
+    result = {}
+    for step, watermark in conn.execute(
+        f"SELECT step, seq FROM {WATERMARK_TABLE} WHERE table_name = ? ORDER BY step", (table,)
+    ).fetchall():
+        result[step] = conn.execute(
+            f"SELECT COUNT(DISTINCT row_id) FROM {CHANGE_LOG_TABLE} WHERE table_name = ? AND seq > ?",
+            (table, watermark),
+        ).fetchone()[0]
+    return result
+
+
+# ------------------------------------------------------------
+# 命令行：对范围内的数据库批量操作
+# ------------------------------------------------------------
+def list_range_databases(base_dir: str, start_num: int, end_num: int) -> List[str]:
+    """返回范围内的数据库路径，按文件夹编号升序（由数据目录清单提供）"""
+    return [path for _, path in list_range_entries(base_dir, start_num, end_num)]
+
+
+def run_command(command: str, argument: Optional[str] = None) -> None:
+    db_paths = list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER)
+    print(f"处理范围: {START_FOLDER} - {END_FOLDER}，数据库 {len(db_paths)} 个")
+    print("=" * 60)
+    for db_path in db_paths:
+        try:
+            conn = sqlite3.connect(db_path)
+            if command == "--install":
+                install_tracking(conn)
+                print(f"✅ 已安装: {db_path}")
+            elif command == "--uninstall":
+                uninstall_tracking(conn)
+                print(f"🗑 已移除: {db_path}")
+            elif not is_tracking(conn):
+                print(f"⏭ 未安装跟踪: {db_path}")
+            elif command == "--status":
+                counts = pending_counts(conn)
+                detail = "，".join(f"{step} 待处理 {n} 行" for step, n in counts.items()) or "尚无步骤运行过"
+                print(f"📂 {db_path}: {detail}")
+            elif command == "--reset":
+                reset_step(conn, argument)
+                print(f"🔄 已重置 {argument}: {db_path}")
+            elif command == "--prune":
+                print(f"🧹 {db_path}: 删除日志 {prune_log(conn)} 行")
+            conn.close()
+        except Exception as e:
+            print(f"❌ 处理失败：{db_path}，原因：{e}")
+
+
+if __name__ == "__main__":
+    commands = ("--install", "--uninstall", "--status", "--reset", "--prune")
+    if len(sys.argv) < 2 or sys.argv[1] not in commands or (sys.argv[1] == "--reset" and len(sys.argv) != 3):
+        print(__doc__)
+        sys.exit(1)
+    run_command(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
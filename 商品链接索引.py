@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全局商品链接索引
+每个分类的链接 txt 只在自身内部去重。同一个商品挂在五个分类下，采集器就会采五次，
+之后变成五个数据库里的五行。本工具把所有分类链接文件合并建立索引：规范化链接 → 所属分类列表，
+再重新生成采集用的链接文件，每个链接只出现在它第一次出现的分类文件中（按文件名自然排序），
+完整的分类列表另存，供之后给商品补分类。
+链接文件名是分类名经 分类键.filename_base 转换的结果（'|||' 已换成 '_'），
+索引中记录的分类名按 CATEGORY_FILE（每行一个分类）反查还原；不在分类列表中的文件按文件名记录。
+
+索引放在磁盘上的 SQLite 库中分批写入，几百万条链接内存占用也保持不变。
+
+输出：
+  OUTPUT_DIR/<分类>.txt    去重后的采集链接文件（与原文件同名）
+  OUTPUT_DIR/链接分类.tsv   每行：链接<TAB>分类1<TAB>分类2...（只列出属于多个分类的链接；分类名本身可能含 |||）
+  INDEX_PATH              索引库：url_index(url_id, url, first_file, seq)、url_category(url_id, category)
+
+用法：
+  python 商品链接索引.py                 重建索引并生成去重后的链接文件
+  python 商品链接索引.py --lookup <链接>  查询某个链接属于哪些分类
+"""
+
+import os
+import re
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from 分类键 import CategoryFileIndex
+from 连接工厂 import connect
+from 链接规范化 import canonicalize_url
+
+# ================ 固定配置（按需修改）================
+LINKS_DIR: str = r"D:\project\otterbox\链接"               # 各分类的链接 txt
+OUTPUT_DIR: str = r"D:\project\otterbox\链接_去重"          # 去重后的采集链接文件
+CATEGORY_FILE: str = r"D:\project\otterbox\分类\分类.txt"   # 每行一个分类名，用于把链接文件名还原成分类名
+INDEX_PATH: str = os.path.join(OUTPUT_DIR, "链接索引.db3")
+BATCH_SIZE: int = 50000                                    # 每批写入索引的链接数
+# ====================================================
+
+CATEGORY_MAP_NAME = "链接分类.tsv"
+
+
+def _natural_key(name: str):
+    # 自然排序键：数字按数值比较、字母大小写不敏感
+    return [int(s) if s.isdigit() else s.lower() for s in re.split(r"(\d+)", name)]
+
+
+def list_link_files(dir_path: str) -> List[str]:
+    names = [f for f in os.listdir(dir_path) if f.lower().endswith(".txt")]
+    names.sort(key=_natural_key)
+    return names
+
+
+def iter_links(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def load_category_names(category_file: str, links_dir: str) -> Dict[str, str]:
+    """按分类列表反查每个链接文件对应的分类名，返回 {文件名: 分类名}；分类文件不存在时返回空字典"""
+    if not category_file or not os.path.exists(category_file):
+        return {}
+    with open(category_file, "r", encoding="utf-8", errors="ignore") as f:
+        categories = [line.strip() for line in f if line.strip()]
+    mapping, _ = CategoryFileIndex(links_dir).match(categories)
+    names: Dict[str, str] = {}
+    for category, path in mapping.items():
+        # 多个分类转换后得到同一文件名时，以分类列表中靠前的为准
+        names.setdefault(os.path.basename(path), category)
+    return names
+
+
+def open_index(index_path: str, reset: bool = False):
+    conn = connect(index_path, "bulk-write")
+    if reset:
+        conn.executescript("DROP TABLE IF EXISTS url_category; DROP TABLE IF EXISTS url_index;")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS url_index (
+            url_id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            first_file TEXT NOT NULL,
+            seq INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS url_category (
+            url_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            PRIMARY KEY (url_id, category)
+        ) WITHOUT ROWID;
+    """)
+    return conn
+
+
+def _flush(conn, batch: List[Tuple[str, str, int]], category_names: Dict[str, str]) -> None:
+    # 已存在的链接保留第一次出现的文件和顺序，只追加分类
+    conn.executemany("INSERT OR IGNORE INTO url_index (url, first_file, seq) VALUES (?, ?, ?)", batch)
+    conn.executemany(
+        "INSERT OR IGNORE INTO url_category (url_id, category) SELECT url_id, ? FROM url_index WHERE url = ?",
+        [(category_names.get(name, os.path.splitext(name)[0]), url) for url, name, _ in batch],
+    )
+    conn.commit()
+
+
+def build_index(links_dir: str, index_path: str, batch_size: int = BATCH_SIZE,
+                category_names: Optional[Dict[str, str]] = None) -> Tuple[int, int]:
+    """重建索引，返回 (读入的链接行数, 去重后的链接数)；category_names 为 {文件名: 分类名}"""
+    category_names = category_names or {}
+    conn = open_index(index_path, reset=True)
+    try:
+        total, seq = 0, 0
+        batch: List[Tuple[str, str, int]] = []
+        for name in list_link_files(links_dir):
+            for link in iter_links(os.path.join(links_dir, name)):
+                seq += 1
+                batch.append((canonicalize_url(link), name, seq))
+                if len(batch) >= batch_size:
+                    _flush(conn, batch, category_names)
+                    total += len(batch)
+                    batch = []
+        if batch:
+            _flush(conn, batch, category_names)
+            total += len(batch)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_url_index_file ON url_index (first_file, seq)")
+        conn.commit()
+        unique = conn.execute("SELECT COUNT(*) FROM url_index").fetchone()[0]
+        return total, unique
+    finally:
+        conn.close()
+
+
+def write_crawl_files(index_path: str, links_dir: str, output_dir: str) -> int:
+    """按索引生成去重后的采集链接文件和多分类链接清单，返回写出的链接文件数"""
+    os.makedirs(output_dir, exist_ok=True)
+    conn = connect(index_path, "read-only")
+    try:
+        written = 0
+        for name in list_link_files(links_dir):
+            with open(os.path.join(output_dir, name), "w", encoding="utf-8") as f:
+                for (url,) in conn.execute("SELECT url FROM url_index WHERE first_file = ? ORDER BY seq", (name,)):
+                    f.write(url + "\n")
+            written += 1
+
+        with open(os.path.join(output_dir, CATEGORY_MAP_NAME), "w", encoding="utf-8") as f:
+            rows = conn.execute("""
+                SELECT i.url, GROUP_CONCAT(c.category, CHAR(9))
+                FROM url_category c JOIN url_index i USING (url_id)
+                GROUP BY c.url_id HAVING COUNT(*) > 1
+                ORDER BY i.seq
+            """)
+            for url, categories in rows:
+                f.write(f"{url}\t{categories}\n")
+        return written
+    finally:
+        conn.close()
+
+
+def lookup(index_path: str, url: str) -> List[str]:
+    """查询链接（自动规范化）所属的分类"""
+    conn = connect(index_path, "read-only")
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT c.category FROM url_category c JOIN url_index i USING (url_id) WHERE i.url = ? ORDER BY c.category",
+            (canonicalize_url(url),),
+        )]
+    finally:
+        conn.close()
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--lookup":
+        categories = lookup(INDEX_PATH, sys.argv[2])
+        print("\n".join(categories) if categories else "索引中没有该链接")
+        return
+
+    print("=== 全局商品链接索引 ===")
+    print(f"链接目录: {LINKS_DIR}")
+    print(f"输出目录: {OUTPUT_DIR}")
+    print("=" * 60)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    category_names = load_category_names(CATEGORY_FILE, LINKS_DIR)
+    unresolved = [name for name in list_link_files(LINKS_DIR) if name not in category_names]
+    if unresolved:
+        print(f"⚠️ {len(unresolved)} 个链接文件不在分类列表中，按文件名记录分类（如 {unresolved[0]}）")
+    total, unique = build_index(LINKS_DIR, INDEX_PATH, category_names=category_names)
+    files = write_crawl_files(INDEX_PATH, LINKS_DIR, OUTPUT_DIR)
+    duplicates = total - unique
+    print(f"✅ 读入 {total} 行链接，去重后 {unique} 个，跨分类/重复 {duplicates} 个（{duplicates / total:.1%}）"
+          if total else "链接目录中没有链接")
+    print(f"已生成 {files} 个采集链接文件；多分类链接清单: {os.path.join(OUTPUT_DIR, CATEGORY_MAP_NAME)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地图片仓库（按内容寻址）
+同一张图片会被采集器、下载.py 和 WooCommerce 远程抓取（sideload）反复下载，
+本地也散落在各处。图片仓库按文件内容的 sha256 保存，每张图片只存一份：
+  STORE_DIR/objects/ab/cd/<sha256>.<扩展名>    图片文件（按哈希前两级分目录）
+  STORE_DIR/图片仓库.db3                       索引：链接 → 哈希 → 文件路径
+链接按 链接规范化.canonicalize_url 统一写法后登记，内容相同的不同链接指向同一个文件。
+
+下载.py 下载完成后把文件放入仓库；上传商品.py 通过 resolve(链接) 直接拿到本地文件，
+不用联网，并记住每张图片上传到媒体库后的地址，同一张图片在同一站点只上传一次。
+
+用法：
+  python 图片仓库.py --stats                 查看仓库统计
+  python 图片仓库.py --resolve <链接>         查询链接对应的本地文件
+  python 图片仓库.py --import <下载清单.db3>   把以前下载.py 下载好的文件导入仓库
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+from typing import Dict, Optional, Tuple
+
+from 连接工厂 import connect
+from 链接规范化 import canonicalize_url
+
+# ================ 固定配置（按需修改）================
+STORE_DIR: str = r"D:\火车采集器V10.28\图片仓库"
+# ====================================================
+
+INDEX_NAME = "图片仓库.db3"
+HASH_CHUNK = 1024 * 1024
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".avif", ".svg"}
+
+# 常见图片格式的文件头，链接里没有扩展名时据此确定
+_MAGIC = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF8", ".gif"),
+    (b"BM", ".bmp"),
+)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def guess_extension(path: str) -> str:
+    """优先按文件头判断扩展名，其次用原文件名的扩展名"""
+    with open(path, "rb") as f:
+        head = f.read(16)
+    for magic, ext in _MAGIC:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".part":
+        ext = os.path.splitext(path[:-len(ext)])[1].lower()
+    return ext if ext in IMAGE_EXTENSIONS else ".img"
+
+
+class ImageStore:
+    """按内容寻址的图片仓库；索引库用 safe 配置打开，上传脚本的多个进程可同时使用"""
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        self.store_dir = os.path.abspath(store_dir)
+        self.objects_dir = os.path.join(self.store_dir, "objects")
+        self.tmp_dir = os.path.join(self.store_dir, "tmp")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.conn = connect(os.path.join(self.store_dir, INDEX_NAME), "safe")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                created_at TEXT DEFAULT (datetime('now', 'localtime'))
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+                added_at TEXT DEFAULT (datetime('now', 'localtime'))
+            );
+            CREATE INDEX IF NOT EXISTS idx_urls_sha256 ON urls (sha256);
+            CREATE TABLE IF NOT EXISTS uploads (
+                sha256 TEXT NOT NULL,
+                site TEXT NOT NULL,
+                media_id INTEGER,
+                media_url TEXT NOT NULL,
+                uploaded_at TEXT DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (sha256, site)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS image_group (
+                sha256 TEXT PRIMARY KEY,
+                group_sha256 TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def object_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:4], sha256 + ext)
+
+    def _abs(self, rel_path: str) -> str:
+        # 索引里保存相对路径，整个仓库目录可以直接搬走
+        return os.path.join(self.store_dir, rel_path)
+
+    def add_file(self, src_path: str, url: Optional[str] = None, move: bool = False) -> Tuple[str, str]:
+        """把文件放入仓库（move=True 时移动，否则复制），可同时登记链接；返回 (sha256, 仓库中的路径)。
+        内容已存在时不再保存第二份"""
+        sha256 = file_sha256(src_path)
+        row = self.conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row and os.path.exists(self._abs(row[0])):
+            path = self._abs(row[0])
+            if move:
+                os.remove(src_path)
+        else:
+            path = self.object_path(sha256, guess_extension(src_path))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if move:
+                shutil.move(src_path, path)
+            else:
+                shutil.copyfile(src_path, path)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO blobs (sha256, path, bytes) VALUES (?, ?, ?)",
+                (sha256, os.path.relpath(path, self.store_dir), os.path.getsize(path)),
+            )
+        if url:
+            self.conn.execute("INSERT OR REPLACE INTO urls (url, sha256) VALUES (?, ?)", (canonicalize_url(url), sha256))
+        self.conn.commit()
+        return sha256, path
+
+    def sha256_for(self, url: str) -> Optional[str]:
+        row = self.conn.execute("SELECT sha256 FROM urls WHERE url = ?", (canonicalize_url(url),)).fetchone()
+        return row[0] if row else None
+
+    def path_for(self, sha256: str) -> Optional[str]:
+        row = self.conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row and os.path.exists(self._abs(row[0])):
+            return self._abs(row[0])
+        return None
+
+    def resolve(self, url: str) -> Optional[str]:
+        """链接对应的本地文件路径；仓库里没有（或文件已被删除）时返回 None"""
+        row = self.conn.execute(
+            "SELECT b.path FROM urls u JOIN blobs b USING (sha256) WHERE u.url = ?", (canonicalize_url(url),)
+        ).fetchone()
+        if row and os.path.exists(self._abs(row[0])):
+            return self._abs(row[0])
+        return None
+
+    def representative(self, sha256: str) -> str:
+        """相似图片组（图片查重.py 生成）的代表图片；不在任何组中时返回自身"""
+        row = self.conn.execute("SELECT group_sha256 FROM image_group WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else sha256
+
+    def uploaded_media(self, sha256: str, site: str) -> Optional[Tuple[Optional[int], str]]:
+        """这张图片在 site 上已上传的 (媒体 ID, 媒体地址)"""
+        row = self.conn.execute(
+            "SELECT media_id, media_url FROM uploads WHERE sha256 = ? AND site = ?", (sha256, site)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def remember_upload(self, sha256: str, site: str, media_id: Optional[int], media_url: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO uploads (sha256, site, media_id, media_url) VALUES (?, ?, ?, ?)",
+                          (sha256, site, media_id, media_url))
+        self.conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        blobs, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM blobs").fetchone()
+        urls = self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        uploads = self.conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+        return {"blobs": blobs, "bytes": size, "urls": urls, "uploads": uploads}
+
+
+def resolve_entry(entry: str, folder_base: str, store: Optional[ImageStore] = None) -> Optional[str]:
+    """把 图片 字段中的一项解析成本地文件：网络链接查仓库，其余按文件夹内相对路径（含 images 子目录）查找"""
+    entry = entry.strip()
+    if not entry:
+        return None
+    if entry.lower().startswith(("http://", "https://")):
+        return store.resolve(entry) if store is not None else None
+    for path in (os.path.join(folder_base, entry), os.path.join(folder_base, "images", entry)):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def import_download_manifest(store: ImageStore, manifest_path: str) -> Tuple[int, int]:
+    """导入 下载.py 清单中已完成的文件（复制，原文件保留），返回 (导入的链接数, 新增的图片数)"""
+    before = store.stats()["blobs"]
+    imported = 0
+    conn = connect(manifest_path, "read-only")
+    try:
+        rows = conn.execute("SELECT url, path FROM downloads WHERE status = 'done'").fetchall()
+    finally:
+        conn.close()
+    for url, path in rows:
+        if os.path.exists(path) and not store.resolve(url):
+            store.add_file(path, url)
+            imported += 1
+    return imported, store.stats()["blobs"] - before
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+    with ImageStore(STORE_DIR) as store:
+        if args[0] == "--resolve" and len(args) == 2:
+            path = store.resolve(args[1])
+            print(path or "仓库中没有该链接的图片")
+        elif args[0] == "--import" and len(args) == 2:
+            imported, added = import_download_manifest(store, args[1])
+            print(f"✅ 导入 {imported} 个链接，新增 {added} 张图片（其余内容重复，只保存一份）")
+        elif args[0] == "--stats":
+            stats = store.stats()
+            print(f"图片 {stats['blobs']} 张，{stats['bytes'] / 1024 / 1024:.1f} MB；"
+                  f"链接 {stats['urls']} 个；已上传记录 {stats['uploads']} 条")
+        else:
+            print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
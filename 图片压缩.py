@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传前图片压缩
+商品图片按原始尺寸和格式上传到 WordPress，媒体上传时间和服务器生成缩略图的开销都随字节数增长。
+本工具在上传前把范围内商品用到的本地图片（图片仓库中的链接、文件夹内的本地图片）
+缩小到 MAX_DIMENSION 以内并重新编码为 WebP/JPEG，用 Pillow 在多进程中并行处理。
+
+压缩结果按源文件 sha256 + 压缩参数缓存在 OUTPUT_DIR，同一张图片只压缩一次；
+压缩后节省不到 MIN_SAVING 的保留原图。上传商品.py 设置 COMPRESSED_DIR 后自动改传压缩版本。
+
+用法：
+  python 图片压缩.py   压缩范围内的图片并按文件夹报告节省的字节数
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from 图片仓库 import ImageStore, file_sha256, resolve_entry
+from 数据目录清单 import list_range_databases
+from 连接工厂 import connect
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+START_FOLDER: Optional[int] = 5211
+END_FOLDER: Optional[int] = 5523
+TABLE_NAME: str = "Content"
+IMAGE_COLUMN: str = "图片"
+IMG_SEPARATOR: str = "|||"
+
+IMAGE_STORE_DIR: Optional[str] = r"D:\火车采集器V10.28\图片仓库"   # 网络链接从图片仓库取本地文件，None = 只处理本地图片
+OUTPUT_DIR: str = r"D:\火车采集器V10.28\图片压缩"                 # 压缩结果缓存目录
+
+MAX_DIMENSION: int = 1600        # 长边最大像素，小于它的图片不放大
+OUTPUT_FORMAT: str = "WEBP"      # "WEBP" 或 "JPEG"
+QUALITY: int = 82                # 编码质量（1~100）
+MIN_SAVING: float = 0.05         # 压缩后至少小这么多（比例）才使用压缩版本，否则保留原图
+MAX_WORKERS: Optional[int] = None  # 进程数（None = CPU 核数）
+# ====================================================
+
+INDEX_NAME = "压缩缓存.db3"
+EXTENSIONS = {"WEBP": ".webp", "JPEG": ".jpg"}
+
+
+def settings_signature() -> str:
+    """当前压缩参数的摘要，参数改变后旧缓存不再使用"""
+    return hashlib.sha1(repr((MAX_DIMENSION, OUTPUT_FORMAT.upper(), QUALITY)).encode("utf-8")).hexdigest()[:8]
+
+
+def compress_image(src_path: str, out_path: str, max_dimension: int, output_format: str,
+                   quality: int, min_saving: float) -> Tuple[int, Optional[int]]:
+    """缩小并重新编码一张图片（在子进程中运行），返回 (原大小, 压缩后大小)；
+    没有压缩价值（动图、压缩后不够小）时不写文件，压缩后大小为 None"""
+    # 只有压缩时才需要 Pillow，上传脚本查缓存不需要
+    from PIL import Image, ImageOps
+
+    src_bytes = os.path.getsize(src_path)
+    with Image.open(src_path) as img:
+        if getattr(img, "n_frames", 1) > 1:
+            return src_bytes, None
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if output_format == "JPEG" or img.mode not in ("RGB", "RGBA"):
+            if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+                img = img.convert("RGBA")
+                if output_format == "JPEG":
+                    # JPEG 不支持透明，铺白底
+                    background = Image.new("RGB", img.size, (255, 255, 255))
+                    background.paste(img, mask=img.getchannel("A"))
+                    img = background
+            else:
+                img = img.convert("RGB")
+
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        tmp_path = out_path + ".tmp"
+        if output_format == "JPEG":
+            img.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+        else:
+            img.save(tmp_path, "WEBP", quality=quality, method=4)
+
+    out_bytes = os.path.getsize(tmp_path)
+    if out_bytes > src_bytes * (1 - min_saving):
+        os.remove(tmp_path)
+        return src_bytes, None
+    os.replace(tmp_path, out_path)
+    return src_bytes, out_bytes
+
+
+class CompressionCache:
+    """压缩结果缓存：源文件 sha256 + 压缩参数 → 压缩后的文件"""
+
+    def __init__(self, output_dir: str = OUTPUT_DIR):
+        self.output_dir = os.path.abspath(output_dir)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.signature = settings_signature()
+        self.extension = EXTENSIONS[OUTPUT_FORMAT.upper()]
+        self.conn = connect(os.path.join(self.output_dir, INDEX_NAME), "safe")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS compressed (
+                sha256 TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                out_path TEXT,
+                src_bytes INTEGER NOT NULL,
+                out_bytes INTEGER,
+                PRIMARY KEY (sha256, settings)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def output_path(self, sha256: str) -> str:
+        return os.path.join(self.output_dir, sha256[:2], f"{sha256}_{self.signature}{self.extension}")
+
+    def get(self, sha256: str) -> Optional[Tuple[Optional[str], int, Optional[int]]]:
+        """已处理过时返回 (压缩文件路径或 None, 原大小, 压缩后大小)，压缩文件被删掉的视为未处理"""
+        row = self.conn.execute(
+            "SELECT out_path, src_bytes, out_bytes FROM compressed WHERE sha256 = ? AND settings = ?",
+            (sha256, self.signature),
+        ).fetchone()
+        if row is None:
+            return None
+        out_path = os.path.join(self.output_dir, row[0]) if row[0] else None
+        if out_path and not os.path.exists(out_path):
+            return None
+        return out_path, row[1], row[2]
+
+    def put(self, sha256: str, out_path: Optional[str], src_bytes: int, out_bytes: Optional[int]) -> None:
+        rel_path = os.path.relpath(out_path, self.output_dir) if out_path else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO compressed (sha256, settings, out_path, src_bytes, out_bytes) VALUES (?, ?, ?, ?, ?)",
+            (sha256, self.signature, rel_path, src_bytes, out_bytes),
+        )
+
+    def lookup(self, sha256: str) -> Optional[str]:
+        """压缩后的文件路径；未压缩或保留原图时返回 None"""
+        cached = self.get(sha256)
+        return cached[0] if cached else None
+
+
+def folder_images(db_path: str, store: Optional[ImageStore]) -> Dict[str, str]:
+    """一个文件夹用到的本地图片 {路径: sha256}（网络链接的哈希直接取自仓库）"""
+    folder_base = os.path.dirname(db_path)
+    conn = connect(db_path, "read-only")
+    try:
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info("{TABLE_NAME}")')}
+        if IMAGE_COLUMN not in columns:
+            return {}
+        values = [row[0] for row in conn.execute(
+            f'SELECT "{IMAGE_COLUMN}" FROM "{TABLE_NAME}" WHERE "{IMAGE_COLUMN}" IS NOT NULL AND "{IMAGE_COLUMN}" != \'\'')]
+    finally:
+        conn.close()
+
+    images: Dict[str, str] = {}
+    for value in values:
+        for entry in str(value).split(IMG_SEPARATOR):
+            path = resolve_entry(entry, folder_base, store)
+            if path and path not in images:
+                sha256 = store.sha256_for(entry) if store is not None and path.startswith(store.objects_dir) else None
+                images[path] = sha256 or file_sha256(path)
+    return images
+
+
+def main():
+    print("=== 上传前图片压缩 ===")
+    print(f"范围: {START_FOLDER}~{END_FOLDER}，长边 ≤ {MAX_DIMENSION}px，{OUTPUT_FORMAT} 质量 {QUALITY}")
+    print(f"缓存目录: {OUTPUT_DIR}")
+    print("=" * 60)
+
+    store = ImageStore(IMAGE_STORE_DIR) if IMAGE_STORE_DIR and os.path.isdir(IMAGE_STORE_DIR) else None
+    cache = CompressionCache(OUTPUT_DIR)
+    try:
+        folders: List[Tuple[int, Dict[str, str]]] = []
+        todo: Dict[str, str] = {}   # sha256 → 源文件（同一张图片只压缩一次）
+        for folder_num, db_path in list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER):
+            images = folder_images(db_path, store)
+            folders.append((folder_num, images))
+            for path, sha256 in images.items():
+                if sha256 not in todo and cache.get(sha256) is None:
+                    todo[sha256] = path
+        total_images = len({sha for _, images in folders for sha in images.values()})
+        print(f"共 {total_images} 张不同的图片，已有缓存 {total_images - len(todo)} 张，待压缩 {len(todo)} 张")
+
+        failed = 0
+        if todo:
+            fmt = OUTPUT_FORMAT.upper()
+            with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                futures = {
+                    pool.submit(compress_image, path, cache.output_path(sha256), MAX_DIMENSION, fmt, QUALITY,
+                                MIN_SAVING): sha256
+                    for sha256, path in todo.items()
+                }
+                for index, future in enumerate(as_completed(futures), start=1):
+                    sha256 = futures[future]
+                    try:
+                        src_bytes, out_bytes = future.result()
+                    except Exception as e:
+                        print(f"❌ 压缩失败：{todo[sha256]}：{e}")
+                        failed += 1
+                        continue
+                    cache.put(sha256, cache.output_path(sha256) if out_bytes is not None else None, src_bytes, out_bytes)
+                    if index % 500 == 0:
+                        cache.conn.commit()
+                        print(f"[进度] {index}/{len(todo)}")
+            cache.conn.commit()
+
+        # 按文件夹报告：文件夹内每张图片计一次，保留原图的按原大小计；合计中多个文件夹共用的图片只计一次
+        def sizes(hashes) -> Tuple[int, int]:
+            src_total = out_total = 0
+            for sha256 in hashes:
+                cached = cache.get(sha256)
+                if cached is None:
+                    continue
+                _, src_bytes, out_bytes = cached
+                src_total += src_bytes
+                out_total += out_bytes if out_bytes is not None else src_bytes
+            return src_total, out_total
+
+        print(f"{'文件夹':<10}{'图片':>8}{'原大小(MB)':>14}{'压缩后(MB)':>14}{'节省':>10}")
+        for folder_num, images in folders:
+            src_total, out_total = sizes(set(images.values()))
+            saved = f"{1 - out_total / src_total:.1%}" if src_total else "-"
+            print(f"{folder_num:<10}{len(images):>8}{src_total / 1024 / 1024:>14.1f}{out_total / 1024 / 1024:>14.1f}{saved:>10}")
+        grand_src, grand_out = sizes({sha for _, images in folders for sha in images.values()})
+        if grand_src:
+            print(f"✅ 合计 {grand_src / 1024 / 1024:.1f} MB → {grand_out / 1024 / 1024:.1f} MB，"
+                  f"节省 {(grand_src - grand_out) / 1024 / 1024:.1f} MB（{1 - grand_out / grand_src:.1%}）")
+        if failed:
+            print(f"⚠️ {failed} 张图片压缩失败，上传时使用原图")
+    finally:
+        cache.close()
+        if store:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
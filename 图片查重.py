@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片感知哈希查重
+同一张商品图常以不同的文件名、链接（甚至不同尺寸、压缩质量）出现，按链接或文件内容去重都发现不了。
+本工具对图片仓库（图片仓库.py）中的每张图片计算 64 位 dHash（差值哈希）和平均颜色（多进程并行，
+结果缓存在仓库索引中），用 BK 树找出汉明距离不超过 MAX_DISTANCE 且颜色相近的图片，归为同一组。
+只比哈希不比颜色时，同款不同颜色的商品图会被误归为一组，所以颜色差超过 COLOR_TOLERANCE 的不算重复。
+分组以代表图片为中心（从文件最大的图片开始，依次把与它相似、尚未分组的图片归入），
+组内每张图片都直接与代表图片相似；不会因为 A 像 B、B 像 C 就把 A、C 连成一组。
+
+输出：
+  图片仓库索引 image_group 表   每张图片 → 所在组的代表图片（组内文件最大的一张）；
+                               上传商品.py 开启 REUSE_SIMILAR_IMAGES 后据此复用已上传的相似图片
+  REPORT_DIR/图片重复组.csv     每组的图片和链接
+  REPORT_DIR/商品图片重复.csv   范围内共用 MIN_SHARED_IMAGES 张以上相似图片的商品对，供人工检查重复商品
+
+用法：
+  python 图片查重.py   计算哈希、分组并生成报告
+"""
+
+import csv
+import os
+import sqlite3
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from 图片仓库 import ImageStore
+from 数据目录清单 import list_range_databases
+from 连接工厂 import connect
+
+# ================ 固定配置（按需修改）================
+IMAGE_STORE_DIR: str = r"D:\火车采集器V10.28\图片仓库"
+REPORT_DIR: str = r"D:\火车采集器V10.28\图片查重"
+
+MAX_DISTANCE: int = 6            # dHash 汉明距离阈值（0~64，越小越严格）
+COLOR_TOLERANCE: int = 24        # 平均颜色（RGB 各通道）最大差值
+MAX_WORKERS: Optional[int] = None  # 计算哈希的进程数（None = CPU 核数）
+
+# 商品重复报告
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+START_FOLDER: Optional[int] = 5211
+END_FOLDER: Optional[int] = 5523
+TABLE_NAME: str = "Content"
+IMAGE_COLUMN: str = "图片"
+IMG_SEPARATOR: str = "|||"
+MIN_SHARED_IMAGES: int = 2       # 两个商品至少共用几组相似图片才报告
+MAX_GROUP_PRODUCTS: int = 50     # 被这么多商品共用的图片视为通用图（尺码表、品牌图等），不参与商品比较
+# ====================================================
+
+HASH_SIZE = 8
+
+
+def image_signature(path: str) -> Tuple[int, Tuple[int, int, int]]:
+    """计算一张图片的 dHash 和平均颜色（在子进程中运行）"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.draft("RGB", (64, 64))   # JPEG 直接按缩小的尺寸解码，快很多
+        img = img.convert("RGB")
+        gray = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+        pixels = list(gray.getdata())
+        value = 0
+        for row in range(HASH_SIZE):
+            for col in range(HASH_SIZE):
+                left = pixels[row * (HASH_SIZE + 1) + col]
+                right = pixels[row * (HASH_SIZE + 1) + col + 1]
+                value = (value << 1) | (left > right)
+        color = img.resize((1, 1), Image.BOX).getpixel((0, 0))
+    return value, tuple(color)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """按汉明距离组织的 BK 树，查询与某个哈希距离不超过 radius 的所有项"""
+
+    def __init__(self):
+        self.root = None   # 节点：[哈希, [附带的项], {距离: 子节点}]
+
+    def add(self, value: int, item) -> None:
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> Iterator[Tuple[int, object]]:
+        """返回 (距离, 项)"""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                for item in node[1]:
+                    yield distance, item
+            for d, child in node[2].items():
+                if distance - radius <= d <= distance + radius:
+                    stack.append(child)
+
+
+def _to_signed(value: int) -> int:
+    # SQLite 整数是有符号 64 位
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def update_hashes(store: ImageStore) -> Tuple[int, int]:
+    """为仓库中还没有哈希的图片计算哈希，返回 (新计算数, 失败数)"""
+    store.conn.execute("""
+        CREATE TABLE IF NOT EXISTS image_hash (
+            sha256 TEXT PRIMARY KEY,
+            dhash INTEGER,
+            color INTEGER
+        )
+    """)
+    todo = store.conn.execute(
+        "SELECT sha256, path FROM blobs WHERE sha256 NOT IN (SELECT sha256 FROM image_hash)"
+    ).fetchall()
+    print(f"待计算哈希 {len(todo)} 张")
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {pool.submit(image_signature, os.path.join(store.store_dir, path)): sha256 for sha256, path in todo}
+        for future in as_completed(futures):
+            sha256 = futures[future]
+            try:
+                value, (r, g, b) = future.result()
+            except Exception:
+                # 不是图片或文件损坏：记为空，下次不再重复尝试
+                store.conn.execute("INSERT OR REPLACE INTO image_hash (sha256, dhash, color) VALUES (?, NULL, NULL)",
+                                   (sha256,))
+                failed += 1
+                continue
+            store.conn.execute("INSERT OR REPLACE INTO image_hash (sha256, dhash, color) VALUES (?, ?, ?)",
+                               (sha256, _to_signed(value), (r << 16) | (g << 8) | b))
+            done += 1
+            if done % 1000 == 0:
+                store.conn.commit()
+                print(f"[进度] {done}/{len(todo)}")
+    store.conn.commit()
+    return done, failed
+
+
+def _color_close(a: int, b: int) -> bool:
+    return all(abs(((a >> shift) & 0xFF) - ((b >> shift) & 0xFF)) <= COLOR_TOLERANCE for shift in (16, 8, 0))
+
+
+def is_similar(hash_a: Tuple[int, int], hash_b: Tuple[int, int]) -> bool:
+    """两张图片的 (dhash, color) 是否在 MAX_DISTANCE 和 COLOR_TOLERANCE 之内"""
+    return (hamming(_to_unsigned(hash_a[0]), _to_unsigned(hash_b[0])) <= MAX_DISTANCE
+            and _color_close(hash_a[1], hash_b[1]))
+
+
+def group_images(store: ImageStore) -> Dict[str, str]:
+    """把相似图片分组，写入 image_group 表，返回 {sha256: 代表图片 sha256}（只含多于一张的组）
+
+    按文件从大到小依次取尚未分组的图片作为代表，只把与代表本身相似的图片归入该组。
+    """
+    rows = store.conn.execute(
+        "SELECT h.sha256, h.dhash, h.color, b.bytes FROM image_hash h JOIN blobs b USING (sha256) "
+        "WHERE h.dhash IS NOT NULL"
+    ).fetchall()
+    rows.sort(key=lambda row: (-row[3], row[0]))
+    colors = {sha256: color for sha256, _, color, _ in rows}
+
+    tree = BKTree()
+    for sha256, dhash, _, _ in rows:
+        tree.add(_to_unsigned(dhash), sha256)
+
+    groups: Dict[str, str] = {}
+    for sha256, dhash, color, _ in rows:
+        if sha256 in groups:
+            continue
+        members = [other for _, other in tree.search(_to_unsigned(dhash), MAX_DISTANCE)
+                   if other != sha256 and other not in groups and _color_close(color, colors[other])]
+        if members:
+            groups[sha256] = sha256
+            for other in members:
+                groups[other] = sha256
+
+    store.conn.execute("DELETE FROM image_group")
+    store.conn.executemany("INSERT INTO image_group (sha256, group_sha256) VALUES (?, ?)", groups.items())
+    store.conn.commit()
+    return groups
+
+
+def similar_representative(store: ImageStore, sha256: str) -> Optional[str]:
+    """可以代替这张图片上传的代表图片：必须在 image_group 中，且与这张图片本身相似（重新核对哈希）；
+    否则返回 None"""
+    representative = store.representative(sha256)
+    if representative == sha256:
+        return None
+    try:
+        hashes = dict((row[0], (row[1], row[2])) for row in store.conn.execute(
+            "SELECT sha256, dhash, color FROM image_hash WHERE sha256 IN (?, ?) AND dhash IS NOT NULL",
+            (sha256, representative),
+        ))
+    except sqlite3.OperationalError:
+        # 还没运行过图片查重，没有哈希表
+        return None
+    if len(hashes) != 2 or not is_similar(hashes[sha256], hashes[representative]):
+        return None
+    return representative
+
+
+def write_group_report(store: ImageStore, groups: Dict[str, str], path: str) -> int:
+    urls: Dict[str, List[str]] = defaultdict(list)
+    for url, sha256 in store.conn.execute("SELECT url, sha256 FROM urls"):
+        if sha256 in groups:
+            urls[sha256].append(url)
+    by_group: Dict[str, List[str]] = defaultdict(list)
+    for sha256, representative in groups.items():
+        by_group[representative].append(sha256)
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["组", "图片数", "代表图片", "图片", "本地文件", "链接"])
+        for index, (representative, items) in enumerate(sorted(by_group.items(), key=lambda kv: -len(kv[1])), start=1):
+            for sha256 in sorted(items, key=lambda s: s != representative):
+                writer.writerow([index, len(items), "是" if sha256 == representative else "", sha256,
+                                 store.path_for(sha256) or "", IMG_SEPARATOR.join(urls.get(sha256, []))])
+    return len(by_group)
+
+
+def iter_products(store: ImageStore) -> Iterator[Tuple[str, str, List[str]]]:
+    """范围内的商品：(文件夹:ID, 标题, [图片 sha256])"""
+    for folder_num, db_path in list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER):
+        conn = connect(db_path, "read-only")
+        try:
+            columns = {row[1] for row in conn.execute(f'PRAGMA table_info("{TABLE_NAME}")')}
+            if IMAGE_COLUMN not in columns:
+                continue
+            title = '"标题"' if "标题" in columns else "''"
+            rows = conn.execute(
+                f'SELECT ID, {title}, "{IMAGE_COLUMN}" FROM "{TABLE_NAME}" '
+                f'WHERE "{IMAGE_COLUMN}" IS NOT NULL AND "{IMAGE_COLUMN}" != \'\''
+            ).fetchall()
+        finally:
+            conn.close()
+        for record_id, product_title, value in rows:
+            hashes = [store.sha256_for(entry) for entry in str(value).split(IMG_SEPARATOR)
+                      if entry.strip().lower().startswith(("http://", "https://"))]
+            yield f"{folder_num}:{record_id}", product_title or "", [h for h in hashes if h]
+
+
+def write_product_report(store: ImageStore, groups: Dict[str, str], path: str) -> int:
+    """找出共用相似图片的商品对，返回报告的商品对数"""
+    titles: Dict[str, str] = {}
+    products_by_group: Dict[str, List[str]] = defaultdict(list)
+    for product, product_title, hashes in iter_products(store):
+        titles[product] = product_title
+        for group in {groups.get(h, h) for h in hashes}:
+            products_by_group[group].append(product)
+
+    shared: Counter = Counter()
+    for products in products_by_group.values():
+        if 1 < len(products) <= MAX_GROUP_PRODUCTS:
+            shared.update(combinations(sorted(products), 2))
+
+    pairs = [(pair, count) for pair, count in shared.items() if count >= MIN_SHARED_IMAGES]
+    pairs.sort(key=lambda item: -item[1])
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["商品A", "标题A", "商品B", "标题B", "共用相似图片数"])
+        for (a, b), count in pairs:
+            writer.writerow([a, titles[a], b, titles[b], count])
+    return len(pairs)
+
+
+def main():
+    print("=== 图片感知哈希查重 ===")
+    print(f"图片仓库: {IMAGE_STORE_DIR}")
+    print(f"汉明距离 ≤ {MAX_DISTANCE}，颜色差 ≤ {COLOR_TOLERANCE}")
+    print("=" * 60)
+    if not os.path.isdir(IMAGE_STORE_DIR):
+        print("❌ 图片仓库不存在，先用 下载.py 下载图片")
+        return
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with ImageStore(IMAGE_STORE_DIR) as store:
+        done, failed = update_hashes(store)
+        print(f"新计算哈希 {done} 张，无法识别 {failed} 张")
+        groups = group_images(store)
+        group_path = os.path.join(REPORT_DIR, "图片重复组.csv")
+        group_count = write_group_report(store, groups, group_path)
+        print(f"✅ 相似图片 {group_count} 组，共 {len(groups)} 张 → {group_path}")
+        product_path = os.path.join(REPORT_DIR, "商品图片重复.csv")
+        pair_count = write_product_report(store, groups, product_path)
+        print(f"✅ 疑似重复商品 {pair_count} 对 → {product_path}")
+
+
+if __name__ == "__main__":
+    main()
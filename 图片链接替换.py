@@ -1,6 +1,8 @@
-import os
-import sqlite3
-import shutil
+from 数据库备份 import backup_database
+from 撤销日志 import new_run_id, record_rowids, start_run
+from 变更跟踪 import begin_step, mark_done, pending_where
+from 数据目录清单 import list_range_databases
+from 连接工厂 import connect
 
 # 设置你的根目录路径
 base_dir = r"D:\火车采集器V10.28\Data"  # ← 修改成你的路径
@@ -19,51 +21,60 @@ def fix_image_field(img_str: str) -> str:
             p = "https://www.amirl.top/" + p
         fixed_parts.append(p)
     return "|||".join(fixed_parts)
-    
-# 遍历所有子文件夹
-for folder in os.listdir(base_dir):
-    if folder.isdigit():
-        folder_num = int(folder)
-        if 3664 <= folder_num <= 3763:
-            folder_path = os.path.join(base_dir, folder)
-            db_path = os.path.join(folder_path, "SpiderResult.db3")
 
-            if os.path.exists(db_path):
-                try:
-                    # 先备份
-                    backup_path = db_path + ".bak"
-                    if not os.path.exists(backup_path):
-                        shutil.copy2(db_path, backup_path)
-                        print(f"🛡 已备份：{backup_path}")
-                    else:
-                        print(f"⚠️ 已存在备份，跳过备份：{backup_path}")
 
-                    conn = sqlite3.connect(db_path)
-                    cursor = conn.cursor()
+def main():
+    # 本次运行编号：被修改的行记入撤销日志，可用 python 撤销日志.py --rollback <编号> 恢复
+    run_id = new_run_id("图片链接")
+    print(f"撤销日志运行编号：{run_id}")
 
-                    # 检查 Content 表是否存在
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Content'")
-                    if cursor.fetchone():
-                        print(f"📂 数据库：{db_path}")
+    # 遍历所有子文件夹
+    for folder_num, db_path in list_range_databases(base_dir, 3664, 3763):
+        try:
+            # 先备份（压缩快照，内容未变时跳过）
+            result = backup_database(db_path)
+            if result["status"] == "created":
+                print(f"🛡 已备份：{result['path']}")
+            elif result["status"] == "unchanged":
+                print(f"⚠️ 内容未变化，沿用已有备份：{result['path']}")
+            else:
+                print(f"❌ 备份失败，跳过：{result['error']}")
+                continue
 
-                        # 取出所有图片字段
-                        cursor.execute("SELECT rowid, 图片 FROM Content")
-                        rows = cursor.fetchall()
+            conn = connect(db_path, "bulk-write")
+            cursor = conn.cursor()
 
-                        preview_count = 0
-                        for rowid, img in rows:
-                            new_img = fix_image_field(img)
-                            if new_img != img:
-                                cursor.execute("UPDATE Content SET 图片 = ? WHERE rowid = ?", (new_img, rowid))
-                                if preview_count < 5:  # 预览前 5 条
-                                    print(f"🔍 {img}  →  {new_img}")
-                                    preview_count += 1
+            # 检查 Content 表是否存在
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Content'")
+            if cursor.fetchone():
+                print(f"📂 数据库：{db_path}")
 
-                        conn.commit()
-                        print(f"✅ 成功修改：{db_path}")
-                    else:
-                        print(f"⚠️ 跳过（无 Content 表）：{db_path}")
+                # 取出图片字段（安装了变更跟踪时只取上次运行后新增或变化的行）
+                begin_step(conn)
+                cursor.execute(f"SELECT rowid, 图片 FROM Content WHERE {pending_where(conn, '图片链接')}")
+                rows = cursor.fetchall()
 
-                    conn.close()
-                except Exception as e:
-                    print(f"❌ 处理失败：{db_path}，原因：{e}")
+                changes = []
+                for rowid, img in rows:
+                    new_img = fix_image_field(img)
+                    if new_img != img:
+                        changes.append((new_img, rowid))
+                        if len(changes) <= 5:  # 预览前 5 条
+                            print(f"🔍 {img}  →  {new_img}")
+
+                start_run(conn, run_id, "图片链接")
+                record_rowids(conn, run_id, "update", [rowid for _, rowid in changes])
+                cursor.executemany("UPDATE Content SET 图片 = ? WHERE rowid = ?", changes)
+                mark_done(conn, "图片链接")
+                conn.commit()
+                print(f"✅ 成功修改：{db_path}")
+            else:
+                print(f"⚠️ 跳过（无 Content 表）：{db_path}")
+
+            conn.close()
+        except Exception as e:
+            print(f"❌ 处理失败：{db_path}，原因：{e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字段规则批处理
+把 复制.py（颜色1 → 颜色）、规格统一.py（固定规格）、图片链接替换.py、颜色提取.py 这类
+“逐行读出、Python 处理、逐行写回”的字段修改，统一写成 JSON 规则文件。
+规则按顺序编译为若干步 SQL 表达式（必要时调用注册的 UDF），先在临时表上逐步计算，
+再对每个数据库只执行一条 UPDATE，且只改动结果有变化的行（记入撤销日志）。
+
+规则文件格式：
+  {"rules": [
+    {"op": "copy", "from": "颜色1", "to": "颜色", "skip_empty": true},
+    {"op": "set", "column": "规格", "value": "XS|||S|||M|||L|||XL"},
+    {"op": "regex_replace", "column": "图片", "pattern": "^http://", "replace": "https://"},
+    {"op": "split_join", "column": "颜色", "sep": "|||", "join": "|||", "strip": true, "dedupe": true},
+    {"op": "transform", "name": "fix_image", "column": "图片"}
+  ]}
+
+规则说明：
+  copy           把 from 列的值写入 to 列；skip_empty 为 true 时来源为空则保留原值
+  set            把 column 列设为常量 value
+  regex_replace  对 column 列（或 source 列）做正则替换，replace 支持 \\1 分组引用
+  split_join     按 sep 拆分后用 join 拼接，strip（默认开启，去空白并丢弃空段）、dedupe（去重保序）
+  transform      调用命名转换（见 TRANSFORMS），可用 source 指定来源列
+后面的规则读取的是前面规则处理后的值，与依次运行多个脚本的效果一致。
+"""
+
+import json
+import os
+import re
+import sqlite3
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from 图片链接替换 import fix_image_field
+from 数据库备份 import backup_database
+from 撤销日志 import new_run_id, record_before_images, start_run
+from 数据目录清单 import list_range_databases
+from 颜色提取 import process_colors
+from 连接工厂 import connect
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+TABLE_NAME: str = "Content"
+START_FOLDER: int = 5211
+END_FOLDER: int = 5523
+
+RULES_FILE: str = "字段规则示例.json"  # 相对路径按脚本所在目录查找
+BACKUP_BEFORE: bool = False           # 修改前是否做压缩快照（撤销日志已可回滚）
+DRY_RUN: bool = True                  # 预览：只统计每列将被修改的行数
+# ====================================================
+
+# 命名转换：输入单元格的值（可能为 None），返回新值
+TRANSFORMS: Dict[str, Callable[[Optional[str]], Optional[str]]] = {
+    "fix_image": fix_image_field,
+    "color_part": lambda s: process_colors(s)[0],
+    "size_part": lambda s: process_colors(s)[1],
+    "strip": lambda s: s.strip() if s else s,
+    "upper": lambda s: s.upper() if s else s,
+    "lower": lambda s: s.lower() if s else s,
+}
+
+REQUIRED_KEYS = {
+    "copy": ("from", "to"),
+    "set": ("column", "value"),
+    "regex_replace": ("column", "pattern"),
+    "split_join": ("column",),
+    "transform": ("column", "name"),
+}
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sql_literal(value) -> str:
+    """常量直接内联为 SQL 字面量（表达式按步拼接到 UPDATE 中，不便使用位置参数）"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# ------------------------------------------------------------
+# 注册到 SQLite 的函数
+# ------------------------------------------------------------
+@lru_cache(maxsize=256)
+def _compile_pattern(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def _regexp_replace(value, pattern, replacement):
+    if value is None:
+        return None
+    return _compile_pattern(pattern).sub(replacement, str(value))
+
+
+def _split_join(value, sep, joiner, strip, dedupe):
+    if value is None:
+        return None
+    parts = str(value).split(sep)
+    if strip:
+        parts = [p.strip() for p in parts if p.strip()]
+    if dedupe:
+        parts = list(dict.fromkeys(parts))
+    return joiner.join(parts)
+
+
+def _field_transform(name, value):
+    return TRANSFORMS[name](value)
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    conn.create_function("regexp_replace", 3, _regexp_replace, deterministic=True)
+    conn.create_function("split_join", 5, _split_join, deterministic=True)
+    conn.create_function("field_transform", 2, _field_transform, deterministic=True)
+
+
+# ------------------------------------------------------------
+# 规则编译
+# ------------------------------------------------------------
+def load_rules(path: str) -> List[Dict]:
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rules = data["rules"] if isinstance(data, dict) else data
+    validate_rules(rules)
+    return rules
+
+
+def validate_rules(rules: List[Dict]) -> None:
+    for i, rule in enumerate(rules, 1):
+        op = rule.get("op")
+        if op not in REQUIRED_KEYS:
+            raise ValueError(f"第 {i} 条规则：不支持的操作 {op!r}")
+        missing = [key for key in REQUIRED_KEYS[op] if key not in rule]
+        if missing:
+            raise ValueError(f"第 {i} 条规则（{op}）缺少字段: {', '.join(missing)}")
+        if op == "regex_replace":
+            try:
+                re.compile(rule["pattern"])
+            except re.error as e:
+                raise ValueError(f"第 {i} 条规则：正则表达式无效: {e}")
+        if op == "transform" and rule["name"] not in TRANSFORMS:
+            raise ValueError(f"第 {i} 条规则：未知的转换 {rule['name']!r}，可用: {', '.join(TRANSFORMS)}")
+
+
+def compile_rules(rules: List[Dict]) -> Tuple[List[Dict[str, str]], Set[str]]:
+    """把规则按顺序编译成若干步 [{目标列: SQL 表达式}, ...]，并返回规则涉及的所有列
+
+    同一步内的表达式只引用上一步结束时的列值；规则要读取本步已改写的列时开始新的一步，
+    因此表达式不会随规则串联而嵌套膨胀，每条规则的表达式对每行只计算一次。
+    """
+    stages: List[Dict[str, str]] = [{}]
+    referenced: Set[str] = set()
+
+    def read(*columns: str) -> List[str]:
+        referenced.update(columns)
+        if any(column in stages[-1] for column in columns):
+            stages.append({})
+        return [quote_ident(column) for column in columns]
+
+    for rule in rules:
+        op = rule["op"]
+        if op == "copy":
+            target = rule["to"]
+            if rule.get("skip_empty", True):
+                source, old = read(rule["from"], target)
+                stages[-1][target] = f"COALESCE(NULLIF({source}, ''), {old})"
+            else:
+                stages[-1][target] = read(rule["from"])[0]
+        elif op == "set":
+            stages[-1][rule["column"]] = sql_literal(rule["value"])
+        elif op == "regex_replace":
+            source = read(rule.get("source", rule["column"]))[0]
+            stages[-1][rule["column"]] = (
+                f"regexp_replace({source}, {sql_literal(rule['pattern'])}, {sql_literal(rule.get('replace', ''))})"
+            )
+        elif op == "split_join":
+            source = read(rule.get("source", rule["column"]))[0]
+            sep = rule.get("sep", "|||")
+            stages[-1][rule["column"]] = (
+                f"split_join({source}, {sql_literal(sep)}, {sql_literal(rule.get('join', sep))}, "
+                f"{sql_literal(bool(rule.get('strip', True)))}, {sql_literal(bool(rule.get('dedupe', False)))})"
+            )
+        elif op == "transform":
+            source = read(rule.get("source", rule["column"]))[0]
+            stages[-1][rule["column"]] = f"field_transform({sql_literal(rule['name'])}, {source})"
+
+    # 只被读取、没有实际改写的列不参与 UPDATE
+    stages = [{col: expr for col, expr in stage.items() if expr != quote_ident(col)} for stage in stages]
+    stages = [stage for stage in stages if stage]
+    return stages, referenced | {col for stage in stages for col in stage}
+
+
+def rule_targets(stages: List[Dict[str, str]]) -> List[str]:
+    """各步改写的列（按首次出现的顺序）"""
+    return list(dict.fromkeys(col for stage in stages for col in stage))
+
+
+# ------------------------------------------------------------
+# 执行
+# ------------------------------------------------------------
+
+def apply_to_database(db_path: str, stages: List[Dict[str, str]], referenced: Set[str],
+                      run_id: Optional[str], dry_run: bool) -> Dict[str, int]:
+    """在单个数据库上执行编译好的规则，返回 {列名: 改动行数}
+
+    规则涉及的列先复制到内存临时表，各步依次在临时表上执行；
+    与原表比较后，只对有变化的行执行一条 UPDATE。
+    """
+    conn = connect(db_path, "read-only" if dry_run else "bulk-write")
+    try:
+        register_functions(conn)
+        columns = {col[1] for col in conn.execute(f"PRAGMA table_info({quote_ident(TABLE_NAME)})")}
+        if not columns:
+            raise ValueError(f"缺少 {TABLE_NAME} 表")
+
+        # 来源列缺失无法处理；目标列缺失则自动补建（与 规格统一.py 的做法一致）
+        targets = rule_targets(stages)
+        missing_sources = sorted(c for c in referenced - set(targets) if c not in columns)
+        if missing_sources:
+            raise ValueError(f"缺少来源字段: {', '.join(missing_sources)}")
+        for column in targets:
+            if column not in columns and not dry_run:
+                conn.execute(f"ALTER TABLE {quote_ident(TABLE_NAME)} ADD COLUMN {quote_ident(column)} TEXT DEFAULT ''")
+                columns.add(column)
+
+        if dry_run:
+            # read-only 以 mode=ro 打开主库，这里只放开对内存临时表的写入
+            conn.execute("PRAGMA query_only = 0")
+        involved = sorted(referenced)
+        # 预览时不建列：缺失的目标列按空字符串处理
+        initial = [quote_ident(c) if c in columns else "''" for c in involved]
+        conn.execute("DROP TABLE IF EXISTS temp._rule_rows")
+        conn.execute(f"CREATE TEMP TABLE _rule_rows (_rid INTEGER PRIMARY KEY, "
+                     f"{', '.join(quote_ident(c) for c in involved)})")
+        conn.execute(f"INSERT INTO temp._rule_rows SELECT rowid, {', '.join(initial)} FROM {quote_ident(TABLE_NAME)}")
+        for stage in stages:
+            assignments = ", ".join(f"{quote_ident(c)} = {expr}" for c, expr in stage.items())
+            conn.execute(f"UPDATE temp._rule_rows SET {assignments}")
+
+        changed = {
+            c: f"r.{quote_ident(c)} IS NOT " + (f"t.{quote_ident(c)}" if c in columns else "''") for c in targets
+        }
+        join_sql = f"FROM temp._rule_rows r JOIN {quote_ident(TABLE_NAME)} t ON t.rowid = r._rid"
+        counts_row = conn.execute(
+            f"SELECT {', '.join(f'COALESCE(SUM({cond}), 0)' for cond in changed.values())} {join_sql}"
+        ).fetchone()
+        counts = dict(zip(changed, counts_row))
+
+        if not dry_run and any(counts.values()):
+            conn.execute(f"DELETE FROM temp._rule_rows WHERE _rid NOT IN "
+                         f"(SELECT r._rid {join_sql} WHERE {' OR '.join(changed.values())})")
+            where_sql = "rowid IN (SELECT _rid FROM temp._rule_rows)"
+            start_run(conn, run_id, "字段规则")
+            record_before_images(conn, run_id, "update", where_sql, table=TABLE_NAME)
+            assignments = ", ".join(
+                f"{quote_ident(c)} = (SELECT r.{quote_ident(c)} FROM temp._rule_rows r "
+                f"WHERE r._rid = {quote_ident(TABLE_NAME)}.rowid)"
+                for c in targets
+            )
+            conn.execute(f"UPDATE {quote_ident(TABLE_NAME)} SET {assignments} WHERE {where_sql}")
+        conn.execute("DROP TABLE temp._rule_rows")
+        conn.commit()
+        return counts
+    finally:
+        conn.close()
+
+
+def main():
+    rules = load_rules(RULES_FILE)
+    stages, referenced = compile_rules(rules)
+    targets = rule_targets(stages)
+
+    print("=== 字段规则批处理 ===" + (" (预览模式)" if DRY_RUN else ""))
+    print(f"基础文件夹: {BASE_DIR}")
+    print(f"处理范围: {START_FOLDER} - {END_FOLDER}")
+    print(f"规则文件: {RULES_FILE}（{len(rules)} 条规则，分 {len(stages)} 步，改写 {len(targets)} 列: {', '.join(targets)}）")
+    print("=" * 60)
+    if not targets:
+        print("规则没有改写任何列，无需处理")
+        return
+
+    databases = list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER)
+    if not databases:
+        print("未找到符合条件的数据库文件夹！")
+        return
+
+    run_id = None
+    if not DRY_RUN:
+        # 本次运行编号：被修改的行记入撤销日志，可用 python 撤销日志.py --rollback <编号> 恢复
+        run_id = new_run_id("字段规则")
+        print(f"撤销日志运行编号：{run_id}")
+
+    totals = {col: 0 for col in targets}
+    failed = 0
+    for i, (folder_num, db_path) in enumerate(databases, 1):
+        try:
+            if BACKUP_BEFORE and not DRY_RUN:
+                result = backup_database(db_path)
+                if result["status"] == "failed":
+                    print(f"❌ [{i}/{len(databases)}] {folder_num} 备份失败，跳过：{result['error']}")
+                    failed += 1
+                    continue
+            counts = apply_to_database(db_path, stages, referenced, run_id, DRY_RUN)
+            for col, n in counts.items():
+                totals[col] += n
+            detail = "，".join(f"{col} {n}" for col, n in counts.items())
+            print(f"{'🔍' if DRY_RUN else '✅'} [{i}/{len(databases)}] {folder_num}: {detail}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ [{i}/{len(databases)}] 处理失败：{db_path}，原因：{e}")
+
+    print("=" * 60)
+    print(f"处理数据库: {len(databases)} 个，失败: {failed} 个")
+    for col, n in totals.items():
+        print(f"  {col}: {'将修改' if DRY_RUN else '已修改'} {n} 行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从模板任务批量克隆任务
+批量更新.py、sqlID批量添加脚本.py 只能改写 config.db3 中已经存在的 JobId，
+需要先在采集器里手工建好几百个占位任务。本脚本以一个现有任务为模板，
+按分类文件每行一个分类，分配一段连续的 JobId，在一个事务中插入全部 Job、JobDatabase、
+JobWebPost 记录；每个任务的 XML 已按分类改好 JobName、StartAddress、分类 ManualString。
+
+运行前请关闭采集器，避免采集器覆盖 config.db3。
+"""
+
+import os
+import sqlite3
+from functools import partial
+from typing import Dict, List, Optional
+
+from 任务库 import allocate_job_ids, clone_jobs
+from 任务模板 import JobXmlTemplate, render_full
+from 分类键 import CategoryFileIndex
+from 数据库备份 import backup_database
+
+# ================ 固定配置（按需修改）================
+DB_PATH: str = r"D:\火车采集器V10.28\Configuration\config.db3"
+TEMPLATE_JOB_ID: int = 5211        # 模板任务
+NEW_START_JOB_ID: Optional[int] = None  # 新任务起始 JobId；None 表示接在当前最大 JobId 之后
+CATEGORY_FILE: str = r"D:\project\otterbox\分类\分类.txt"   # 每行一个分类/任务名
+LINKS_DIR: str = r"D:\project\otterbox\链接"  # 目录内放置txt（当 START_ADDRESS_USE_CATEGORY=False 时使用）
+USE_FILE_PREFIX: bool = True      # 是否在路径前加 #FILE#（当 START_ADDRESS_USE_CATEGORY=False 时生效）
+START_ADDRESS_USE_CATEGORY: bool = False  # True: <StartAddress> 使用分类名；False: 使用 txt 绝对路径
+UPDATE_MANUAL_STRING: bool = True  # True: 将分类字段的ManualString更新为与JobName一致
+BACKUP_BEFORE_CLONE: bool = True   # 克隆前备份 config.db3
+DRY_RUN: bool = False              # 预览/不落库
+# ====================================================
+
+
+def load_categories(path: str) -> List[str]:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"分类文件不存在: {path}")
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        cats = [line.strip() for line in f if line.strip()]
+    if not cats:
+        raise ValueError("分类文件为空")
+    return cats
+
+
+def main():
+    print("=== 从模板批量克隆任务 ===" + (" (预览模式)" if DRY_RUN else ""))
+    print(f"数据库路径: {DB_PATH}")
+    print(f"模板任务: JobId={TEMPLATE_JOB_ID}")
+    print(f"分类文件: {CATEGORY_FILE}")
+    print("=" * 60)
+
+    if not os.path.exists(DB_PATH):
+        print(f"数据库不存在: {DB_PATH}")
+        return
+
+    categories = load_categories(CATEGORY_FILE)
+    category_to_txt: Dict[str, str] = {}
+    if not START_ADDRESS_USE_CATEGORY:
+        category_to_txt, missing = CategoryFileIndex.for_directory(LINKS_DIR).match(categories)
+        for cat, expected in missing:
+            print(f"⚠️ 分类 '{cat}' 没有对应的txt文件，跳过（期望文件名: {expected}.txt）")
+        categories = [cat for cat in categories if cat in category_to_txt]
+    if not categories:
+        print("没有可克隆的分类！")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT XmlData FROM Job WHERE JobId = ?", (TEMPLATE_JOB_ID,)).fetchone()
+        if row is None:
+            print(f"模板任务 JobId={TEMPLATE_JOB_ID} 不存在")
+            return
+        template_xml = row[0] or "<root></root>"
+
+        xml_template = JobXmlTemplate(
+            partial(
+                render_full,
+                use_file_prefix=USE_FILE_PREFIX,
+                use_category_for_start=START_ADDRESS_USE_CATEGORY,
+                update_manual_string=UPDATE_MANUAL_STRING,
+            ),
+            manual_string=UPDATE_MANUAL_STRING,
+        )
+        jobs = [
+            (cat, xml_template.render(template_xml, cat, category_to_txt.get(cat, '')))
+            for cat in categories
+        ]
+
+        try:
+            first_id = allocate_job_ids(conn, len(jobs), NEW_START_JOB_ID)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        print(f"将克隆 {len(jobs)} 个任务: JobId {first_id} - {first_id + len(jobs) - 1}")
+        if DRY_RUN:
+            for offset, (cat, _) in enumerate(jobs[:10]):
+                target = cat if START_ADDRESS_USE_CATEGORY else category_to_txt[cat]
+                print(f"[DRY-RUN] JobId={first_id + offset}  JobName='{cat}'  StartAddress= {target}")
+            if len(jobs) > 10:
+                print(f"[DRY-RUN] ... 其余 {len(jobs) - 10} 个")
+            return
+
+        if BACKUP_BEFORE_CLONE:
+            result = backup_database(DB_PATH)
+            if result["status"] == "created":
+                print(f"🛡 已备份数据库到: {result['path']}")
+            elif result["status"] == "unchanged":
+                print(f"⚠️ 内容未变化，沿用已有备份: {result['path']}")
+            else:
+                print(f"❌ 备份失败，已取消克隆: {result['error']}")
+                return
+        new_ids = clone_jobs(conn, TEMPLATE_JOB_ID, jobs, first_id)
+    finally:
+        conn.close()
+
+    print(f"✅ 已克隆 {len(new_ids)} 个任务: JobId {new_ids[0]} - {new_ids[-1]}（{xml_template.stats()}）")
+    print(f"可将 批量更新.py 等脚本的 START_JOB_ID/END_JOB_ID 设为 {new_ids[0]} / {new_ids[-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,11 @@
 直接在代码中修改配置参数，无需命令行
 """
 
-import sqlite3
 import os
 from pathlib import Path
+from 连接工厂 import connect
+from 数据目录清单 import list_range_databases
+from 分类更新计划 import CategoryUpdatePlanner
 
 # ==================== 配置区域 ====================
 # 在这里修改您的配置
@@ -37,6 +39,7 @@ class SimpleCategoryUpdater:
         self.db_filename = DB_FILENAME
         self.start_folder = START_FOLDER
         self.end_folder = END_FOLDER
+        self.planner = CategoryUpdatePlanner()  # 按表结构缓存分类列更新计划
         self.preview_only = PREVIEW_ONLY
         
     def read_categories(self):
@@ -94,20 +97,10 @@ class SimpleCategoryUpdater:
     
     def find_database_folders(self):
         """查找包含SpiderResult.db3的文件夹"""
-        db_folders = []
-        
         try:
-            # 遍历基础文件夹下的所有子文件夹
-            for folder in self.base_folder.iterdir():
-                if folder.is_dir():
-                    db_file = folder / self.db_filename
-                    if db_file.exists():
-                        # 检查是否在指定范围内
-                        if self.is_folder_in_range(folder.name):
-                            db_folders.append(folder)
-            
-            # 按数字顺序排序
-            db_folders.sort(key=lambda x: self.get_folder_number(x.name) or 0)
+            # 范围查找走数据目录清单（已按编号排序），不再遍历整个 Data 目录
+            db_folders = [Path(db_path).parent for _, db_path in
+                          list_range_databases(str(self.base_folder), self.start_folder, self.end_folder)]
             
             range_info = ""
             if self.start_folder is not None or self.end_folder is not None:
@@ -131,43 +124,10 @@ class SimpleCategoryUpdater:
         
         try:
             # 连接数据库
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
-            
-            # 获取所有表
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
+            conn = connect(db_path, "bulk-write")
             
-            total_updated = 0
-            
-            # 处理每个表
-            for table_name in tables:
-                # 获取表的列信息
-                cursor.execute(f"PRAGMA table_info({table_name})")
-                columns = cursor.fetchall()
-                
-                # 查找分类相关列
-                category_columns = []
-                for col in columns:
-                    col_name = col[1].lower()
-                    if any(keyword in col_name for keyword in ['category', '分类', 'cat', 'type', '类型', 'tag', '标签']):
-                        category_columns.append(col[1])
-                
-                # 更新分类
-                for column in category_columns:
-                    try:
-                        # 更新空值或NULL值的分类字段
-                        update_sql = f"""
-                        UPDATE {table_name} 
-                        SET {column} = ? 
-                        WHERE {column} IS NULL OR {column} = '' OR {column} = 'NULL'
-                        """
-                        cursor.execute(update_sql, (category,))
-                        updated_rows = cursor.rowcount
-                        total_updated += updated_rows
-                        
-                    except Exception as e:
-                        print(f"    更新列 {column} 时出错: {e}")
+            # 分类相关列按表结构缓存，每张表一条 UPDATE 填充所有空分类列
+            total_updated = self.planner.apply(conn, category)
             
             # 提交更改
             conn.commit()
@@ -259,6 +219,7 @@ class SimpleCategoryUpdater:
             print("批量更新完成！")
             print(f"成功处理: {success_count}/{process_count} 个数据库")
             print(f"总共更新: {total_updated_all} 条记录")
+            print(f"分类列解析: {self.planner.stats()}")
         
         if success_count < process_count:
             print(f"失败: {process_count - success_count} 个数据库")
@@ -13,6 +13,11 @@ import logging
 import sys
 from datetime import datetime
 import traceback
+from functools import partial
+
+from 任务库 import fetch_jobs_in_range, write_jobs
+from 任务模板 import JobXmlTemplate
+from 分类键 import CategoryFileIndex, filename_base
 
 # 尝试导入tqdm，如果不存在则使用简单的进度显示
 try:
@@ -60,6 +65,8 @@ USE_FILE_PREFIX: bool = True      # 是否在路径前加 #FILE#（当 START_ADD
 START_ADDRESS_USE_CATEGORY: bool = False  # True: <StartAddress> 使用分类名；False: 使用 txt 绝对路径
 UPDATE_MANUAL_STRING: bool = True  # True: 将ManualString更新为与JobName一致；False: 不更新ManualString
 DRY_RUN: bool = False              # 预览/不落库
+USE_XML_TEMPLATE: bool = True      # True: 同一模板的任务只完整解析一次XML，其余按插槽渲染
+BULK_MODE: bool = True             # True: 一次读取范围内任务，全部在一个事务中写回；False: 逐个查询、逐个提交
 
 # 日志开关
 ENABLE_LOGGING: bool = True  # True=启用日志，False=禁用日志
@@ -282,37 +289,15 @@ def list_txt_files(dir_path: str) -> List[str]:
         raise FileOperationError(f"列出txt文件失败: {e}")
 
 def _cat_to_filename_base(cat: str) -> str:
-    """将分类名转换为期望的文件名（不含扩展名）的基名。
-    规则：将 '|||' 替换为 '_'。
-    """
-    return cat.replace('|||', '_')
+    """将分类名转换为期望的文件名（不含扩展名）的基名，规则见 分类键.filename_base"""
+    return filename_base(cat)
 
 def _build_category_to_txt_map(categories: List[str], dir_path: str) -> Tuple[dict, List[Tuple[str, str]]]:
     """将分类名与同名（或按规则转换后的同名）的 txt 文件一一匹配。
     返回: (匹配映射字典, 未匹配的分类列表)
     """
     try:
-        if not os.path.isdir(dir_path):
-            raise NotADirectoryError(f"目录不存在: {dir_path}")
-
-        # 以文件名为键，值为绝对路径
-        file_name_to_path = {}
-        for name in os.listdir(dir_path):
-            if not name.lower().endswith('.txt'):
-                continue
-            base = os.path.splitext(name)[0]
-            file_name_to_path[base] = os.path.abspath(os.path.join(dir_path, name))
-
-        mapping = {}
-        missing = []
-        for cat in categories:
-            transformed = _cat_to_filename_base(cat)
-            if cat in file_name_to_path:
-                mapping[cat] = file_name_to_path[cat]
-            elif transformed in file_name_to_path:
-                mapping[cat] = file_name_to_path[transformed]
-            else:
-                missing.append((cat, transformed))
+        mapping, missing = CategoryFileIndex.for_directory(dir_path).match(categories)
 
         if missing:
             hint = "\n".join([f" _分类: {m[0]}  期望文件名: {m[1]}.txt" for m in missing])
@@ -414,21 +399,8 @@ def list_unmatched_categories(categories: List[str], dir_path: str) -> List[Tupl
     返回: [(分类名, 期望文件名), ...]
     """
     try:
-        if not os.path.isdir(dir_path):
-            raise NotADirectoryError(f"目录不存在: {dir_path}")
-
-        # 获取所有txt文件名（不含扩展名）
-        txt_files = set()
-        for name in os.listdir(dir_path):
-            if name.lower().endswith('.txt'):
-                base = os.path.splitext(name)[0]
-                txt_files.add(base)
-
-        unmatched = []
-        for cat in categories:
-            transformed = _cat_to_filename_base(cat)
-            if cat not in txt_files and transformed not in txt_files:
-                unmatched.append((cat, transformed))
+        index = CategoryFileIndex.for_directory(dir_path)
+        unmatched = [(cat, _cat_to_filename_base(cat)) for cat in categories if index.lookup(cat) is None]
 
         return unmatched
     except Exception as e:
@@ -440,21 +412,11 @@ def list_unmatched_categories_with_progress(categories: List[str], dir_path: str
     返回: [(分类名, 期望文件名), ...]
     """
     try:
-        if not os.path.isdir(dir_path):
-            raise NotADirectoryError(f"目录不存在: {dir_path}")
-
-        # 获取所有txt文件名（不含扩展名）
-        txt_files = set()
-        for name in os.listdir(dir_path):
-            if name.lower().endswith('.txt'):
-                base = os.path.splitext(name)[0]
-                txt_files.add(base)
-
+        index = CategoryFileIndex.for_directory(dir_path)
         unmatched = []
         for cat in categories:
-            transformed = _cat_to_filename_base(cat)
-            if cat not in txt_files and transformed not in txt_files:
-                unmatched.append((cat, transformed))
+            if index.lookup(cat) is None:
+                unmatched.append((cat, _cat_to_filename_base(cat)))
             if pbar:
                 pbar.update(1)
 
@@ -595,6 +557,17 @@ def main():
         failed = 0
         skipped = 0
         failed_categories = []  # 记录失败的分类
+        pending_updates = []    # 批量模式下待写回的 (JobId, JobName, XmlData)
+        pending_info = {}       # JobId -> (分类, StartAddress 显示文本)
+        jobs = fetch_jobs_in_range(conn, START_JOB_ID, START_JOB_ID + job_count - 1) if BULK_MODE else None
+        full_render = partial(
+            update_xml_fields,
+            use_file_prefix=USE_FILE_PREFIX,
+            use_category_for_start=START_ADDRESS_USE_CATEGORY,
+            update_manual_string=UPDATE_MANUAL_STRING,
+        )
+        xml_template = JobXmlTemplate(full_render, manual_string=UPDATE_MANUAL_STRING)
+        render_xml = xml_template.render if USE_XML_TEMPLATE else full_render
         
         # 将未匹配的分类也记录为失败分类
         if unmatched_categories:
@@ -629,21 +602,14 @@ def main():
                     txt_abs = category_to_txt[category]
                     start_addr_display = (("#FILE#" if USE_FILE_PREFIX else '') + txt_abs)
 
-                row = fetch_job_by_id(conn, job_id)
+                row = jobs.get(job_id) if BULK_MODE else fetch_job_by_id(conn, job_id)
                 if row is None:
                     logger.warning(f"JobId={job_id} 不存在，跳过")
                     skipped += 1
                     continue
 
                 try:
-                    new_xml = update_xml_fields(
-                        row['XmlData'] or "<root></root>",
-                        category,
-                        txt_abs,
-                        use_file_prefix=USE_FILE_PREFIX,
-                        use_category_for_start=START_ADDRESS_USE_CATEGORY,
-                        update_manual_string=UPDATE_MANUAL_STRING,
-                    )
+                    new_xml = render_xml(row['XmlData'] or "<root></root>", category, txt_abs)
                 except Exception as e:
                     logger.error(f"JobId={job_id} 更新XML失败：{e}")
                     failed += 1
@@ -659,6 +625,13 @@ def main():
                     processed += 1
                     continue
 
+                if BULK_MODE:
+                    pending_updates.append((job_id, category, new_xml))
+                    pending_info[job_id] = (category, start_addr_display)
+                    if pbar:
+                        pbar.update(1)
+                    continue
+
                 if update_job_record(conn, job_id, category, new_xml):
                     processed += 1
                     manual_info = f"，ManualString='{category}'" if UPDATE_MANUAL_STRING else ""
@@ -683,7 +656,22 @@ def main():
         # 关闭进度条
         if pbar:
             pbar.close()
-        
+
+        if pending_updates:
+            logger.info(f"在一个事务中写回 {len(pending_updates)} 个任务...")
+            done, write_failed = write_jobs(conn, pending_updates)
+            for job_id in done:
+                category, start_addr_display = pending_info[job_id]
+                manual_info = f"，ManualString='{category}'" if UPDATE_MANUAL_STRING else ""
+                logger.info(f"已更新 JobId={job_id}，JobName='{category}'，StartAddress= {start_addr_display}{manual_info}")
+            for job_id, reason in write_failed:
+                logger.error(f"更新JobId={job_id}失败: {reason}，已单独回滚")
+                failed_categories.append(pending_info[job_id][0])
+            processed += len(done)
+            failed += len(write_failed)
+        
+        if USE_XML_TEMPLATE:
+            logger.info(f"XML模板: {xml_template.stats()}")
         logger.info(f"\n完成：共处理 {processed} 条，失败 {failed} 条，跳过 {skipped} 条（目标 {job_count} 条）")
         
         # 调试信息
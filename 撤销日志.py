@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行级撤销日志
+替代整表复制的 Content_backup：各维护步骤（去重、折扣价、SKU、颜色、图片链接修复）
+只记录本次删除或修改的行的修改前内容，并打上运行编号（run_id），写入量与改动行数成正比。
+可按运行编号回滚：被删除的行重新插入，被修改的行恢复原值。
+
+用法：
+  python 撤销日志.py --list                 列出范围内各数据库记录的运行
+  python 撤销日志.py --rollback <run_id>    回滚指定运行
+  python 撤销日志.py --purge <天数>         删除早于指定天数的日志
+"""
+
+import sqlite3
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from 连接工厂 import connect
+from 变更跟踪 import log_position, relabel_inserts
+from 数据目录清单 import list_range_databases as list_range_entries
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+START_FOLDER: int = 5211
+END_FOLDER: int = 5523
+# ====================================================
+
+JOURNAL_TABLE = "_undo_journal"
+RUNS_TABLE = "_undo_runs"
+
+
+def new_run_id(step: str) -> str:
+    """生成运行编号：时间 + 步骤名 + 随机后缀，同一次运行在所有数据库中共用"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{step}_{uuid.uuid4().hex[:6]}"
+
+
+def ensure_journal(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RUNS_TABLE} (
+            run_id TEXT PRIMARY KEY,
+            step TEXT,
+            started_at TEXT,
+            status TEXT DEFAULT 'done'
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            row_json TEXT NOT NULL
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx{JOURNAL_TABLE}_run ON {JOURNAL_TABLE} (run_id, table_name, row_id)")
+
+
+def start_run(conn: sqlite3.Connection, run_id: str, step: str) -> None:
+    """在当前数据库中登记一次运行（同一 run_id 重复登记无副作用）"""
+    ensure_journal(conn)
+    conn.execute(
+        f"INSERT OR IGNORE INTO {RUNS_TABLE} (run_id, step, started_at) VALUES (?, ?, ?)",
+        (run_id, step, datetime.now().isoformat(timespec="seconds")),
+    )
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str, int]]:
+    """返回 [(列名, 声明类型, 是否主键), ...]"""
+    return [(col[1], (col[2] or "").upper(), col[5]) for col in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def _rowid_alias(columns: List[Tuple[str, str, int]]) -> Optional[str]:
+    """若表有 INTEGER PRIMARY KEY（rowid 别名）则返回其列名"""
+    pk_columns = [c for c in columns if c[2]]
+    if len(pk_columns) == 1 and pk_columns[0][1] == "INTEGER":
+        return pk_columns[0][0]
+    return None
+
+
+def _json_object_expr(columns: List[Tuple[str, str, int]]) -> str:
+    return "json_object(" + ", ".join(f"'{name}', \"{name}\"" for name, _, _ in columns) + ")"
+
+
+def record_before_images(conn: sqlite3.Connection, run_id: str, op: str, where_sql: str,
+                         params: Sequence = (), table: str = "Content") -> int:
+    """在执行 UPDATE/DELETE 之前调用：把 where_sql 命中的行的当前内容写入日志
+
+    op 为 'update' 或 'delete'；同一运行中同一行只保留第一次的修改前内容。
+    返回记录的行数。
+    """
+    columns = _table_columns(conn, table)
+    cur = conn.execute(
+        f"""
+        INSERT INTO {JOURNAL_TABLE} (run_id, table_name, op, row_id, row_json)
+        SELECT ?, ?, ?, rowid, {_json_object_expr(columns)}
+        FROM "{table}"
+        WHERE ({where_sql})
+          AND rowid NOT IN (SELECT row_id FROM {JOURNAL_TABLE} WHERE run_id = ? AND table_name = ?)
+        """,
+        (run_id, table, op, *params, run_id, table),
+    )
+    return cur.rowcount
+
+
+def record_rowids(conn: sqlite3.Connection, run_id: str, op: str, rowids: Iterable[int], table: str = "Content") -> int:
+    """按 rowid 列表记录修改前内容，用于在 Python 中逐行计算新值的步骤"""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _undo_rowids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp._undo_rowids")
+    conn.executemany("INSERT OR IGNORE INTO temp._undo_rowids (id) VALUES (?)", ((rid,) for rid in rowids))
+    return record_before_images(conn, run_id, op, "rowid IN (SELECT id FROM temp._undo_rowids)", table=table)
+
+
+def rollback_run(conn: sqlite3.Connection, run_id: str) -> Tuple[int, int]:
+    """回滚当前数据库中的一次运行，返回 (重新插入的行数, 恢复原值的行数)"""
+    ensure_journal(conn)
+    status = conn.execute(f"SELECT status FROM {RUNS_TABLE} WHERE run_id = ?", (run_id,)).fetchone()
+    if status is None:
+        return 0, 0
+    if status[0] == "rolled_back":
+        raise ValueError(f"运行 {run_id} 已回滚过")
+
+    inserted = restored = 0
+    tables = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT table_name FROM {JOURNAL_TABLE} WHERE run_id = ?", (run_id,))]
+    for table in tables:
+        columns = _table_columns(conn, table)
+        alias = _rowid_alias(columns)
+        names = [name for name, _, _ in columns]
+
+        # 把本次运行的日志放进带主键的临时表，后续按 row_id 关联时走索引
+        conn.execute("DROP TABLE IF EXISTS temp._undo_entries")
+        conn.execute("CREATE TEMP TABLE _undo_entries (row_id INTEGER PRIMARY KEY, row_json TEXT)")
+        conn.execute(
+            f"INSERT OR IGNORE INTO temp._undo_entries SELECT row_id, row_json FROM {JOURNAL_TABLE} "
+            "WHERE run_id = ? AND table_name = ? ORDER BY seq",
+            (run_id, table),
+        )
+
+        # 1) 仍存在的行（被修改）：恢复日志中的列值，日志里没有的列（之后新增的列）保持不变
+        assignments = ", ".join(
+            f""""{name}" = (SELECT CASE WHEN json_type(j.row_json, '$."{name}"') IS NULL THEN "{table}"."{name}"
+                                        ELSE json_extract(j.row_json, '$."{name}"') END
+                            FROM temp._undo_entries AS j WHERE j.row_id = "{table}".rowid)"""
+            for name in names if name != alias
+        )
+        cur = conn.execute(f"""
+            UPDATE "{table}" SET {assignments}
+            WHERE rowid IN (SELECT row_id FROM temp._undo_entries)
+        """)
+        restored += cur.rowcount
+
+        # 2) 已不存在的行（被删除）：按原 rowid 重新插入
+        log_seq = log_position(conn)
+        insert_names = names if alias else ["rowid"] + names
+        insert_values = [
+            "j.row_id" if name in ("rowid", alias) else f"json_extract(j.row_json, '$.\"{name}\"')"
+            for name in insert_names
+        ]
+        cur = conn.execute(f"""
+            INSERT INTO "{table}" ({", ".join(f'"{n}"' for n in insert_names)})
+            SELECT {", ".join(insert_values)}
+            FROM temp._undo_entries AS j
+            WHERE j.row_id NOT IN (SELECT rowid FROM "{table}")
+        """)
+        inserted += cur.rowcount
+        if log_seq is not None:
+            relabel_inserts(conn, log_seq)
+        conn.execute("DROP TABLE temp._undo_entries")
+
+    conn.execute(f"UPDATE {RUNS_TABLE} SET status = 'rolled_back' WHERE run_id = ?", (run_id,))
+    return inserted, restored
+
+
+def list_runs(conn: sqlite3.Connection) -> List[Tuple[str, str, str, str, int]]:
+    """返回 [(run_id, 步骤, 开始时间, 状态, 记录行数), ...]"""
+    ensure_journal(conn)
+    return conn.execute(f"""
+        SELECT r.run_id, r.step, r.started_at, r.status,
+               (SELECT COUNT(*) FROM {JOURNAL_TABLE} j WHERE j.run_id = r.run_id)
+        FROM {RUNS_TABLE} r ORDER BY r.started_at
+    """).fetchall()
+
+
+def purge_runs(conn: sqlite3.Connection, older_than_days: int) -> int:
+    """删除早于指定天数的运行及其日志，返回删除的日志行数"""
+    ensure_journal(conn)
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat(timespec="seconds")
+    old_runs = f"SELECT run_id FROM {RUNS_TABLE} WHERE started_at < ?"
+    cur = conn.execute(f"DELETE FROM {JOURNAL_TABLE} WHERE run_id IN ({old_runs})", (cutoff,))
+    deleted = cur.rowcount
+    conn.execute(f"DELETE FROM {RUNS_TABLE} WHERE started_at < ?", (cutoff,))
+    return deleted
+
+
+def list_range_databases(base_dir: str, start_num: int, end_num: int) -> List[str]:
+    """返回范围内的数据库路径，按文件夹编号升序（由数据目录清单提供）"""
+    return [path for _, path in list_range_entries(base_dir, start_num, end_num)]
+
+
+def _has_journal(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (RUNS_TABLE,)
+    ).fetchone() is not None
+
+
+def show_runs() -> None:
+    summary: Dict[str, List] = {}
+    for db_path in list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER):
+        conn = connect(db_path, "read-only")
+        if _has_journal(conn):
+            for run_id, step, started_at, status, rows in list_runs(conn):
+                entry = summary.setdefault(run_id, [step, started_at, status, 0, 0])
+                entry[3] += 1
+                entry[4] += rows
+        conn.close()
+
+    if not summary:
+        print("范围内没有撤销日志")
+        return
+    print(f"{'运行编号':<40} {'步骤':<8} {'开始时间':<20} {'状态':<12} {'数据库':>6} {'行数':>8}")
+    for run_id, (step, started_at, status, dbs, rows) in sorted(summary.items(), key=lambda x: x[1][1]):
+        print(f"{run_id:<40} {step:<8} {started_at:<20} {status:<12} {dbs:>6} {rows:>8}")
+
+
+def rollback_range(run_id: str) -> None:
+    total_inserted = total_restored = touched = 0
+    for db_path in list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER):
+        conn = connect(db_path, "bulk-write")
+        try:
+            if not _has_journal(conn):
+                continue
+            inserted, restored = rollback_run(conn, run_id)
+            conn.commit()
+            if inserted or restored:
+                touched += 1
+                print(f"↩ {db_path}: 重新插入 {inserted} 行，恢复 {restored} 行")
+            total_inserted += inserted
+            total_restored += restored
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ 回滚失败：{db_path}，原因：{e}")
+        finally:
+            conn.close()
+    print("=" * 60)
+    print(f"回滚完成：{touched} 个数据库，重新插入 {total_inserted} 行，恢复 {total_restored} 行")
+
+
+def purge_range(days: int) -> None:
+    total = 0
+    for db_path in list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER):
+        conn = connect(db_path, "bulk-write")
+        if _has_journal(conn):
+            total += purge_runs(conn, days)
+            conn.commit()
+        conn.close()
+    print(f"已删除 {total} 行早于 {days} 天的撤销日志")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--list":
+        show_runs()
+    elif len(sys.argv) == 3 and sys.argv[1] == "--rollback":
+        rollback_range(sys.argv[2])
+    elif len(sys.argv) == 3 and sys.argv[1] == "--purge":
+        purge_range(int(sys.argv[2]))
+    else:
+        print(__doc__)
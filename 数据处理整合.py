@@ -7,8 +7,6 @@
 """
 
 import os
-import sqlite3
-import shutil
 import random
 import string
 from pathlib import Path
@@ -16,6 +14,13 @@ from typing import List, Tuple, Set
 import logging
 from datetime import datetime
 
+from 数据库备份 import backup_database
+from 撤销日志 import new_run_id, record_before_images, start_run
+from 价格引擎 import PricingEngine
+from 连接工厂 import connect
+from 数据目录清单 import list_range_databases
+from 分类更新计划 import CategoryUpdatePlanner
+
 # 尝试导入tqdm，如果不存在则使用简单的进度显示
 try:
     from tqdm import tqdm
@@ -105,6 +110,8 @@ class DataProcessor:
         self.sku_column = SKU_COLUMN
         self.preview_only = PREVIEW_ONLY
         self.used_skus = set()  # 用于存储已使用的SKU，确保不重复
+        self.run_ids = {}  # 步骤名 -> 撤销日志运行编号
+        self.category_planner = CategoryUpdatePlanner()  # 按表结构缓存分类列更新计划
         
         # 日志和进度条配置
         self.enable_logging = ENABLE_LOGGING
@@ -138,27 +145,25 @@ class DataProcessor:
         self.logger = logging.getLogger(__name__)
         
     def backup_database(self, db_path: Path) -> bool:
-        """在相同目录下的 backup 文件夹中备份数据库。
+        """在相同目录下的 backup 文件夹中备份数据库（一致性快照 + 压缩，内容未变时跳过）。
         成功返回 True，失败返回 False。
         """
-        try:
-            if not db_path.exists():
-                self.logger.error(f"数据库不存在，无法备份: {db_path}")
-                return False
-
-            backup_dir = db_path.parent / "backup"
-            backup_dir.mkdir(parents=True, exist_ok=True)
-
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_name = f"{db_path.stem}_{timestamp}.bak"
-            backup_path = backup_dir / backup_name
-
-            shutil.copy2(str(db_path), str(backup_path))
-            self.logger.info(f"✅ 已备份数据库到: {backup_path}")
-            return True
-        except Exception as e:
-            self.logger.error(f"备份数据库失败: {e}")
+        result = backup_database(str(db_path))
+        if result["status"] == "created":
+            self.logger.info(f"✅ 已备份数据库到: {result['path']}")
+        elif result["status"] == "unchanged":
+            self.logger.info(f"⏭ 数据库内容未变化，沿用已有备份: {result['path']}")
+        else:
+            self.logger.error(f"备份数据库失败: {result['error']}")
             return False
+        return True
+
+    def get_run_id(self, step_name: str) -> str:
+        """获取步骤的撤销日志运行编号（同一步骤在所有数据库中共用一个编号）"""
+        if step_name not in self.run_ids:
+            self.run_ids[step_name] = new_run_id(step_name)
+            self.logger.info(f"撤销日志运行编号 [{step_name}]: {self.run_ids[step_name]}")
+        return self.run_ids[step_name]
 
     def is_numeric_folder(self, folder_name: str) -> bool:
         """判断文件夹名是否为纯数字"""
@@ -180,15 +185,10 @@ class DataProcessor:
     
     def find_database_folders(self) -> List[Path]:
         """查找包含SpiderResult.db3的文件夹"""
-        db_folders = []
         try:
-            for folder in self.base_folder.iterdir():
-                if folder.is_dir():
-                    db_file = folder / self.db_filename
-                    if db_file.exists() and self.is_folder_in_range(folder.name):
-                        db_folders.append(folder)
-            db_folders.sort(key=lambda x: self.get_folder_number(x.name))
-            return db_folders
+            # 范围查找走数据目录清单，不再遍历整个 Data 目录
+            return [Path(db_path).parent for _, db_path in
+                    list_range_databases(str(self.base_folder), self.start_folder, self.end_folder)]
         except Exception as e:
             self.logger.error(f"查找数据库文件夹时出错: {e}")
             return []
@@ -223,7 +223,7 @@ class DataProcessor:
                     continue
             
             try:
-                conn = sqlite3.connect(str(db_path))
+                conn = connect(db_path, "bulk-write")
                 cursor = conn.cursor()
                 
                 if self.preview_only:
@@ -250,28 +250,21 @@ class DataProcessor:
                     self.logger.info(f"  [预览] 总记录: {total_count}, 重复组: {duplicate_groups}, 空图片: {empty_img_count}")
                     
                 else:
-                    # 备份 Content 表
-                    cursor.execute("DROP TABLE IF EXISTS Content_backup")
-                    cursor.execute("CREATE TABLE Content_backup AS SELECT * FROM Content")
-                    self.logger.info("✅ 已创建 Content_backup 表")
+                    # 只把将要删除的行记入撤销日志（代替整表复制的 Content_backup）
+                    run_id = self.get_run_id("去重")
+                    start_run(conn, run_id, "去重")
+                    dup_where = "ID NOT IN (SELECT MIN(ID) FROM Content GROUP BY SKU)"
+                    empty_img_where = "图片 IS NULL OR TRIM(图片) = ''"
                     
                     # 删除重复 SKU，仅保留 ID 最小的那条
-                    cursor.execute("""
-                        DELETE FROM Content 
-                        WHERE ID NOT IN ( 
-                            SELECT MIN(ID) 
-                            FROM Content 
-                            GROUP BY SKU 
-                        ) 
-                    """)
+                    record_before_images(conn, run_id, "delete", dup_where)
+                    cursor.execute(f"DELETE FROM Content WHERE {dup_where}")
                     dup_deleted = cursor.rowcount
                     self.logger.info(f"✅ 去重完成，删除 {dup_deleted} 条重复数据")
                     
                     # 删除图片字段为空或NULL的行
-                    cursor.execute("""
-                        DELETE FROM Content 
-                        WHERE 图片 IS NULL OR TRIM(图片) = '' 
-                    """)
+                    record_before_images(conn, run_id, "delete", empty_img_where)
+                    cursor.execute(f"DELETE FROM Content WHERE {empty_img_where}")
                     img_deleted = cursor.rowcount
                     self.logger.info(f"✅ 已删除 {img_deleted} 条图片为空的数据")
                     
@@ -306,6 +299,8 @@ class DataProcessor:
         
         success_count = 0
         total_updated = 0
+        # 不换算汇率、不做尾数定价，与原来的 销售价 × 折扣率 保持一致
+        engine = PricingEngine(rate=1.0, default_discount=self.discount_rate, tiers=[], charm_ending=None)
         
         # 创建进度条
         if self.enable_progress_bar:
@@ -321,28 +316,21 @@ class DataProcessor:
             self.logger.info(f"\n[{i+1}/{len(db_folders)}] 处理：{folder.name}/SpiderResult.db3")
             
             try:
-                conn = sqlite3.connect(str(db_path))
+                conn = connect(db_path, "bulk-write")
                 cursor = conn.cursor()
                 
                 # 检查是否有 Content 表和 销售价/折扣价字段
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Content'")
                 if cursor.fetchone():
                     if self.preview_only:
-                        # 预览模式：统计需要更新的记录
-                        cursor.execute("""
-                            SELECT COUNT(*) FROM Content
-                            WHERE 销售价 GLOB '[0-9]*'
-                        """)
+                        # 预览模式：统计需要更新的记录（能解析出价格的行）
+                        engine.register(conn)
+                        cursor.execute("SELECT COUNT(*) FROM Content WHERE parse_price(销售价) IS NOT NULL")
                         count = cursor.fetchone()[0]
                         self.logger.info(f"  [预览] 将要更新 {count} 条记录的折扣价")
                     else:
-                        # 将折扣价更新为销售价 × 折扣率
-                        cursor.execute(f"""
-                            UPDATE Content
-                            SET 折扣价 = printf('%.2f', CAST(销售价 AS REAL) * {self.discount_rate})
-                            WHERE 销售价 GLOB '[0-9]*'
-                        """)
-                        updated_count = cursor.rowcount
+                        # 将折扣价更新为销售价 × 折扣率（"$1,299.00" 等格式也能解析）
+                        updated_count = engine.apply(conn, self.get_run_id("折扣价"))
                         conn.commit()
                         self.logger.info(f"✅ 已更新折扣价：{updated_count} 条记录")
                         total_updated += updated_count
@@ -404,7 +392,7 @@ class DataProcessor:
             self.logger.info(f"\n[{i+1}/{len(db_folders)}] 处理：{folder.name}/SpiderResult.db3")
             
             try:
-                conn = sqlite3.connect(str(db_path))
+                conn = connect(db_path, "bulk-write")
                 cursor = conn.cursor()
                 
                 # 检查Content表是否存在SKU列
@@ -440,6 +428,9 @@ class DataProcessor:
                     record_ids = [row[0] for row in cursor.fetchall()]
                     
                     updated_count = 0
+                    run_id = self.get_run_id("随机SKU")
+                    start_run(conn, run_id, "随机SKU")
+                    record_before_images(conn, run_id, "update", "1")
                     
                     # 为每条记录生成SKU
                     for record_id in record_ids:
@@ -543,47 +534,13 @@ class DataProcessor:
             self.logger.info(f"  分类信息 (第{line_num}行): {category}")
             
             try:
-                conn = sqlite3.connect(str(db_path))
-                cursor = conn.cursor()
-                
-                # 获取所有表
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                tables = [row[0] for row in cursor.fetchall()]
+                conn = connect(db_path, "read-only" if self.preview_only else "bulk-write")
                 
                 if self.preview_only:
-                    self.logger.info(f"  [预览] 将要更新此数据库的分类信息")
+                    self.logger.info(f"  [预览] 将要更新此数据库的分类列：{self.category_planner.describe(conn)}")
                 else:
-                    updated_count = 0
-                    
-                    # 处理每个表
-                    for table_name in tables:
-                        # 获取表的列信息
-                        cursor.execute(f"PRAGMA table_info({table_name})")
-                        columns = cursor.fetchall()
-                        
-                        # 查找分类相关列
-                        category_columns = []
-                        for col in columns:
-                            col_name = col[1].lower()
-                            if any(keyword in col_name for keyword in ['category', '分类', 'cat', 'type', '类型', 'tag', '标签']):
-                                category_columns.append(col[1])
-                        
-                        # 更新分类
-                        for column in category_columns:
-                            try:
-                                # 更新空值或NULL值的分类字段
-                                update_sql = f"""
-                                UPDATE {table_name} 
-                                SET {column} = ? 
-                                WHERE {column} IS NULL OR {column} = '' OR {column} = 'NULL'
-                                """
-                                cursor.execute(update_sql, (category,))
-                                updated_rows = cursor.rowcount
-                                updated_count += updated_rows
-                                
-                            except Exception as e:
-                                self.logger.error(f"    更新列 {column} 时出错: {e}")
-                    
+                    # 分类相关列按表结构缓存，每张表一条 UPDATE 填充所有空分类列
+                    updated_count = self.category_planner.apply(conn, category)
                     conn.commit()
                     self.logger.info(f"  ✓ 更新了 {updated_count} 条记录")
                     total_updated += updated_count
@@ -605,6 +562,7 @@ class DataProcessor:
         self.logger.info(f"\n批量分类更新完成！成功处理: {success_count}/{process_count} 个数据库")
         if not self.preview_only:
             self.logger.info(f"总共更新: {total_updated} 条记录")
+        self.logger.info(f"分类列解析: {self.category_planner.stats()}")
         
         return success_count
     
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库备份工具
+通过 sqlite3 的 backup API 获取一致性快照，内容未变化时跳过，快照压缩保存（lzma/gzip），
+并按保留策略清理旧快照。其他脚本可直接导入 backup_database 使用，
+也可单独运行，对整个文件夹范围并行备份。
+"""
+
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from 数据目录清单 import list_range_databases as list_range_entries
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+START_FOLDER: int = 5211
+END_FOLDER: int = 5523
+
+BACKUP_DIRNAME: str = "backup"      # 快照保存在数据库同目录下的此子文件夹
+COMPRESSION: str = "lzma"           # "lzma"（体积最小）/ "gzip"（速度快）/ "none"
+KEEP_LAST: Optional[int] = 5        # 每个数据库最多保留的快照数，None 不限制
+KEEP_DAYS: Optional[int] = 30       # 超过天数的快照删除，None 不限制（最新一份始终保留）
+MAX_WORKERS: int = 4                # 并行备份的线程数
+# ====================================================
+
+MANIFEST_NAME = "backup_manifest.json"
+COMPRESSED_SUFFIX = {"lzma": ".xz", "gzip": ".gz", "none": ""}
+CHUNK_SIZE = 1024 * 1024
+
+# SQLite 文件头中的“文件修改计数”和“version-valid-for”字段：
+# 即使内容未变，写事务也会让它们递增，计算内容哈希时置零
+_VOLATILE_HEADER_RANGES = ((24, 28), (92, 96))
+
+
+def content_hash(path: str) -> str:
+    """计算数据库文件的内容哈希（忽略文件头中的易变计数字段）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        header = bytearray(f.read(100))
+        for start, end in _VOLATILE_HEADER_RANGES:
+            header[start:end] = b"\x00" * (end - start)
+        digest.update(header)
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _open_compressed(path: str, mode: str, compression: str):
+    if compression == "lzma":
+        return lzma.open(path, mode)
+    if compression == "gzip":
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode)
+
+
+def _compression_of(filename: str) -> str:
+    for name, suffix in COMPRESSED_SUFFIX.items():
+        if suffix and filename.endswith(suffix):
+            return name
+    return "none"
+
+
+def load_manifest(backup_dir: str) -> Dict:
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"snapshots": []}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"snapshots": []}
+
+
+def save_manifest(backup_dir: str, manifest: Dict) -> None:
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def take_snapshot(db_path: str, snapshot_path: str) -> None:
+    """使用 backup API 复制数据库，得到与正在写入的事务无关的一致性快照"""
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(snapshot_path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def apply_retention(backup_dir: str, manifest: Dict, keep_last: Optional[int], keep_days: Optional[int]) -> List[str]:
+    """按保留策略删除旧快照，返回被删除的文件名列表（最新一份始终保留）"""
+    snapshots = sorted(manifest.get("snapshots", []), key=lambda s: s["created"], reverse=True)
+    cutoff = datetime.now() - timedelta(days=keep_days) if keep_days is not None else None
+
+    kept, removed = [], []
+    for i, snap in enumerate(snapshots):
+        too_many = keep_last is not None and i >= keep_last
+        too_old = cutoff is not None and datetime.fromisoformat(snap["created"]) < cutoff
+        if i > 0 and (too_many or too_old):
+            try:
+                os.remove(os.path.join(backup_dir, snap["file"]))
+            except FileNotFoundError:
+                pass
+            removed.append(snap["file"])
+        else:
+            kept.append(snap)
+
+    manifest["snapshots"] = kept[::-1]  # 按创建时间升序保存，最新的在末尾
+    return removed
+
+
+def backup_database(db_path: str, backup_dir: Optional[str] = None, *, compression: str = COMPRESSION,
+                    keep_last: Optional[int] = KEEP_LAST, keep_days: Optional[int] = KEEP_DAYS,
+                    force: bool = False) -> Dict:
+    """备份单个数据库
+
+    返回 {"status": "created"/"unchanged"/"failed", "path": 快照路径, "bytes": 快照大小, "error": 错误信息}
+    """
+    if compression not in COMPRESSED_SUFFIX:
+        raise ValueError(f"不支持的压缩方式: {compression}")
+    if not os.path.exists(db_path):
+        return {"status": "failed", "path": None, "bytes": 0, "error": f"数据库不存在: {db_path}"}
+
+    backup_dir = backup_dir or os.path.join(os.path.dirname(db_path), BACKUP_DIRNAME)
+    os.makedirs(backup_dir, exist_ok=True)
+    manifest = load_manifest(backup_dir)
+    latest = manifest["snapshots"][-1] if manifest.get("snapshots") else None
+    latest_exists = latest is not None and os.path.exists(os.path.join(backup_dir, latest["file"]))
+
+    # 快速判断：文件大小和修改时间都没变，连快照都不用做；
+    # 还留在 -wal 中的提交不会改变主文件，-wal 非空时不走快速判断
+    stat = os.stat(db_path)
+    wal_path = db_path + "-wal"
+    wal_pending = os.path.exists(wal_path) and os.path.getsize(wal_path) > 0
+    if (not force and latest_exists and not wal_pending and manifest.get("source_size") == stat.st_size
+            and manifest.get("source_mtime_ns") == stat.st_mtime_ns):
+        return {"status": "unchanged", "path": os.path.join(backup_dir, latest["file"]), "bytes": 0, "error": None}
+
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    tmp_path = os.path.join(backup_dir, f".{stem}.snapshot.tmp")
+    try:
+        take_snapshot(db_path, tmp_path)
+        snapshot_hash = content_hash(tmp_path)
+
+        # 内容哈希未变：丢弃快照，只刷新文件状态
+        if not force and latest_exists and snapshot_hash == manifest.get("content_hash"):
+            os.remove(tmp_path)
+            manifest["source_size"], manifest["source_mtime_ns"] = stat.st_size, stat.st_mtime_ns
+            save_manifest(backup_dir, manifest)
+            return {"status": "unchanged", "path": os.path.join(backup_dir, latest["file"]), "bytes": 0, "error": None}
+
+        now = datetime.now()
+        name = f"{stem}_{now.strftime('%Y%m%d_%H%M%S')}.db3{COMPRESSED_SUFFIX[compression]}"
+        snapshot_path = os.path.join(backup_dir, name)
+        with open(tmp_path, "rb") as src, _open_compressed(snapshot_path, "wb", compression) as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        os.remove(tmp_path)
+
+        size = os.path.getsize(snapshot_path)
+        manifest["snapshots"] = [s for s in manifest.get("snapshots", []) if s["file"] != name]
+        manifest["snapshots"].append({"file": name, "hash": snapshot_hash, "created": now.isoformat(timespec="seconds"), "size": size})
+        manifest.update(content_hash=snapshot_hash, source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns)
+        apply_retention(backup_dir, manifest, keep_last, keep_days)
+        save_manifest(backup_dir, manifest)
+        return {"status": "created", "path": snapshot_path, "bytes": size, "error": None}
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return {"status": "failed", "path": None, "bytes": 0, "error": str(e)}
+
+
+def _release_side_files(db_path: str) -> None:
+    """还原前处理数据库旁残留的 -wal/-journal（如 bulk-write 运行中途崩溃留下的）
+
+    这些文件会在下次打开时被重放到还原后的文件上，把它弄坏。先正常打开一次，
+    让 SQLite 恢复/检查点并在关闭时删除它们；关闭后仍然存在说明还有其他连接在使用，拒绝还原。
+    """
+    wal_path, journal_path, shm_path = db_path + "-wal", db_path + "-journal", db_path + "-shm"
+    if not (os.path.exists(wal_path) or os.path.exists(journal_path)):
+        return
+    conn = sqlite3.connect(db_path, timeout=0)
+    try:
+        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+    finally:
+        conn.close()
+    if busy or os.path.exists(wal_path) or os.path.exists(journal_path):
+        raise RuntimeError(f"数据库正在被其他程序使用，请关闭后再还原: {db_path}")
+    if os.path.exists(shm_path):
+        os.remove(shm_path)
+
+
+def restore_snapshot(snapshot_path: str, db_path: str) -> None:
+    """把快照解压还原为数据库文件（先写临时文件，再原子替换）；数据库仍在被使用时抛出 RuntimeError"""
+    tmp_path = db_path + ".restore.tmp"
+    with _open_compressed(snapshot_path, "rb", _compression_of(snapshot_path)) as src, open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    try:
+        if os.path.exists(db_path):
+            _release_side_files(db_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, db_path)
+
+
+def list_range_databases(base_dir: str, start_num: int, end_num: int) -> List[str]:
+    """返回范围内的数据库路径，按文件夹编号升序（由数据目录清单提供）"""
+    return [path for _, path in list_range_entries(base_dir, start_num, end_num)]
+
+
+def backup_range(base_dir: str, start_num: int, end_num: int, max_workers: int = MAX_WORKERS) -> Dict[str, int]:
+    """并行备份文件夹范围内的所有数据库，返回各状态的计数"""
+    db_paths = list_range_databases(base_dir, start_num, end_num)
+    counts = {"created": 0, "unchanged": 0, "failed": 0}
+    written = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(backup_database, path): path for path in db_paths}
+        for i, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            result = future.result()
+            counts[result["status"]] += 1
+            written += result["bytes"]
+            if result["status"] == "created":
+                print(f"✅ [{i}/{len(db_paths)}] 已备份: {result['path']} ({result['bytes'] / 1024:.1f} KB)")
+            elif result["status"] == "unchanged":
+                print(f"⏭ [{i}/{len(db_paths)}] 内容未变，跳过: {path}")
+            else:
+                print(f"❌ [{i}/{len(db_paths)}] 备份失败: {path}，原因：{result['error']}")
+
+    print("=" * 60)
+    print(f"新建快照: {counts['created']}，未变化跳过: {counts['unchanged']}，失败: {counts['failed']}")
+    print(f"写入备份总量: {written / 1024 / 1024:.2f} MB")
+    return counts
+
+
+def main():
+    print("=== 数据库备份 ===")
+    print(f"基础文件夹: {BASE_DIR}")
+    print(f"处理范围: {START_FOLDER} - {END_FOLDER}")
+    print(f"压缩方式: {COMPRESSION}，保留最近: {KEEP_LAST} 份，保留天数: {KEEP_DAYS}")
+    print("=" * 60)
+    backup_range(BASE_DIR, START_FOLDER, END_FOLDER)
+
+
+if __name__ == "__main__":
+    # python 数据库备份.py --restore <快照文件> <数据库路径>
+    if len(sys.argv) > 1 and sys.argv[1] == "--restore":
+        if len(sys.argv) != 4:
+            print("用法: python 数据库备份.py --restore <快照文件> <数据库路径>")
+            sys.exit(1)
+        try:
+            restore_snapshot(sys.argv[2], sys.argv[3])
+        except (RuntimeError, sqlite3.Error) as e:
+            print(f"❌ 还原失败：{e}")
+            sys.exit(1)
+        print(f"已还原: {sys.argv[2]} -> {sys.argv[3]}")
+    else:
+        main()
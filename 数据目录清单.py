@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据目录清单
+在 Data 目录旁保存一份清单（Data_manifest.json）：文件夹编号 → 数据库路径、大小、修改时间、
+行数、表结构哈希。Data 目录本身的修改时间不变时不再列目录，查询范围时只检查范围内的文件夹，
+文件大小或修改时间变化的数据库才重新统计。几千个任务文件夹时按范围查找也几乎是即时的。
+
+其他脚本通过 list_range_databases(base_dir, start, end) 获取范围内的数据库，
+代替各自的 os.listdir + isdigit + os.path.exists。
+
+用法：
+  python 数据目录清单.py            刷新范围内的清单（含行数和表结构哈希）并打印汇总
+  python 数据目录清单.py --rebuild  丢弃旧清单，重新扫描整个 Data 目录
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from 连接工厂 import connect
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+DB_FILENAME: str = "SpiderResult.db3"
+TABLE_NAME: str = "Content"
+START_FOLDER: Optional[int] = 5211
+END_FOLDER: Optional[int] = 5523
+# ====================================================
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(base_dir: str) -> str:
+    """清单保存在 Data 目录旁：D:\\...\\Data → D:\\...\\Data_manifest.json"""
+    return os.path.normpath(base_dir) + "_manifest.json"
+
+
+def load_manifest(base_dir: str) -> Dict:
+    path = manifest_path(base_dir)
+    empty = {"version": MANIFEST_VERSION, "db_filename": DB_FILENAME, "root_mtime_ns": None, "folders": {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("db_filename") != DB_FILENAME:
+        return empty
+    return manifest
+
+
+def save_manifest(base_dir: str, manifest: Dict) -> None:
+    path = manifest_path(base_dir)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        # 清单只是缓存，写不进去（如 Data 上级目录只读）不影响本次结果
+        pass
+
+
+def schema_fingerprint(conn: sqlite3.Connection) -> str:
+    """表结构哈希：所有表和索引的建表语句（忽略空白差异和本项目以 _ 开头的辅助表、触发器）"""
+    rows = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' AND name NOT LIKE '\\_%' ESCAPE '\\' "
+        "ORDER BY type, name"
+    ).fetchall()
+    digest = hashlib.sha1()
+    for obj_type, name, sql in rows:
+        normalized = re.sub(r"\s+", " ", sql).strip()
+        digest.update(f"{obj_type}\x00{name}\x00{normalized}\x01".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _scan_folders(base_dir: str) -> Dict[str, Dict]:
+    """列出 Data 下的数字文件夹（只在 Data 目录本身有变化时调用）"""
+    folders = {}
+    with os.scandir(base_dir) as it:
+        for entry in it:
+            if entry.name.isdigit() and entry.is_dir():
+                folders[entry.name] = {"db": os.path.join(entry.path, DB_FILENAME)}
+    return folders
+
+
+def _collect_stats(entry: Dict) -> None:
+    """统计行数和表结构哈希（只读打开）"""
+    try:
+        conn = connect(entry["db"], "read-only")
+        try:
+            entry["schema"] = schema_fingerprint(conn)
+            has_table = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLE_NAME,)
+            ).fetchone()
+            entry["rows"] = conn.execute(f'SELECT COUNT(*) FROM "{TABLE_NAME}"').fetchone()[0] if has_table else 0
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        entry["rows"], entry["schema"] = None, None
+        entry["error"] = str(e)
+
+
+def _in_range(num: int, start: Optional[int], end: Optional[int]) -> bool:
+    return (start is None or num >= start) and (end is None or num <= end)
+
+
+def refresh_manifest(base_dir: str, start: Optional[int] = None, end: Optional[int] = None,
+                     with_stats: bool = False, rebuild: bool = False) -> Dict:
+    """按需刷新清单并返回
+
+    Data 目录修改时间变化时重新列目录；范围内文件夹检查数据库的大小和修改时间，
+    变化的条目清空旧统计，with_stats=True 时重新统计行数和表结构哈希。
+    """
+    manifest = {"version": MANIFEST_VERSION, "db_filename": DB_FILENAME, "root_mtime_ns": None, "folders": {}} \
+        if rebuild else load_manifest(base_dir)
+    dirty = False
+
+    root_mtime = os.stat(base_dir).st_mtime_ns
+    if manifest["root_mtime_ns"] != root_mtime:
+        scanned = _scan_folders(base_dir)
+        old = manifest["folders"]
+        manifest["folders"] = {name: old.get(name, info) for name, info in scanned.items()}
+        manifest["root_mtime_ns"] = root_mtime
+        dirty = True
+
+    for name, entry in manifest["folders"].items():
+        if not _in_range(int(name), start, end):
+            continue
+        try:
+            stat = os.stat(entry["db"])
+        except FileNotFoundError:
+            if entry.get("exists", True):
+                entry.clear()
+                entry.update(db=os.path.join(base_dir, name, DB_FILENAME), exists=False)
+                dirty = True
+            continue
+        if entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns or not entry.get("exists"):
+            entry.update(exists=True, size=stat.st_size, mtime_ns=stat.st_mtime_ns, rows=None, schema=None)
+            entry.pop("error", None)
+            dirty = True
+        if with_stats and entry.get("schema") is None and "error" not in entry:
+            _collect_stats(entry)
+            dirty = True
+
+    if dirty:
+        save_manifest(base_dir, manifest)
+    return manifest
+
+
+def range_entries(base_dir: str, start: Optional[int], end: Optional[int],
+                  with_stats: bool = False) -> List[Tuple[int, Dict]]:
+    """返回范围内存在数据库的 (文件夹编号, 清单条目)，按编号升序"""
+    manifest = refresh_manifest(base_dir, start, end, with_stats=with_stats)
+    result = [
+        (int(name), entry) for name, entry in manifest["folders"].items()
+        if entry.get("exists") and _in_range(int(name), start, end)
+    ]
+    result.sort(key=lambda item: item[0])
+    return result
+
+
+def list_range_databases(base_dir: str, start: Optional[int], end: Optional[int]) -> List[Tuple[int, str]]:
+    """返回范围内 (文件夹编号, 数据库路径) 列表，按编号升序（start/end 为 None 表示不限）"""
+    return [(num, entry["db"]) for num, entry in range_entries(base_dir, start, end)]
+
+
+def main():
+    rebuild = "--rebuild" in sys.argv[1:]
+    print("=== 数据目录清单 ===")
+    print(f"基础文件夹: {BASE_DIR}")
+    print(f"处理范围: {START_FOLDER} - {END_FOLDER}")
+    print(f"清单文件: {manifest_path(BASE_DIR)}")
+    print("=" * 60)
+
+    if rebuild:
+        refresh_manifest(BASE_DIR, rebuild=True)
+    entries = range_entries(BASE_DIR, START_FOLDER, END_FOLDER, with_stats=True)
+    if not entries:
+        print("未找到符合条件的数据库文件夹！")
+        return
+
+    schemas: Dict[str, int] = {}
+    total_rows = total_size = 0
+    for num, entry in entries:
+        if entry.get("error"):
+            print(f"❌ {num}: {entry['error']}")
+            continue
+        total_rows += entry["rows"] or 0
+        total_size += entry["size"]
+        schemas[entry["schema"]] = schemas.get(entry["schema"], 0) + 1
+
+    print(f"数据库: {len(entries)} 个，共 {total_rows} 行，{total_size / 1024 / 1024:.1f} MB")
+    print(f"表结构种类: {len(schemas)}")
+    for schema, count in sorted(schemas.items(), key=lambda x: -x[1]):
+        print(f"  {schema}: {count} 个数据库")
+
+
+if __name__ == "__main__":
+    main()
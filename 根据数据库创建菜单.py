@@ -17,13 +17,14 @@
 """
 
 import os
-import sqlite3
 import json
 from typing import Dict, Any, List, Optional, Set
 
 import requests
 from requests.auth import HTTPBasicAuth
 
+from 联合查询 import federated_query
+
 # ================== 数据源配置（与上传脚本保持一致） ==================
 ROOT_DIR = r"D:\火车采集器V10.28\Data"  # 与上传脚本一致
 DB_FILENAME = "SpiderResult.db3"
@@ -109,40 +110,28 @@ def collect_used_category_paths() -> Set[str]:
         folder_path = os.path.join(ROOT_DIR, sub)
         print(f"  [{idx}/{len(subfolders)}] {folder_path}")
 
+    databases = []
     for sub in subfolders:
-        folder_path = os.path.join(ROOT_DIR, sub)
-        db_path = os.path.join(folder_path, DB_FILENAME)
-        if not os.path.exists(db_path):
-            continue
-
-        try:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-        except Exception as e:
-            print(f"  打开数据库失败: {db_path} -> {e}")
-            continue
-
-        try:
-            # 只取 已发 != 0 且 分类 非空的记录
-            sql = (
-                f'SELECT DISTINCT "分类" FROM "{TABLE_NAME}" '
-                'WHERE "已发" IS NOT NULL AND "已发" != 0 '
-                'AND "分类" IS NOT NULL AND TRIM("分类") != ""'
-            )
-            cur.execute(sql)
-            rows = cur.fetchall()
-            for row in rows:
-                cat = row["分类"]
-                if isinstance(cat, str):
-                    cat = cat.strip()
-                if not cat:
-                    continue
-                used_paths.add(cat)
-        except Exception as e:
-            print(f"  读取分类失败: {db_path} -> {e}")
-        finally:
-            conn.close()
+        db_path = os.path.join(ROOT_DIR, sub, DB_FILENAME)
+        if os.path.exists(db_path):
+            databases.append((sub, db_path))
+
+    # 只取 已发 != 0 且 分类 非空的记录；各库分批 ATTACH 后一次 UNION ALL 查询，
+    # 无法读取的库由 federated_query 逐库跳过并提示，不影响其他库
+    sql = (
+        f'SELECT DISTINCT "分类" FROM {{db}}."{TABLE_NAME}" '
+        'WHERE "已发" IS NOT NULL AND "已发" != 0 '
+        'AND "分类" IS NOT NULL AND TRIM("分类") != \'\''
+    )
+    try:
+        for _, cat in federated_query(databases, sql):
+            if isinstance(cat, str):
+                cat = cat.strip()
+            if not cat:
+                continue
+            used_paths.add(cat)
+    except Exception as e:
+        print(f"  读取分类失败（已收集 {len(used_paths)} 条）: {e}")
 
     print(f"\n共收集到 {len(used_paths)} 条已发分类路径。")
     return used_paths
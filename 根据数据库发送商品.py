@@ -44,6 +44,10 @@ TABLE_NAME = "Content"
 IMG_SEPARATOR = "|||"
 CAT_SEPARATOR = "|||"
 
+# 跨文件夹去重（跨文件夹去重.py）使用的列：标记为副本的记录跳过上传，附加分类一并绑定
+DUPLICATE_MARK_COLUMN = "重复来源"
+EXTRA_CATEGORY_COLUMN = "附加分类"
+
 # WooCommerce API endpoints
 API_PRODUCTS = f"{DOMAIN}/wp-json/wc/v3/products"
 API_CATEGORIES = f"{DOMAIN}/wp-json/wc/v3/products/categories"
@@ -483,6 +487,12 @@ def build_product_payload(row, folder_base):
     # 分类（如果字段开启，会尝试创建/查找并绑定最底层分类）
     if FIELD_CONFIG.get("分类", True) and "分类" in row.keys() and row["分类"]:
         cat_ids = create_category_hierarchy(row["分类"])
+        # 跨文件夹去重合并过来的附加分类（每行一条分类路径）
+        if EXTRA_CATEGORY_COLUMN in row.keys() and row[EXTRA_CATEGORY_COLUMN]:
+            for extra_path in str(row[EXTRA_CATEGORY_COLUMN]).splitlines():
+                for cid in create_category_hierarchy(extra_path.strip()):
+                    if cid not in cat_ids:
+                        cat_ids.append(cid)
         if cat_ids:
             p["categories"] = [{"id": cid} for cid in cat_ids]
 
@@ -565,6 +575,12 @@ def process_folder(folder_path):
                 print(f"[进度] 已处理 {idx}/{total_rows} | 已上传 {uploaded} | 跳过 {skipped} | 失败 {failed} | 剩余 {remaining}")
                 continue
 
+            # 跨文件夹去重标记的副本，不再上传
+            if DUPLICATE_MARK_COLUMN in row.keys() and row[DUPLICATE_MARK_COLUMN]:
+                print(f"记录 {record_id} 是 {row[DUPLICATE_MARK_COLUMN]} 的跨文件夹副本，跳过。")
+                skipped += 1
+                continue
+
             # 若开启 SKU 检查，避免重复上传
             if FIELD_CONFIG.get("SKU", True) and "SKU" in row.keys() and row["SKU"]:
                 existing = product_exists_by_sku(row["SKU"])
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库空间回收
+去重、删除空图片行、删除 Content_backup 等操作之后，SQLite 文件不会自动变小，
+被删除的页留在空闲列表（freelist）里，后续每次全表扫描都要多读这些页。
+
+本工具按空闲页比例挑出需要整理的数据库，并行处理：
+  vacuum_into  独占锁住原库，VACUUM INTO 到临时文件，再经 backup API 写回原库后释放锁；
+               拿不到锁（有程序正在读写）时跳过
+  incremental  数据库已是 auto_vacuum=INCREMENTAL 时直接 PRAGMA incremental_vacuum；
+               否则先按 vacuum_into 整理一次，并把新文件设为增量模式，以后只需增量回收
+最后汇报每个数据库及总计回收的字节数。
+"""
+
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+from 数据目录清单 import list_range_databases
+from 连接工厂 import connect
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+START_FOLDER: int = 5211
+END_FOLDER: int = 5523
+
+MODE: str = "vacuum_into"             # "vacuum_into" / "incremental"
+MIN_FREELIST_RATIO: float = 0.10      # 空闲页占比低于此值的数据库跳过
+MIN_FREE_BYTES: int = 1024 * 1024     # 空闲空间小于此值的数据库跳过
+DROP_BACKUP_TABLES: bool = True       # 顺带删除旧版本留下的 Content_backup 整表备份
+MAX_WORKERS: int = 4
+LOCK_TIMEOUT: float = 5.0             # 等待独占锁的秒数，超时说明有程序在使用，跳过该库
+DRY_RUN: bool = False                 # 只统计空闲空间，不整理
+# ====================================================
+
+BACKUP_TABLE_PATTERN = "Content\\_backup%"
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def measure(db_path: str) -> Dict:
+    """统计页大小、总页数、空闲页数、空闲比例和残留的 Content_backup 表"""
+    conn = connect(db_path, "read-only")
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        backup_tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE ? ESCAPE '\\'", (BACKUP_TABLE_PATTERN,)
+        )]
+    finally:
+        conn.close()
+    return {
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist": freelist,
+        "free_bytes": freelist * page_size,
+        "ratio": freelist / page_count if page_count else 0.0,
+        "auto_vacuum": auto_vacuum,
+        "backup_tables": backup_tables,
+    }
+
+
+def drop_backup_tables(db_path: str, tables: List[str]) -> None:
+    conn = connect(db_path, "safe")
+    try:
+        for table in tables:
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def vacuum_into_swap(db_path: str, make_incremental: bool = False) -> bool:
+    """整个过程持有原库的独占锁：VACUUM INTO 临时文件，再用 backup API 把整理结果写回原库
+
+    写回经过原库自己的连接和日志，中途中断可回滚；其他程序已打开（但空闲）的连接
+    之后读到的也是新内容，不会像替换文件那样继续写旧文件。
+    拿不到锁（有程序正在读写）时不做任何修改，返回 False。
+    """
+    if os.path.exists(db_path + "-wal") and os.path.getsize(db_path + "-wal") > 0:
+        raise RuntimeError("存在未合并的 WAL 文件，可能有程序正在写入")
+
+    tmp_path = db_path + ".vacuum.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = connect(db_path, "safe", isolation_level=None, timeout=LOCK_TIMEOUT)
+    try:
+        # EXCLUSIVE 锁定模式下锁在提交后仍保留，直到连接关闭；VACUUM INTO 不能在事务中执行
+        conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+        try:
+            conn.execute("BEGIN EXCLUSIVE")
+        except sqlite3.OperationalError:
+            return False
+        conn.execute("COMMIT")
+        conn.execute("VACUUM INTO ?", (tmp_path,))
+
+        tmp = sqlite3.connect(tmp_path)
+        try:
+            if make_incremental:
+                # 临时文件没有其他程序打开，可以放心做一次完整 VACUUM 切换 auto_vacuum 模式
+                tmp.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                tmp.execute("VACUUM")
+            tmp.backup(conn)
+        finally:
+            tmp.close()
+        return True
+    finally:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def incremental_vacuum(db_path: str) -> None:
+    conn = connect(db_path, "safe", isolation_level=None)
+    try:
+        # execute() 每次只推进一步（只释放一页），executescript 会一直执行到结束
+        conn.executescript("PRAGMA incremental_vacuum;")
+    finally:
+        conn.close()
+
+
+def compact_database(db_path: str, mode: str = MODE, min_ratio: float = MIN_FREELIST_RATIO,
+                     min_free_bytes: int = MIN_FREE_BYTES, drop_backups: bool = DROP_BACKUP_TABLES,
+                     dry_run: bool = False) -> Dict:
+    """整理单个数据库
+
+    返回 {"status": "compacted"/"skipped"/"failed", "before": 原大小, "after": 新大小,
+          "ratio": 空闲比例, "dropped": 删除的备份表, "error": 错误信息}
+    """
+    if mode not in ("vacuum_into", "incremental"):
+        raise ValueError(f"不支持的整理方式: {mode}")
+    result = {"status": "skipped", "before": 0, "after": 0, "ratio": 0.0, "dropped": [], "error": None}
+    try:
+        result["before"] = result["after"] = os.path.getsize(db_path)
+        info = measure(db_path)
+        result["ratio"] = info["ratio"]
+
+        if drop_backups and info["backup_tables"] and not dry_run:
+            drop_backup_tables(db_path, info["backup_tables"])
+            result["dropped"] = info["backup_tables"]
+            info = measure(db_path)
+            result["ratio"] = info["ratio"]
+
+        if info["ratio"] < min_ratio or info["free_bytes"] < min_free_bytes:
+            return result
+        if dry_run:
+            result["status"] = "compacted"
+            result["after"] = result["before"] - info["free_bytes"]
+            return result
+
+        if mode == "incremental" and info["auto_vacuum"] == AUTO_VACUUM_INCREMENTAL:
+            incremental_vacuum(db_path)
+        elif not vacuum_into_swap(db_path, make_incremental=(mode == "incremental")):
+            result["error"] = "数据库正在被其他程序使用，已跳过"
+            return result
+        result["status"] = "compacted"
+        result["after"] = os.path.getsize(db_path)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    return result
+
+
+def compact_range(base_dir: str, start_num: int, end_num: int, max_workers: int = MAX_WORKERS,
+                  dry_run: bool = DRY_RUN) -> int:
+    """并行整理范围内的数据库，返回回收（预览时为可回收）的字节数"""
+    databases = list_range_databases(base_dir, start_num, end_num)
+    counts = {"compacted": 0, "skipped": 0, "failed": 0}
+    reclaimed = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(compact_database, path, dry_run=dry_run): (num, path) for num, path in databases}
+        for i, future in enumerate(as_completed(futures), 1):
+            num, path = futures[future]
+            result = future.result()
+            counts[result["status"]] += 1
+            saved = result["before"] - result["after"]
+            prefix = f"[{i}/{len(databases)}] {num}"
+            if result["dropped"]:
+                print(f"🗑 {prefix}: 已删除备份表 {', '.join(result['dropped'])}")
+            if result["status"] == "compacted":
+                reclaimed += saved
+                verb = "可回收" if dry_run else "回收"
+                print(f"✅ {prefix}: 空闲 {result['ratio']:.0%}，{verb} {saved / 1024 / 1024:.2f} MB"
+                      f"（{result['before'] / 1024 / 1024:.2f} → {result['after'] / 1024 / 1024:.2f} MB）")
+            elif result["status"] == "skipped":
+                print(f"⏭ {prefix}: 空闲 {result['ratio']:.0%}，{result['error'] or '无需整理'}")
+            else:
+                print(f"❌ {prefix}: 整理失败：{result['error']}")
+
+    print("=" * 60)
+    print(f"整理: {counts['compacted']}，跳过: {counts['skipped']}，失败: {counts['failed']}")
+    print(f"{'可回收' if dry_run else '共回收'}: {reclaimed / 1024 / 1024:.2f} MB")
+    return reclaimed
+
+
+def main():
+    print("=== 数据库空间回收 ===" + (" (预览模式)" if DRY_RUN else ""))
+    print(f"基础文件夹: {BASE_DIR}")
+    print(f"处理范围: {START_FOLDER} - {END_FOLDER}")
+    print(f"整理方式: {MODE}，空闲比例阈值: {MIN_FREELIST_RATIO:.0%}，并行: {MAX_WORKERS}")
+    print("=" * 60)
+    compact_range(BASE_DIR, START_FOLDER, END_FOLDER, MAX_WORKERS, DRY_RUN)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨文件夹联合查询
+把范围内的 SpiderResult.db3 分批 ATTACH 到同一个连接（每批不超过 SQLite 的附加数据库上限），
+对每个库执行同一条 SQL，用 UNION ALL 合并后逐行返回，每行开头附带文件夹编号。
+SQL 中用 {db} 表示当前数据库，例如：
+  SELECT DISTINCT 分类 FROM {db}.Content WHERE 已发 != 0
+
+需要跨文件夹聚合（如“哪些 SKU 出现了两次”）时，可先 --materialize 生成合并目录库，
+再直接对目录库反复查询。
+
+用法：
+  python 联合查询.py "SELECT ... FROM {db}.Content ..."   流式输出查询结果（制表符分隔）
+  python 联合查询.py --materialize [输出路径]             生成合并目录库（默认 CATALOG_PATH）
+"""
+
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from 连接工厂 import connect
+from 数据目录清单 import list_range_databases
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+TABLE_NAME: str = "Content"
+START_FOLDER: int = 5211
+END_FOLDER: int = 5523
+
+CATALOG_PATH: str = os.path.join(BASE_DIR, "catalog.db3")  # 合并目录库保存位置
+CATALOG_INDEXES: List[str] = ["分类", "SKU", "PageUrl"]       # 目录库中建索引的列（存在才建）
+# ====================================================
+
+FOLDER_COLUMN = "文件夹"
+SOURCE_ID_COLUMN = "源ID"
+DEFAULT_ATTACH_LIMIT = 10  # SQLite 默认编译上限
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def attach_limit(conn: sqlite3.Connection) -> int:
+    """当前 SQLite 允许同时附加的数据库数量"""
+    if hasattr(conn, "getlimit"):
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    return DEFAULT_ATTACH_LIMIT
+
+
+def _readonly_uri(db_path: str) -> str:
+    return Path(db_path).resolve().as_uri() + "?mode=ro"
+
+
+def _groups(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def federated_query(databases: Sequence[Tuple[object, str]], sql: str, params: Sequence = (),
+                    group_size: Optional[int] = None) -> Iterator[tuple]:
+    """对每个数据库执行 sql（{db} 替换为该库的别名），逐行产出 (文件夹, *结果列)
+
+    同一批内的库用 UNION ALL 一次查询，整批取回后再产出；某个库无法打开、结构不同或已损坏
+    导致整批失败时，改为逐库执行并跳过出错的库，其余库的结果照常返回。
+    """
+    if "{db}" not in sql:
+        raise ValueError("SQL 中需要用 {db} 指定表所在的数据库，例如 FROM {db}.Content")
+
+    conn = sqlite3.connect(":memory:", uri=True)
+    try:
+        size = min(group_size or attach_limit(conn), attach_limit(conn))
+        for group in _groups(list(databases), size):
+            attached = []
+            try:
+                for label, db_path in group:
+                    alias = f"f{len(attached)}"
+                    try:
+                        conn.execute(f"ATTACH DATABASE ? AS {alias}", (_readonly_uri(db_path),))
+                    except sqlite3.DatabaseError as e:
+                        print(f"⚠️ 跳过 {label}（{db_path}）：{e}")
+                        continue
+                    attached.append((label, db_path, alias))
+                parts = [f"SELECT ? AS {quote_ident(FOLDER_COLUMN)}, * FROM ({sql.replace('{db}', alias)})"
+                         for _, _, alias in attached]
+                bound = []
+                for label, _, _ in attached:
+                    bound.extend([label, *params])
+                # 整批取回后再产出：读取中途某个库出错也能改为逐库重试，不会重复产出已返回的行，
+                # 调用方提前停止迭代时也没有仍在读取附加库的游标妨碍 DETACH
+                try:
+                    rows = conn.execute(" UNION ALL ".join(parts), bound).fetchall() if parts else []
+                except sqlite3.DatabaseError:
+                    rows = []
+                    for (label, db_path, _), part in zip(attached, parts):
+                        try:
+                            rows.extend(conn.execute(part, [label, *params]).fetchall())
+                        except sqlite3.DatabaseError as e:
+                            print(f"⚠️ 跳过 {label}（{db_path}）：{e}")
+                yield from rows
+            finally:
+                for _, _, alias in attached:
+                    conn.execute(f"DETACH DATABASE {alias}")
+    finally:
+        conn.close()
+
+
+def materialize(databases: Sequence[Tuple[object, str]], out_path: str, table: str = TABLE_NAME) -> int:
+    """把各库的 table 合并写入 out_path 的同名表，附加 文件夹、源ID 两列；返回写入行数
+
+    各库列不一致时取并集，缺少的列写 NULL。每次重新生成。
+    """
+    out = connect(out_path, "bulk-write")
+    try:
+        out.execute(f"DROP TABLE IF EXISTS {quote_ident(table)}")
+        size = attach_limit(out)
+
+        # 第一遍：收集所有库的列（按首次出现顺序）
+        columns: List[str] = []
+        db_columns = {}
+        for group in _groups(list(databases), size):
+            for i, (label, db_path) in enumerate(group):
+                out.execute(f"ATTACH DATABASE ? AS f{i}", (_readonly_uri(db_path),))
+            for i, (label, db_path) in enumerate(group):
+                cols = [row[1] for row in out.execute(f"PRAGMA f{i}.table_info({quote_ident(table)})")]
+                db_columns[label] = cols
+                columns.extend(c for c in cols if c not in columns)
+            for i in range(len(group)):
+                out.execute(f"DETACH DATABASE f{i}")
+
+        column_defs = ", ".join(quote_ident(c) for c in columns)
+        out.execute(
+            f"CREATE TABLE {quote_ident(table)} ({quote_ident(FOLDER_COLUMN)}, "
+            f"{quote_ident(SOURCE_ID_COLUMN)} INTEGER, {column_defs})"
+        )
+
+        # 第二遍：按批 INSERT ... SELECT，整批在一个事务中完成
+        total = 0
+        for group in _groups(list(databases), size):
+            for i, (label, db_path) in enumerate(group):
+                out.execute(f"ATTACH DATABASE ? AS f{i}", (_readonly_uri(db_path),))
+            for i, (label, db_path) in enumerate(group):
+                cols = db_columns.get(label) or []
+                if not cols:
+                    print(f"⚠️ 跳过 {label}：缺少 {table} 表")
+                    continue
+                select_list = ", ".join(quote_ident(c) if c in cols else "NULL" for c in columns)
+                cur = out.execute(
+                    f"INSERT INTO {quote_ident(table)} SELECT ?, rowid, {select_list} FROM f{i}.{quote_ident(table)}",
+                    (label,),
+                )
+                total += cur.rowcount
+            out.commit()
+            for i in range(len(group)):
+                out.execute(f"DETACH DATABASE f{i}")
+
+        out.execute(f"CREATE INDEX IF NOT EXISTS idx_catalog_folder ON {quote_ident(table)} ({quote_ident(FOLDER_COLUMN)})")
+        for column in CATALOG_INDEXES:
+            if column in columns:
+                out.execute(f"CREATE INDEX IF NOT EXISTS {quote_ident('idx_catalog_' + column)} ON {quote_ident(table)} ({quote_ident(column)})")
+        out.commit()
+        return total
+    finally:
+        out.close()
+
+
+def main():
+    databases = list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER)
+    if not databases:
+        print("未找到符合条件的数据库文件夹！")
+        return
+
+    if sys.argv[1] == "--materialize":
+        out_path = sys.argv[2] if len(sys.argv) > 2 else CATALOG_PATH
+        print(f"合并 {len(databases)} 个数据库（{START_FOLDER} - {END_FOLDER}）到 {out_path} ...")
+        total = materialize(databases, out_path)
+        print(f"✅ 已生成目录库：{out_path}，共 {total} 行")
+        return
+
+    count = 0
+    for row in federated_query(databases, sys.argv[1]):
+        print("\t".join("" if v is None else str(v) for v in row))
+        count += 1
+    print(f"-- 共 {count} 行，来自 {len(databases)} 个数据库", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main()
@@ -4,7 +4,10 @@
 
 # -*- coding: utf-8 -*-
 import os
-import sqlite3
+
+from 变更跟踪 import begin_step, mark_done, pending_where
+from 连接工厂 import connect
+from 数据目录清单 import list_range_databases
 
 # 固定规格目标（仅替换规格，不处理其他字段）
 STANDARD_SPECS = "XS|||S|||M|||L|||XL"
@@ -16,7 +19,7 @@ def update_database(db_path):
         return False
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect(db_path, "bulk-write")
         cursor = conn.cursor()
 
         # 确认 Content 表存在
@@ -34,16 +37,14 @@ def update_database(db_path):
             conn.commit()
 
         # 仅更新 规格 列，不读取或依赖其他列
-        cursor.execute("SELECT rowid FROM Content")
-        rows = cursor.fetchall()
-
-        updated = 0
-        for (rowid,) in rows:
-            cursor.execute(
-                "UPDATE Content SET 规格 = ? WHERE rowid = ?",
-                (STANDARD_SPECS, rowid),
-            )
-            updated += 1
+        # 安装了变更跟踪时只处理上次运行后新增或变化的行
+        begin_step(conn)
+        cursor.execute(
+            f"UPDATE Content SET 规格 = ? WHERE ({pending_where(conn, '规格')}) AND 规格 IS NOT ?",
+            (STANDARD_SPECS, STANDARD_SPECS),
+        )
+        updated = cursor.rowcount
+        mark_done(conn, "规格")
 
         conn.commit()
         conn.close()
@@ -64,15 +65,10 @@ def batch_update(base_dir, start_num, end_num):
     total = 0
     success = 0
 
-    for folder in os.listdir(base_dir):
-        if not folder.isdigit():
-            continue
-        folder_num = int(folder)
-        if start_num <= folder_num <= end_num:
-            total += 1
-            db_path = os.path.join(base_dir, folder, "SpiderResult.db3")
-            if update_database(db_path):
-                success += 1
+    for folder_num, db_path in list_range_databases(base_dir, start_num, end_num):
+        total += 1
+        if update_database(db_path):
+            success += 1
 
     print("=" * 50)
     print(f"处理完成: 成功 {success}/{total}")
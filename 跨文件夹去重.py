@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨文件夹去重工具
+同一商品被多个分类任务采集时，会分散在多个 SpiderResult.db3 中并被重复上传。
+本工具按文件夹编号顺序流式扫描整个范围，以 PageUrl 或规范化标题建立全局哈希索引，
+保留最先出现的一条，对后续副本进行标记或删除，并可选地把副本的分类合并到保留行。
+扫描只读进行；先合并分类，再标记或删除副本，所有修改都记入撤销日志
+（python 撤销日志.py --rollback <运行编号> 可恢复）。
+"""
+
+import hashlib
+import re
+import sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+
+from 连接工厂 import connect
+from 撤销日志 import new_run_id, record_rowids, start_run
+from 数据目录清单 import list_range_databases
+
+# ================ 固定配置（按需修改）================
+BASE_DIR: str = r"D:\火车采集器V10.28\Data"
+TABLE_NAME: str = "Content"
+START_FOLDER: int = 5211
+END_FOLDER: int = 5523
+
+# 去重依据："PageUrl" 按采集页地址；"标题" 按规范化后的标题
+DEDUP_KEY: str = "PageUrl"
+
+# 处理方式："mark"=在 MARK_COLUMN 中写入保留行位置（文件夹:ID），上传脚本会跳过；"delete"=直接删除后续副本
+ACTION: str = "mark"
+MARK_COLUMN: str = "重复来源"
+
+# 是否把后续副本的分类合并到保留行（写入 EXTRA_CATEGORY_COLUMN，每行一条分类路径）
+MERGE_CATEGORIES: bool = False
+EXTRA_CATEGORY_COLUMN: str = "附加分类"
+
+DRY_RUN: bool = False  # 预览，只统计不修改
+# ====================================================
+
+# 摘要长度（字节）：8 字节在千万级数据下碰撞概率可忽略，且索引内存占用小
+DIGEST_SIZE = 8
+
+
+def normalize_url(url: str) -> str:
+    """PageUrl 规范化：去掉首尾空白、锚点和末尾斜杠"""
+    return url.strip().split("#", 1)[0].rstrip("/")
+
+
+def normalize_title(title: str) -> str:
+    """标题规范化：统一大小写，标点与连续空白折叠为单个空格"""
+    return re.sub(r"[\W_]+", " ", title.casefold()).strip()
+
+
+def make_key_digest(value) -> Optional[bytes]:
+    """把去重字段转换为定长摘要；空值返回 None（不参与去重）"""
+    if value is None:
+        return None
+    text = str(value)
+    text = normalize_url(text) if DEDUP_KEY == "PageUrl" else normalize_title(text)
+    if not text:
+        return None
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def ensure_column(conn: sqlite3.Connection, column: str) -> None:
+    """Content 表缺少指定列时自动添加"""
+    columns = [col[1] for col in conn.execute(f'PRAGMA table_info("{TABLE_NAME}")')]
+    if column not in columns:
+        conn.execute(f'ALTER TABLE "{TABLE_NAME}" ADD COLUMN "{column}" TEXT DEFAULT \'\'')
+
+
+def merge_category_lines(existing: Optional[str], own_category: Optional[str], new_categories: List[str]) -> str:
+    """合并附加分类：去掉与保留行自身分类相同的路径，去重并保持顺序"""
+    lines = [line.strip() for line in (existing or "").splitlines() if line.strip()]
+    own = (own_category or "").strip()
+    for cat in new_categories:
+        if cat and cat != own:
+            lines.append(cat)
+    return "\n".join(dict.fromkeys(lines))
+
+
+def sweep(databases: List[Tuple[int, str]]):
+    """只读流式扫描所有数据库，建立全局索引并找出每个库中的后续副本
+
+    返回 (各文件夹副本 {文件夹: [(副本 rowid, 保留行 (文件夹, ID)), ...]}, 待合并分类 {(文件夹, ID): [分类, ...]})
+    """
+    index: Dict[bytes, Tuple[int, int]] = {}
+    pending_merge: Dict[Tuple[int, int], List[str]] = {}
+    copies_per_folder: Dict[int, List[Tuple[int, Tuple[int, int]]]] = {}
+    key_column = "PageUrl" if DEDUP_KEY == "PageUrl" else "标题"
+
+    for i, (folder_num, db_path) in enumerate(databases, 1):
+        conn = None
+        try:
+            conn = connect(db_path, "read-only")
+            columns = [col[1] for col in conn.execute(f'PRAGMA table_info("{TABLE_NAME}")')]
+            if key_column not in columns or "ID" not in columns:
+                print(f"⚠️ [{i}/{len(databases)}] {folder_num} 缺少 {key_column}/ID 字段，跳过")
+                continue
+
+            has_category = "分类" in columns
+            category_expr = '"分类"' if has_category else "NULL"
+            where_unmarked = f' WHERE "{MARK_COLUMN}" IS NULL OR "{MARK_COLUMN}" = \'\'' if MARK_COLUMN in columns else ""
+
+            # 逐行迭代游标，不一次性 fetchall，内存只与索引和副本数相关
+            copies: List[Tuple[int, Tuple[int, int]]] = []
+            cursor = conn.execute(
+                f'SELECT rowid, "ID", "{key_column}", {category_expr} FROM "{TABLE_NAME}"{where_unmarked} ORDER BY "ID"'
+            )
+            for rowid, record_id, key_value, category in cursor:
+                digest = make_key_digest(key_value)
+                if digest is None:
+                    continue
+                survivor = index.get(digest)
+                if survivor is None:
+                    index[digest] = (folder_num, record_id)
+                    continue
+                copies.append((rowid, survivor))
+                if MERGE_CATEGORIES and category and str(category).strip():
+                    pending_merge.setdefault(survivor, []).append(str(category).strip())
+
+            copies_per_folder[folder_num] = copies
+            print(f"📂 [{i}/{len(databases)}] {folder_num}: 发现 {len(copies)} 条重复副本（索引累计 {len(index)} 条）")
+        except Exception as e:
+            print(f"❌ 处理失败：{db_path}，原因：{e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    return copies_per_folder, pending_merge
+
+
+def apply_copies(databases: List[Tuple[int, str]], copies_per_folder: Dict[int, List[Tuple[int, Tuple[int, int]]]],
+                 run_id: str, skip_survivor_folders: Optional[Set[int]] = None) -> int:
+    """按 ACTION 标记或删除各库中的副本，修改前内容记入撤销日志，返回处理的副本数
+
+    保留行在 skip_survivor_folders 中（分类合并失败）的副本不处理，避免删除后分类丢失。
+    """
+    db_by_folder = dict(databases)
+    skip_survivor_folders = skip_survivor_folders or set()
+    handled = 0
+    for folder_num, copies in copies_per_folder.items():
+        skipped = [c for c in copies if c[1][0] in skip_survivor_folders]
+        copies = [c for c in copies if c[1][0] not in skip_survivor_folders]
+        if skipped:
+            print(f"⚠️ {folder_num}: {len(skipped)} 条副本的保留行分类合并失败，本次不处理")
+        if not copies:
+            continue
+        conn = None
+        try:
+            conn = connect(db_by_folder[folder_num], "bulk-write")
+            start_run(conn, run_id, "跨文件夹去重")
+            record_rowids(conn, run_id, "delete" if ACTION == "delete" else "update", [rowid for rowid, _ in copies],
+                          table=TABLE_NAME)
+            if ACTION == "delete":
+                conn.executemany(f'DELETE FROM "{TABLE_NAME}" WHERE rowid = ?', [(rowid,) for rowid, _ in copies])
+            else:
+                ensure_column(conn, MARK_COLUMN)
+                conn.executemany(
+                    f'UPDATE "{TABLE_NAME}" SET "{MARK_COLUMN}" = ? WHERE rowid = ?',
+                    [(f"{survivor[0]}:{survivor[1]}", rowid) for rowid, survivor in copies],
+                )
+            conn.commit()
+            handled += len(copies)
+            print(f"✅ {folder_num}: {'删除' if ACTION == 'delete' else '标记'} {len(copies)} 条重复副本")
+        except Exception as e:
+            print(f"❌ 处理失败：{db_by_folder[folder_num]}，原因：{e}")
+        finally:
+            if conn is not None:
+                conn.close()
+    return handled
+
+
+def apply_category_merges(databases: List[Tuple[int, str]], pending_merge: Dict[Tuple[int, int], List[str]],
+                          run_id: Optional[str] = None, failed_folders: Optional[Set[int]] = None) -> int:
+    """把待合并分类按文件夹分组，写回各保留行的附加分类列，返回合并的保留行数
+
+    run_id 不为空时修改前内容记入撤销日志；合并失败的文件夹编号加入 failed_folders。
+    """
+    db_by_folder = dict(databases)
+    by_folder: Dict[int, List[Tuple[int, List[str]]]] = {}
+    for (folder_num, record_id), categories in pending_merge.items():
+        by_folder.setdefault(folder_num, []).append((record_id, categories))
+
+    merged = 0
+    for folder_num, items in sorted(by_folder.items()):
+        db_path = db_by_folder[folder_num]
+        conn = None
+        try:
+            conn = connect(db_path, "bulk-write")
+            ensure_column(conn, EXTRA_CATEGORY_COLUMN)
+            columns = [col[1] for col in conn.execute(f'PRAGMA table_info("{TABLE_NAME}")')]
+            # 保留行所在的库可能没有 分类 列（与 sweep 的处理一致）
+            category_expr = '"分类"' if "分类" in columns else "NULL"
+            updates = []
+            for record_id, categories in items:
+                row = conn.execute(
+                    f'SELECT rowid, {category_expr}, "{EXTRA_CATEGORY_COLUMN}" FROM "{TABLE_NAME}" WHERE "ID" = ?',
+                    (record_id,),
+                ).fetchone()
+                if row is None:
+                    continue
+                updates.append((merge_category_lines(row[2], row[1], categories), row[0]))
+            if run_id:
+                start_run(conn, run_id, "跨文件夹去重")
+                record_rowids(conn, run_id, "update", [rowid for _, rowid in updates], table=TABLE_NAME)
+            conn.executemany(f'UPDATE "{TABLE_NAME}" SET "{EXTRA_CATEGORY_COLUMN}" = ? WHERE rowid = ?', updates)
+            conn.commit()
+            merged += len(updates)
+        except Exception as e:
+            print(f"❌ 合并分类失败：{db_path}，原因：{e}")
+            if failed_folders is not None:
+                failed_folders.add(folder_num)
+        finally:
+            if conn is not None:
+                conn.close()
+    return merged
+
+
+def main():
+    if DEDUP_KEY not in ("PageUrl", "标题"):
+        raise ValueError("DEDUP_KEY 只能是 'PageUrl' 或 '标题'")
+    if ACTION not in ("mark", "delete"):
+        raise ValueError("ACTION 只能是 'mark' 或 'delete'")
+
+    print("=== 跨文件夹去重 ===" + (" (预览模式)" if DRY_RUN else ""))
+    print(f"基础文件夹: {BASE_DIR}")
+    print(f"处理范围: {START_FOLDER} - {END_FOLDER}")
+    print(f"去重依据: {DEDUP_KEY}，处理方式: {ACTION}，合并分类: {MERGE_CATEGORIES}")
+    print("=" * 60)
+
+    databases = list_range_databases(BASE_DIR, START_FOLDER, END_FOLDER)
+    if not databases:
+        print("未找到符合条件的数据库文件夹！")
+        return
+
+    copies_per_folder, pending_merge = sweep(databases)
+
+    merged = 0
+    if not DRY_RUN:
+        # 本次运行编号：合并分类和标记/删除的行记入撤销日志，可用 python 撤销日志.py --rollback <编号> 恢复
+        run_id = new_run_id("跨文件夹去重")
+        print(f"撤销日志运行编号：{run_id}")
+        # 先合并分类再处理副本：合并失败的保留行，其副本不删除也不标记
+        failed_folders: Set[int] = set()
+        if MERGE_CATEGORIES and pending_merge:
+            merged = apply_category_merges(databases, pending_merge, run_id, failed_folders)
+        apply_copies(databases, copies_per_folder, run_id, failed_folders)
+
+    print("=" * 60)
+    print(f"扫描数据库: {len(databases)} 个")
+    print(f"重复副本: {sum(len(copies) for copies in copies_per_folder.values())} 条")
+    if MERGE_CATEGORIES:
+        print(f"合并分类的保留行: {merged if not DRY_RUN else len(pending_merge)} 条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 连接工厂
+各脚本统一通过 connect(db_path, profile) 打开数据库，按用途选择参数配置：
+  safe        与 sqlite3.connect 默认一致（回滚日志、synchronous=FULL），用于 config.db3 等关键库
+  bulk-write  批量写入：WAL、synchronous=NORMAL、64MB 页缓存、临时表放内存
+  read-only   只读扫描：mode=ro 打开、内存映射读取、query_only 防止误写
+
+bulk-write 关闭连接时默认把日志模式切回 DELETE，不在数据目录里留下 -wal/-shm 文件，
+采集器照常读写。
+
+用法：
+  python 连接工厂.py --bench <数据库路径>   在数据库副本上对比各配置执行去重、颜色步骤的速度
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+# ================ 固定配置（按需修改）================
+CACHE_SIZE_KB: int = 65536                  # 页缓存大小（KB），bulk-write/read-only 使用
+MMAP_SIZE: int = 256 * 1024 * 1024          # read-only 内存映射大小（字节）
+RESTORE_JOURNAL_MODE: bool = True           # bulk-write 关闭时切回 DELETE 日志模式
+BUSY_TIMEOUT: float = 30.0                  # 数据库被占用时的等待秒数
+BENCH_ROUNDS: int = 3                       # 基准测试每项重复次数（取中位数）
+# ====================================================
+
+PROFILES: Dict[str, Dict[str, object]] = {
+    "safe": {},
+    "bulk-write": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -CACHE_SIZE_KB,
+        "temp_store": "MEMORY",
+    },
+    "read-only": {
+        "cache_size": -CACHE_SIZE_KB,
+        "mmap_size": MMAP_SIZE,
+        "temp_store": "MEMORY",
+        "query_only": 1,
+    },
+}
+
+
+class BulkWriteConnection(sqlite3.Connection):
+    """关闭前执行检查点并恢复 DELETE 日志模式的连接"""
+
+    def close(self):
+        if RESTORE_JOURNAL_MODE:
+            try:
+                if self.in_transaction:
+                    self.rollback()
+                self.execute("PRAGMA journal_mode=DELETE")
+            except sqlite3.Error:
+                # 其他程序仍打开着数据库时无法切换，保持 WAL，下次关闭时再试
+                pass
+        super().close()
+
+
+def connect(db_path, profile: str = "safe", **kwargs) -> sqlite3.Connection:
+    """按配置打开数据库连接，其余参数原样传给 sqlite3.connect"""
+    if profile not in PROFILES:
+        raise ValueError(f"未知的连接配置: {profile}，可用: {', '.join(PROFILES)}")
+    kwargs.setdefault("timeout", BUSY_TIMEOUT)
+
+    if profile == "read-only":
+        uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, **kwargs)
+    elif profile == "bulk-write":
+        conn = sqlite3.connect(str(db_path), factory=BulkWriteConnection, **kwargs)
+    else:
+        conn = sqlite3.connect(str(db_path), **kwargs)
+
+    for pragma, value in PROFILES[profile].items():
+        conn.execute(f"PRAGMA {pragma}={value}")
+    return conn
+
+
+# ------------------------------------------------------------
+# 基准测试：在副本上执行 sql去重.py、颜色提取.py 的核心语句
+# ------------------------------------------------------------
+def _bench_dedup(conn: sqlite3.Connection, writable: bool) -> int:
+    from 撤销日志 import new_run_id, record_before_images, start_run
+
+    where = "ID NOT IN (SELECT MIN(ID) FROM Content GROUP BY SKU) OR 图片 IS NULL OR TRIM(图片) = ''"
+    if not writable:
+        return conn.execute(f"SELECT COUNT(*) FROM Content WHERE {where}").fetchone()[0]
+    run_id = new_run_id("去重")
+    start_run(conn, run_id, "去重")
+    record_before_images(conn, run_id, "delete", where)
+    deleted = conn.execute(f"DELETE FROM Content WHERE {where}").rowcount
+    conn.commit()
+    return deleted
+
+
+def _bench_colour(conn: sqlite3.Connection, writable: bool) -> int:
+    from 撤销日志 import new_run_id, record_before_images, start_run
+    from 颜色提取 import process_colors, register_color_functions
+
+    process_colors.cache_clear()
+    register_color_functions(conn)
+    changed = "color_part(颜色1) IS NOT 颜色 OR size_part(颜色1) IS NOT 规格"
+    if not writable:
+        return conn.execute(f"SELECT COUNT(*) FROM Content WHERE {changed}").fetchone()[0]
+    run_id = new_run_id("颜色")
+    start_run(conn, run_id, "颜色")
+    record_before_images(conn, run_id, "update", changed)
+    updated = conn.execute(
+        f"UPDATE Content SET 颜色 = color_part(颜色1), 规格 = size_part(颜色1) WHERE {changed}"
+    ).rowcount
+    conn.commit()
+    return updated
+
+
+BENCH_STEPS: List[Tuple[str, Callable[[sqlite3.Connection, bool], int]]] = [
+    ("去重", _bench_dedup),
+    ("颜色", _bench_colour),
+]
+
+
+def run_benchmark(db_path: str) -> None:
+    """每个配置、每个步骤都在新的数据库副本上运行，输出耗时和每秒扫描行数"""
+    conn = sqlite3.connect(db_path)
+    total_rows = conn.execute("SELECT COUNT(*) FROM Content").fetchone()[0]
+    conn.close()
+
+    print(f"基准数据库: {db_path}（{total_rows} 行，{os.path.getsize(db_path) / 1024 / 1024:.1f} MB）")
+    print(f"每项运行 {BENCH_ROUNDS} 次取中位数；read-only 只执行步骤中的查询部分")
+    print("=" * 60)
+    print(f"{'步骤':<6}{'配置':<14}{'耗时(ms)':>10}{'行/秒':>12}{'影响行数':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        copy_path = os.path.join(tmp_dir, "bench.db3")
+        for step_name, step in BENCH_STEPS:
+            for profile in PROFILES:
+                timings, affected = [], 0
+                for _ in range(BENCH_ROUNDS):
+                    shutil.copyfile(db_path, copy_path)
+                    start = time.perf_counter()
+                    conn = connect(copy_path, profile)
+                    affected = step(conn, profile != "read-only")
+                    conn.close()
+                    timings.append(time.perf_counter() - start)
+                elapsed = sorted(timings)[len(timings) // 2]
+                rate = total_rows / elapsed if elapsed else 0.0
+                print(f"{step_name:<6}{profile:<14}{elapsed * 1000:>10.1f}{rate:>12.0f}{affected:>10}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--bench":
+        run_benchmark(sys.argv[2])
+    else:
+        print(__doc__)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商品链接规范化
+同一个商品链接常以不同写法出现（协议、域名大小写、默认端口、#锚点、?v=1 之类的变体参数、
+utm_ 等跟踪参数），按字符串去重会被当成不同链接。canonicalize_url 把链接统一成一种写法，
+去重和建索引都以它为准；传入 base 时按浏览器规则解析相对链接（urljoin），不再直接拼接前缀。
+
+几千万条链接去重时，可用 BloomFilter（磁盘上的位图文件，内存映射访问）代替 set，
+内存占用固定；代价是极少数（按 BLOOM_ERROR_RATE）新链接会被误判为已出现。
+
+用法：
+  python 链接规范化.py <输入.txt> [输出.txt]   规范化并去重一个超大链接文件（USE_BLOOM 控制是否用布隆过滤器）
+      --bloom <文件>   使用并保留指定的布隆过滤器文件（已存在时沿用其中记录的链接，可跨多次运行去重）；
+                       不指定时每次新建临时过滤器，运行结束删除
+"""
+
+import fnmatch
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, Optional, Sequence
+from urllib.parse import unquote_plus, urljoin, urlsplit, urlunsplit
+
+# ================ 固定配置（按需修改）================
+# 去掉的查询参数（支持 * 通配符）；v 为商品图片/页面的版本参数，同一商品不同 v 视为同一链接
+TRACKING_PARAMS: Sequence[str] = (
+    "utm_*", "gclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl",
+    "spm", "ref", "ref_", "srsltid", "v",
+)
+SORT_QUERY: bool = True                 # 查询参数按名称排序（?a=1&b=2 与 ?b=2&a=1 视为同一链接）
+USE_BLOOM: bool = True                  # 命令行去重时使用布隆过滤器
+BLOOM_CAPACITY: int = 50_000_000        # 预计链接数
+BLOOM_ERROR_RATE: float = 0.001         # 允许的误判率
+# ====================================================
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+RULES_VERSION = 2   # 规范化算法本身改变时加一，让依赖缓存的脚本重新生成
+
+
+def _is_tracking(name: str, patterns: Sequence[str]) -> bool:
+    name = name.lower()
+    return any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+
+def rules_signature(drop_params: Sequence[str] = TRACKING_PARAMS, sort_query: bool = SORT_QUERY) -> str:
+    """规范化规则的摘要，规则改变后依赖缓存的脚本据此重新生成结果"""
+    return hashlib.sha1(repr((RULES_VERSION, sorted(drop_params), sort_query)).encode("utf-8")).hexdigest()[:12]
+
+
+def canonicalize_url(url: str, base: Optional[str] = None, drop_params: Sequence[str] = TRACKING_PARAMS,
+                     sort_query: bool = SORT_QUERY) -> str:
+    """规范化链接：去首尾空白，相对链接按 base 解析，协议和域名小写，去掉默认端口、#锚点和跟踪参数；
+    不是网址时原样返回"""
+    url = url.strip()
+    if base:
+        url = urljoin(base, url)
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    netloc = f"[{host}]" if ":" in host else host
+    if parts.username is not None:
+        userinfo = parts.username + (f":{parts.password}" if parts.password is not None else "")
+        netloc = f"{userinfo}@{netloc}"
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc += f":{port}"
+
+    query = parts.query
+    if query and (drop_params or sort_query):
+        # 按原样保留每个 name=value 片段（不重新编码，?12345、%20、逗号等保持不变），只按解码后的参数名过滤和排序
+        tokens = [(unquote_plus(token.split("=", 1)[0]), token) for token in query.split("&") if token]
+        tokens = [(name, token) for name, token in tokens if not _is_tracking(name, drop_params)]
+        if sort_query:
+            tokens.sort(key=lambda item: item[0])
+        query = "&".join(token for _, token in tokens)
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+class BloomFilter:
+    """磁盘上的布隆过滤器：位图保存在文件中，通过内存映射读写，可跨运行复用
+
+    文件头记录位数和哈希函数个数，已存在的文件按文件头参数打开。
+    """
+
+    HEADER = struct.Struct("<8sQI")
+    MAGIC = b"BLOOM001"
+
+    def __init__(self, path: str, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE,
+                 reset: bool = False):
+        """reset=True 时丢弃已存在的文件，新建空过滤器"""
+        self.path = path
+        if reset and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path) and os.path.getsize(path) >= self.HEADER.size:
+            with open(path, "rb") as f:
+                magic, self.num_bits, self.num_hashes = self.HEADER.unpack(f.read(self.HEADER.size))
+            if magic != self.MAGIC:
+                raise ValueError(f"不是布隆过滤器文件: {path}")
+        else:
+            self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+            self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+            with open(path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.num_bits, self.num_hashes))
+                f.truncate(self.HEADER.size + (self.num_bits + 7) // 8)
+        self._file = open(path, "r+b")
+        self._bits = mmap.mmap(self._file.fileno(), 0)
+
+    @property
+    def size_bytes(self) -> int:
+        return (self.num_bits + 7) // 8
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> bool:
+        """加入元素，返回加入前是否（可能）已存在"""
+        offset = self.HEADER.size
+        seen = True
+        for pos in self._positions(item):
+            index = offset + (pos >> 3)
+            mask = 1 << (pos & 7)
+            byte = self._bits[index]
+            if not byte & mask:
+                seen = False
+                self._bits[index] = byte | mask
+        return seen
+
+    def __contains__(self, item: str) -> bool:
+        offset = self.HEADER.size
+        return all(self._bits[offset + (pos >> 3)] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def close(self) -> None:
+        self._bits.flush()
+        self._bits.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def dedupe_links(links: Iterable[str], seen=None, base: Optional[str] = None) -> Iterable[str]:
+    """规范化并按首次出现顺序去重；seen 可传入 BloomFilter，默认用 set"""
+    seen = set() if seen is None else seen
+    for link in links:
+        if not link.strip():
+            continue
+        url = canonicalize_url(link, base)
+        if isinstance(seen, BloomFilter):
+            if seen.add(url):
+                continue
+        elif url in seen:
+            continue
+        else:
+            seen.add(url)
+        yield url
+
+
+def main():
+    args = sys.argv[1:]
+    keep_bloom = None
+    if "--bloom" in args:
+        index = args.index("--bloom")
+        if index + 1 >= len(args):
+            print(__doc__)
+            return
+        keep_bloom = args[index + 1]
+        del args[index:index + 2]
+    if not args:
+        print(__doc__)
+        return
+    input_path = args[0]
+    root, ext = os.path.splitext(input_path)
+    output_path = args[1] if len(args) > 1 else f"{root}_去重{ext}"
+
+    # 临时过滤器总是新建：上次运行被中断留下的 .bloom 文件里的位会让所有链接被当成重复丢掉
+    bloom_path = keep_bloom or output_path + ".bloom"
+    bloom = BloomFilter(bloom_path, reset=keep_bloom is None) if USE_BLOOM or keep_bloom else None
+    if bloom:
+        print(f"布隆过滤器: {bloom.size_bytes / 1024 / 1024:.1f} MB，{bloom.num_hashes} 个哈希，误判率 {BLOOM_ERROR_RATE}")
+    seen = bloom if bloom is not None else set()
+    total = kept = 0
+    try:
+        with open(input_path, "r", encoding="utf-8", errors="ignore") as src, \
+                open(output_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                total += 1
+                for url in dedupe_links((line,), seen):
+                    dst.write(url + "\n")
+                    kept += 1
+    finally:
+        if bloom:
+            bloom.close()
+            if keep_bloom is None:
+                os.remove(bloom_path)
+    print(f"✅ 读入 {total} 行，输出 {kept} 个链接 → {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
-import os
-import sqlite3
 import re
+from functools import lru_cache
+
+from 撤销日志 import new_run_id, record_before_images, start_run
+from 变更跟踪 import begin_step, mark_done, pending_where
+from 数据目录清单 import list_range_databases
+from 连接工厂 import connect
 
 # ==============================
 # 改进的颜色/规格处理函数
 # ==============================
 size_pattern = re.compile(r"(?:^|[\s/])([0-9]+X|X{1,3}S?|S|M|L|OS)(?:$|[\s|])", re.IGNORECASE)
 
+# 解析结果缓存条数上限：同样的 颜色1 在各行、各文件夹中大量重复，只解析一次
+PARSE_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def process_colors(color_str):
     if not color_str:
         return "", ""
@@ -35,6 +44,19 @@ def process_colors(color_str):
     return "|||".join(colors), "|||".join(specs)
 
 
+def register_color_functions(conn):
+    """注册为 SQLite 确定性函数：color_part(颜色1) 取颜色，size_part(颜色1) 取规格"""
+    conn.create_function("color_part", 1, lambda s: process_colors(s)[0], deterministic=True)
+    conn.create_function("size_part", 1, lambda s: process_colors(s)[1], deterministic=True)
+
+
+def print_cache_stats():
+    info = process_colors.cache_info()
+    calls = info.hits + info.misses
+    rate = info.hits / calls * 100 if calls else 0.0
+    print(f"📊 解析缓存：调用 {calls} 次，命中 {info.hits} 次（命中率 {rate:.1f}%），实际解析 {info.misses} 次，缓存条目 {info.currsize}/{info.maxsize}")
+
+
 # ==============================
 # 主程序：批量更新数据库
 # ==============================
@@ -42,42 +64,47 @@ base_dir = r"D:\火车采集器V10.28\Data"  # <<< 修改为你的目录
 start_num = 2835  # <<< 修改开始文件夹号
 end_num = 2903    # <<< 修改结束文件夹号
 
-for folder in os.listdir(base_dir):
-    if folder.isdigit():
-        folder_num = int(folder)
-        if start_num <= folder_num <= end_num:
-            db_path = os.path.join(base_dir, folder, "SpiderResult.db3")
 
-            if not os.path.exists(db_path):
-                print(f"❌ 数据库不存在: {db_path}")
-                continue
+def main():
+    # 本次运行编号：被修改的行记入撤销日志，可用 python 撤销日志.py --rollback <编号> 恢复
+    run_id = new_run_id("颜色")
+    print(f"撤销日志运行编号：{run_id}")
 
-            try:
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()  
-
-                # 检查字段是否存在
-                cursor.execute("PRAGMA table_info(Content)")
-                columns = [col[1] for col in cursor.fetchall()]
-                if not {"颜色1", "颜色", "规格"}.issubset(columns):
-                    print(f"⚠️ 数据库 {db_path} 缺少必要字段")
-                    conn.close()
-                    continue
-
-                # 读取并处理数据
-                cursor.execute("SELECT rowid, 颜色1 FROM Content")
-                rows = cursor.fetchall()
-
-                for rowid, color1 in rows:
-                    new_color, new_spec = process_colors(color1)
-                    cursor.execute(
-                        "UPDATE Content SET 颜色 = ?, 规格 = ? WHERE rowid = ?",
-                        (new_color, new_spec, rowid)
-                    )
-
-                conn.commit()
+    for folder_num, db_path in list_range_databases(base_dir, start_num, end_num):
+        try:
+            conn = connect(db_path, "bulk-write")
+            cursor = conn.cursor()  
+
+            # 检查字段是否存在
+            cursor.execute("PRAGMA table_info(Content)")
+            columns = [col[1] for col in cursor.fetchall()]
+            if not {"颜色1", "颜色", "规格"}.issubset(columns):
+                print(f"⚠️ 数据库 {db_path} 缺少必要字段")
                 conn.close()
-                print(f"✅ 已更新数据库: {db_path}")
+                continue
+
+            # 在 SQLite 内一条 UPDATE 完成拆分，只更新结果有变化的行
+            # （安装了变更跟踪时只检查上次运行后新增或变化的行）
+            register_color_functions(conn)
+            begin_step(conn)
+            changed = (f"({pending_where(conn, '颜色')}) AND "
+                       "(color_part(颜色1) IS NOT 颜色 OR size_part(颜色1) IS NOT 规格)")
+
+            start_run(conn, run_id, "颜色")
+            record_before_images(conn, run_id, "update", changed)
+            cursor.execute(f"UPDATE Content SET 颜色 = color_part(颜色1), 规格 = size_part(颜色1) WHERE {changed}")
+            updated = cursor.rowcount
+            mark_done(conn, "颜色")
+
+            conn.commit()
+            conn.close()
+            print(f"✅ 已更新数据库: {db_path}（修改 {updated} 行）")
+
+        except Exception as e:
+            print(f"❌ 处理数据库 {db_path} 出错: {e}")
+
+    print_cache_stats()
+
 
-            except Exception as e:
-                print(f"❌ 处理数据库 {db_path} 出错: {e}")
+if __name__ == "__main__":
+    main()